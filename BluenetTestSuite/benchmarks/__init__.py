@@ -0,0 +1,3 @@
+"""
+Empty init to ensure that this folder is considered a python module
+"""
\ No newline at end of file
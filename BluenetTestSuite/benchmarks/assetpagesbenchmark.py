@@ -0,0 +1,69 @@
+"""
+Measures the time per frame of the nearest crownstone plotter on a 2x2 grid of subplots for a growing number of
+assets. Each asset is heard by 5 Crownstones once per second and has a nearest crownstone update once per second.
+After filling a 60 second window, frames are rendered while new reports keep arriving. Only the 4 visible assets
+are processed, so the time per frame should hardly depend on the number of assets.
+
+The figure is drawn on an Agg canvas, so no window is opened.
+
+    python -m BluenetTestSuite.benchmarks.assetpagesbenchmark
+"""
+import datetime
+import random
+import time
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from BluenetTestSuite.benchmarks.streamlookupbenchmark import macReport, idReport
+from BluenetTestSuite.testscripts.nearestcrownstoneplotter import NearestCrownstoneAlgorithmPlotter, \
+    handlePlottingQueueObject
+
+
+def fill(plotter, rng, assetcount, start, end, crownstonecount=5):
+    """
+    Adds one round of reports per second per asset between the datetimes start and end.
+    """
+    t = start
+    second = datetime.timedelta(seconds=1)
+    step = second / assetcount
+    asset = 0
+    while t < end:
+        nearest = asset % crownstonecount
+        for crownstone in range(crownstonecount):
+            rssi = round(rng.gauss(-50 if crownstone == nearest else -65, 3))
+            handlePlottingQueueObject(macReport(asset, crownstone, rssi), t, plotter)
+        handlePlottingQueueObject(idReport(plotter.assetIdOf(macReport(asset, 0, 0).assetMacAddress),
+                                           nearest, -50), t, plotter)
+        asset = (asset + 1) % assetcount
+        t += step
+
+
+def run(assetcounts=(4, 100, 1000), window=60, frames=20, refreshRateMs=250, seed=1):
+    rng = random.Random(seed)
+    print("{0:>8} {1:>12} {2:>12} {3:>12}".format("assets", "streams", "ms/frame", "full draws"))
+    for assetcount in assetcounts:
+        plotter = NearestCrownstoneAlgorithmPlotter(window, refreshRateMs, rows=2, cols=2, order="active")
+        fig = Figure(figsize=(12, 8))
+        FigureCanvasAgg(fig)
+        axs_flat = list(fig.subplots(2, 2, sharex=True, squeeze=False).flat)
+
+        now = datetime.datetime.now()
+        fill(plotter, rng, assetcount, now - datetime.timedelta(seconds=window), now)
+
+        duration = 0
+        for i in range(frames):
+            previous, now = now, datetime.datetime.now()
+            fill(plotter, rng, assetcount, previous, now)
+            t1 = time.perf_counter()
+            plotter.updatePlotData(i, fig, axs_flat)
+            t2 = time.perf_counter()
+            duration += t2 - t1
+
+        print("{0:>8} {1:>12} {2:>12.1f} {3:>12}".format(
+            assetcount, len(list(plotter.pages.allStreams())), duration / frames * 1000,
+            plotter.renderer.fullDrawCount))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,53 @@
+"""
+Measures the time to get the exact match MAC filters for 1k, 10k and 50k MAC addresses from the FilterCache when
+they have to be built (a script starting with a new MAC list) and when they are on disk (a script restarting
+with the same list).
+
+An exact match filter holds at most 255 items (the item count is a uint8), so the lists are split over
+several filters, as they would be when deployed.
+
+    python -m BluenetTestSuite.benchmarks.filtercachebenchmark
+"""
+import random
+import tempfile
+import time
+
+from BluenetTestSuite.utils.filtercache import FilterCache
+from BluenetTestSuite.utils.filterexamples import filterExactMacInForwarderMacOut
+
+MACS_PER_FILTER = 255
+
+
+def macList(count):
+    rng = random.Random(count)
+    return [":".join("{0:02x}".format(rng.randrange(256)) for i in range(6)) for j in range(count)]
+
+
+def getFilters(maclist, cachedir):
+    # a new FilterCache, as a restarted script would construct.
+    cache = FilterCache(cachedir, maxEntries=1024)
+    return [filterExactMacInForwarderMacOut(maclist[i:i + MACS_PER_FILTER], cache=cache)
+            for i in range(0, len(maclist), MACS_PER_FILTER)]
+
+
+def timeit(func):
+    t1 = time.perf_counter()
+    result = func()
+    t2 = time.perf_counter()
+    return t2 - t1, result
+
+
+def run(sizes=(1000, 10000, 50000)):
+    with tempfile.TemporaryDirectory() as cachedir:
+        print("{0:>8} {1:>8} {2:>10} {3:>10} {4:>10}".format("macs", "filters", "bytes", "build ms", "cached ms"))
+        for size in sizes:
+            maclist = macList(size)
+            built, builtfilters = timeit(lambda: getFilters(maclist, cachedir))
+            cached, cachedfilters = timeit(lambda: getFilters(maclist, cachedir))
+            assert [f.getCrc() for f in builtfilters] == [f.getCrc() for f in cachedfilters]
+            print("{0:>8} {1:>8} {2:>10} {3:>10.1f} {4:>10.1f}".format(
+                size, len(cachedfilters), sum(len(f.filterbytes) for f in cachedfilters), built * 1000, cached * 1000))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,59 @@
+"""
+Measures the cost of FirmwareState queries with 10k tracked objects, compared to a linear scan over the
+state dict (which is how the queries were implemented before the class index).
+
+    python -m BluenetTestSuite.benchmarks.firmwarestatebenchmark
+"""
+import time
+
+from BluenetTestSuite.firmwarestate.firmwarestate import FirmwareState
+
+
+def linearScanFindFailures(fw, classname, expressionname, value):
+    """
+    Reference implementation of assertFindFailures without the class index.
+    """
+    failures = []
+    existsAny = False
+    for ptr, obj in fw.statedict.items():
+        if obj.get('typename') == classname:
+            existsAny = True
+            if obj.get(expressionname) != str(value):
+                failures += [ptr]
+    return failures if existsAny else None
+
+
+def timeit(func, repetitions):
+    """
+    Returns the average duration of func() in microseconds.
+    """
+    t1 = time.perf_counter()
+    for i in range(repetitions):
+        func()
+    t2 = time.perf_counter()
+    return (t2 - t1) / repetitions * 1e6
+
+
+def run(objectcount=10000, classcount=100, repetitions=1000):
+    fw = FirmwareState()
+    for i in range(objectcount):
+        ptr = "0x{0:08x}".format(0x20000000 + 16 * i)
+        fw.pushstatevalue(ptr, "Class{0}".format(i % classcount), "_state", str(i % 7))
+    # the class the tests typically query, a single instance.
+    fw.pushstatevalue("0x10000000", "SwitchAggregator", "_aggregatedState", "0")
+
+    print("objects: {0}, classes: {1}".format(len(fw.statedict), len(fw.classindex)))
+    print("{0:<45} {1:>12}".format("query", "us per call"))
+    results = [
+        ["getValue (single instance)", lambda: fw.getValue("SwitchAggregator", "_aggregatedState")],
+        ["assertFindFailures (single instance)", lambda: fw.assertFindFailures("SwitchAggregator", "_aggregatedState", 0)],
+        ["assertFindFailures (100 instances)", lambda: fw.assertFindFailures("Class3", "_state", 3)],
+        ["assertFindFailures (unknown class)", lambda: fw.assertFindFailures("Unknown", "_state", 3)],
+        ["linear scan (single instance)", lambda: linearScanFindFailures(fw, "SwitchAggregator", "_aggregatedState", 0)],
+    ]
+    for name, func in results:
+        print("{0:<45} {1:>12.2f}".format(name, timeit(func, repetitions)))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,63 @@
+"""
+Compares the memory used by the columnar FirmwareStateHistory to a list of FirmwareStateHistoryEntry objects,
+for a soak run like stream of state updates.
+
+    python -m BluenetTestSuite.benchmarks.firmwarestatehistorybenchmark
+"""
+import datetime
+import time
+import tracemalloc
+
+from BluenetTestSuite.firmwarestate.firmwarestatehistory import FirmwareStateHistory
+from BluenetTestSuite.firmwarestate.firmwarestatehistoryentry import FirmwareStateHistoryEntry
+
+
+def generateUpdates(count):
+    """
+    Returns a list of [ptr, classname, valuename, value] cycling through a handful of objects.
+    """
+    objects = [["0x20003a10", "SwitchAggregator", "_aggregatedState"],
+               ["0x20003a10", "SwitchAggregator", "_overrideState"],
+               ["0x20003c40", "Relay", "on"],
+               ["0x20003c60", "Dimmer", "intensity"]]
+    return [objects[i % len(objects)] + [str(i % 101)] for i in range(count)]
+
+
+def measure(fill):
+    """
+    Returns [bytes allocated by fill(), seconds it took].
+    """
+    tracemalloc.start()
+    t1 = time.perf_counter()
+    result = fill()
+    t2 = time.perf_counter()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return [size, t2 - t1]
+
+
+def run(count=1000000):
+    updates = generateUpdates(count)
+
+    def fillList():
+        historylist = []
+        for ptr, classname, valuename, value in updates:
+            historylist += [FirmwareStateHistoryEntry(datetime.datetime.now(), ptr, classname, valuename, value)]
+        return historylist
+
+    def fillColumns():
+        history = FirmwareStateHistory()
+        for ptr, classname, valuename, value in updates:
+            history.append(time.time(), ptr, classname, valuename, value)
+        return history
+
+    print("entries: {0}".format(count))
+    for name, fill in [["list of FirmwareStateHistoryEntry", fillList], ["FirmwareStateHistory", fillColumns]]:
+        size, duration = measure(fill)
+        print("{0:<35} {1:>8.1f} MB {2:>6.1f} bytes/entry {3:>6.2f} s".format(
+            name, size / 1e6, size / count, duration))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,120 @@
+"""
+Feeds FIRMWARESTATE payloads to FirmwareState.parse at maximum rate and reports the number of state updates
+per second it ingests: for the decoding step alone, old and new, for the whole parse with the previous per byte
+decoder, for the current decoder without and with the classname cache, and with console echo of every update and
+rate limited echo (printed to os.devnull, a terminal is slower). Each rate is the best of a few runs, single runs
+vary by 10-20%. Most of the time of a whole parse is spent in the state and history bookkeeping, which all
+variants share.
+
+    python -m BluenetTestSuite.benchmarks.firmwarestateparsebenchmark
+"""
+import contextlib
+import os
+import time
+
+from crownstone_uart.core.uart.UartTypes import UartRxType
+from crownstone_uart.core.uart.uartPackets.UartMessagePacket import UartMessagePacket
+
+from BluenetTestSuite.firmwarestate.firmwarestate import FirmwareState, NON_ASCII_BYTES
+
+
+def recordedPayloads():
+    """
+    Returns FIRMWARESTATE messages as logged by the firmware during a switch behaviour test.
+    """
+    lines = [
+        "20003a10@void SwitchAggregator::pushState()@_overrideState@255",
+        "20003a10@void SwitchAggregator::pushState()@_behaviourState@0",
+        "20003a10@void SwitchAggregator::pushState()@_twilightState@80",
+        "20003a10@void SwitchAggregator::pushState()@_aggregatedState@80",
+        "20003b40@bool BehaviourHandler::update()@_isActive@True",
+        "20003b80@bool TwilightHandler::update()@_currentIntendedState@80",
+        "20003c00@void SafeSwitch::setState(switch_state_t)@storedState.state.dimmer@80",
+        "20003c40@void Relay::set(bool)@on@False",
+        "20003c60@void Dimmer::set(uint8_t, bool)@intensity@80",
+    ]
+    return [UartMessagePacket(UartRxType.FIRMWARESTATE, list(line.encode("ascii"))) for line in lines]
+
+
+def legacyDecode(fw, dataPacket):
+    """
+    Decoding only, as it was before: string concatenation per byte and a classname lookup per message.
+    """
+    stringResult = ""
+    for byte in dataPacket.payload:
+        if byte < 128:
+            stringResult += chr(byte)
+    statelist = stringResult.split("@")
+    statelist[1] = fw.classnamefromprettyfunction(statelist[1])
+    return statelist
+
+
+def decode(fw, dataPacket):
+    """
+    Decoding only, as FirmwareState.parse does it.
+    """
+    stringResult = bytes(dataPacket.payload).translate(None, NON_ASCII_BYTES).decode("ascii")
+    statelist = stringResult.split("@", 3)
+    statelist[1] = fw.classnameof(statelist[1])
+    return statelist
+
+
+def legacyParse(fw, dataPacket):
+    """
+    The decoder as it was before: string concatenation per byte and a classname lookup per message.
+    """
+    stringResult = ""
+    for byte in dataPacket.payload:
+        if byte < 128:
+            stringResult += chr(byte)
+    statelist = stringResult.split("@")
+    statelist[1] = fw.classnamefromprettyfunction(statelist[1])
+    with fw.lock:
+        fw.pushstatevalue("0x" + statelist[0], statelist[1], statelist[2], statelist[3])
+        fw.pushhistoryvalue("0x" + statelist[0], statelist[1], statelist[2], statelist[3])
+
+
+def measure(parse, payloads, count, repeat=5):
+    """
+    Returns the number of updates per second parse handles, the best of [repeat] runs of [count] updates.
+    """
+    best = float("inf")
+    for r in range(repeat):
+        t1 = time.perf_counter()
+        for i in range(count):
+            parse(payloads[i % len(payloads)])
+        best = min(best, time.perf_counter() - t1)
+    return count / best
+
+
+def run(count=100000):
+    payloads = recordedPayloads()
+    print("updates: {0}".format(count))
+
+    fw = FirmwareState(echo=False)
+    legacyDecoded = measure(lambda packet: legacyDecode(fw, packet), payloads, count)
+    decoded = measure(lambda packet: decode(fw, packet), payloads, count)
+    print("{0:<30} {1:>10.0f} updates/s".format("decode only, per byte", legacyDecoded))
+    print("{0:<30} {1:>10.0f} updates/s {2:+.0%}".format("decode only, current", decoded, decoded / legacyDecoded - 1))
+
+    legacy = measure(lambda packet: legacyParse(fw, packet), payloads, count)
+    print("{0:<30} {1:>10.0f} updates/s".format("per byte decoder", legacy))
+
+    fw = FirmwareState(echo=False)
+    fw.classnameof = fw.classnamefromprettyfunction
+    rate = measure(fw.parse, payloads, count)
+    print("{0:<30} {1:>10.0f} updates/s {2:+.0%}".format("translate + decode", rate, rate / legacy - 1))
+
+    fw = FirmwareState(echo=False)
+    rate = measure(fw.parse, payloads, count)
+    print("{0:<30} {1:>10.0f} updates/s {2:+.0%}".format("  + classname cache", rate, rate / legacy - 1))
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        echoed = measure(FirmwareState(echo=True).parse, payloads, count)
+        limited = measure(FirmwareState(echo=True, echoInterval=1.0).parse, payloads, count)
+    print("{0:<30} {1:>10.0f} updates/s".format("echo every update", echoed))
+    print("{0:<30} {1:>10.0f} updates/s".format("echo once per second", limited))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,69 @@
+"""
+Measures the time per frame of the LivePlot/BlitRenderer for different time windows and message rates, on the Agg
+backend. 50 Crownstones report one asset, each with its own mean rssi and a few dB of noise. After filling the window,
+frames are rendered while new reports keep arriving.
+
+    python -m BluenetTestSuite.benchmarks.liveplotbenchmark
+"""
+import datetime
+import random
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from BluenetTestSuite.utils.liveplot import LivePlot, BlitRenderer
+from BluenetTestSuite.utils.rssistream import RssiStream
+
+
+def fill(streams, rng, start, end, rate):
+    """
+    Adds reports at rate per second, round robin over the streams, between the datetimes start and end.
+    """
+    step = datetime.timedelta(seconds=1 / rate)
+    t = start
+    i = 0
+    while t < end:
+        stream = streams[i % len(streams)]
+        stream.addNewEntry(t, round(rng.gauss(-40 - stream.receiver, 4)))
+        t += step
+        i += 1
+
+
+def run(windows=(60, 180, 600), rates=(100, 1000), crownstonecount=50, frames=40, refreshRateMs=250, seed=1):
+    rng = random.Random(seed)
+    print("{0:>10} {1:>10} {2:>12} {3:>12}".format("window s", "reports/s", "ms/frame", "full draws"))
+    for window in windows:
+        for rate in rates:
+            fig, ax = plt.subplots(1, 1)
+            liveplot = LivePlot(ax, datetime.timedelta(seconds=window))
+            renderer = BlitRenderer(fig, [liveplot])
+            streams = [RssiStream("asset", receiver) for receiver in range(crownstonecount)]
+
+            now = datetime.datetime.now()
+            fill(streams, rng, now - datetime.timedelta(seconds=window), now, rate)
+            frame = datetime.timedelta(milliseconds=refreshRateMs)
+
+            duration = 0
+            for i in range(frames):
+                fill(streams, rng, now, now + frame, rate)
+                now += frame
+                t1 = time.perf_counter()
+                for stream in streams:
+                    stream.removeOldEntries(now - datetime.timedelta(seconds=window))
+                liveplot.setTimeWindow(now)
+                for stream in streams:
+                    liveplot.setStream(stream.receiver, stream,
+                                       marker='o', markersize=2, label=f"cs #{stream.receiver}", linestyle='-')
+                renderer.render()
+                t2 = time.perf_counter()
+                duration += t2 - t1
+            plt.close(fig)
+
+            print("{0:>10} {1:>10} {2:>12.1f} {3:>12}".format(
+                window, rate, duration / frames * 1000, renderer.fullDrawCount))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,59 @@
+"""
+Feeds the NearestCrownstoneValidator a simulated mesh: each asset is heard by a number of Crownstones, one of which
+is the nearest and moves to another Crownstone every few seconds. The simulated firmware reports the new nearest
+Crownstone with a fixed delay. Prints the throughput and the measured switch latency, which should be that delay.
+
+    python -m BluenetTestSuite.benchmarks.nearestvalidatorbenchmark
+"""
+import random
+import time
+
+from BluenetTestSuite.utils.nearestvalidator import NearestCrownstoneValidator
+
+
+def simulate(assetcount, crownstones=10, duration=60.0, reportInterval=0.5, moveInterval=5.0, delay=1.0, seed=1):
+    """
+    Returns a time ordered list of ["rssi", time, assetId, crownstoneId, rssi] and ["nearest", time, assetId, crownstoneId].
+    """
+    rng = random.Random(seed)
+    events = []
+    for assetId in range(assetcount):
+        offset = rng.uniform(0, reportInterval)
+        nearest = rng.randrange(crownstones)
+        reported = nearest
+        movetime = rng.uniform(0, moveInterval)
+        t = offset
+        while t < duration:
+            if t >= movetime:
+                nearest = (nearest + rng.randrange(1, crownstones)) % crownstones
+                movetime += moveInterval
+            for crownstoneId in range(crownstones):
+                rssi = -50 if crownstoneId == nearest else -70
+                events.append(["rssi", t, assetId, crownstoneId, rssi + rng.gauss(0, 1)])
+            if t - (movetime - moveInterval) >= delay:
+                reported = nearest
+            events.append(["nearest", t, assetId, reported])
+            t += reportInterval
+    events.sort(key=lambda event: event[1])
+    return events
+
+
+def run(assetcounts=(100, 1000, 5000)):
+    print("{0:>8} {1:>10} {2:>14} {3:>10}  {4}".format("assets", "events", "events/s", "mismatch", "switch latency (s)"))
+    for assetcount in assetcounts:
+        events = simulate(assetcount)
+        validator = NearestCrownstoneValidator(reportInterval=0)
+
+        t1 = time.perf_counter()
+        for event in events:
+            if event[0] == "rssi":
+                validator.rssi(event[2], event[3], event[4], event[1])
+            else:
+                validator.nearest(event[2], event[3], event[1])
+        t2 = time.perf_counter()
+        print("{0:>8} {1:>10} {2:>14.0f} {3:>10}  {4}".format(
+            assetcount, len(events), len(events) / (t2 - t1), validator.mismatchCount, validator.switchLatency))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,50 @@
+"""
+Measures the cost per frame of median filtering one rssi line of a 60 second window, at several ping rates:
+recomputing the list based median filter of rssidatatracker, recomputing it with numpy (slidingMedian), and
+filtering only the samples that arrived since the previous frame with a RollingMedian.
+
+    python -m BluenetTestSuite.benchmarks.rollingfilterbenchmark
+"""
+import random
+import time
+from statistics import median
+
+from BluenetTestSuite.utils.rollingfilter import RollingMedian, slidingMedian
+
+
+def listMedianFilter(list_of_floats, samples_per_median):
+    l = list_of_floats
+    M = len(l)
+    return [
+        median(l[max(k-samples_per_median, 0): k] or [l[0]]) for k in range(M)
+    ]
+
+
+def timeit(func, repeat):
+    t1 = time.perf_counter()
+    for i in range(repeat):
+        func()
+    t2 = time.perf_counter()
+    return (t2 - t1) / repeat
+
+
+def run(rates=(10, 100, 1000), window=60, refreshRateMs=250, samples_per_median=5, seed=1):
+    rng = random.Random(seed)
+    print("{0:>8} {1:>8} {2:>14} {3:>14} {4:>14}".format("pings/s", "samples", "list ms", "numpy ms", "rolling us"))
+    for rate in rates:
+        rssis = [float(rng.randrange(-90, -30)) for i in range(rate * window)]
+        newsamples = [float(rng.randrange(-90, -30)) for i in range(max(rate * refreshRateMs // 1000, 1))]
+
+        rollingmedian = RollingMedian(samples_per_median)
+        for rssi in rssis:
+            rollingmedian.push(rssi)
+
+        listduration = timeit(lambda: listMedianFilter(rssis, samples_per_median), 3)
+        numpyduration = timeit(lambda: slidingMedian(rssis, samples_per_median), 10)
+        rollingduration = timeit(lambda: [rollingmedian.push(rssi) for rssi in newsamples], 1000)
+        print("{0:>8} {1:>8} {2:>14.2f} {3:>14.2f} {4:>14.1f}".format(
+            rate, len(rssis), listduration * 1e3, numpyduration * 1e3, rollingduration * 1e6))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,62 @@
+"""
+Measures how fast the nearest crownstone plotter files incoming reports into their rssi streams when many assets
+are heard by many Crownstones: 100k AssetMacReports (one stream per asset, Crownstone pair) and 100k
+AssetIdReports (one nearest stream per asset), spread over 500 assets and 50 Crownstones.
+
+    python -m BluenetTestSuite.benchmarks.streamlookupbenchmark
+"""
+import datetime
+import random
+import time
+
+from crownstone_uart.core.uart.uartPackets.AssetIdReport import AssetIdReport
+from crownstone_uart.core.uart.uartPackets.AssetMacReport import AssetMacReport
+
+from BluenetTestSuite.testscripts.nearestcrownstoneplotter import NearestCrownstoneAlgorithmPlotter, \
+    handlePlottingQueueObject
+
+
+def macReport(asset, crownstone, rssi):
+    report = AssetMacReport()
+    report.assetMacAddress = ":".join("{0:02x}".format(b) for b in asset.to_bytes(6, "big"))
+    report.crownstoneId = crownstone
+    report.rssi = rssi
+    report.channel = 37
+    return report
+
+
+def idReport(asset, crownstone, rssi):
+    report = AssetIdReport()
+    report.assetId = asset
+    report.crownstoneId = crownstone
+    report.rssi = rssi
+    report.channel = 37
+    return report
+
+
+def replay(reports):
+    """
+    Returns the number of seconds it takes to handle the reports, spaced 1 ms apart.
+    """
+    plotter = NearestCrownstoneAlgorithmPlotter(plottingtimewindow_seconds=60, refreshRateMs=250)
+    start = datetime.datetime.now()
+    t1 = time.perf_counter()
+    for i, report in enumerate(reports):
+        handlePlottingQueueObject(report, start + datetime.timedelta(milliseconds=i), plotter)
+    t2 = time.perf_counter()
+    return t2 - t1
+
+
+def run(reportcount=100000, assetcount=500, crownstonecount=50, seed=1):
+    rng = random.Random(seed)
+    pairs = [(rng.randrange(assetcount), rng.randrange(crownstonecount), rng.randrange(-90, -30))
+             for i in range(reportcount)]
+
+    for name, build in [("AssetMacReport", macReport), ("AssetIdReport", idReport)]:
+        duration = replay([build(*pair) for pair in pairs])
+        print("{0:>15}: {1} reports in {2:.2f} s, {3:.0f} reports/s".format(
+            name, reportcount, duration, reportcount / duration))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,71 @@
+"""
+Measures how many (store, time, event) combinations the switch aggregator reference model evaluates per minute.
+
+    python -m BluenetTestSuite.benchmarks.switchaggregatormodelbenchmark
+"""
+import random
+import time
+
+from BluenetTestSuite.firmwarecontrol.behaviourstore import buildSwitchBehaviour, buildTwilight
+from BluenetTestSuite.firmwarecontrol.switchaggregator import SwitchCommandValue
+from BluenetTestSuite.firmwarecontrol.utils import getTime_uint32
+from BluenetTestSuite.referencemodel.switchaggregatormodel import BehaviourStoreModel, SwitchAggregatorModel
+
+
+def randomBehaviours(rng, maxcount=4):
+    behaviours = []
+    for i in range(rng.randint(1, maxcount)):
+        build = buildTwilight if rng.random() < 0.5 else buildSwitchBehaviour
+        fromhours = rng.randrange(24)
+        behaviours += [build(fromhours, fromhours + rng.randint(1, 12), rng.choice([0, 30, 50, 60, 70, 80, 100]))]
+    return behaviours
+
+
+def randomEvents(rng, count):
+    """
+    Returns a list of [posixtime, event] where event is None (only the time changes),
+    'switchcraft' or a switch command value.
+    """
+    switchvalues = [0, 50, 100,
+                    SwitchCommandValue.CS_SWITCH_CMD_VAL_BEHAVIOUR,
+                    SwitchCommandValue.CS_SWITCH_CMD_VAL_SMART_ON]
+    events = []
+    for i in range(count):
+        t = getTime_uint32(rng.randrange(24), rng.randrange(60), rng.randrange(7))
+        r = rng.random()
+        if r < 0.6:
+            events += [[t, None]]
+        elif r < 0.8:
+            events += [[t, "switchcraft"]]
+        else:
+            events += [[t, rng.choice(switchvalues)]]
+    return events
+
+
+def run(storecount=1000, eventsperstore=2000, seed=1):
+    rng = random.Random(seed)
+    stores = [randomBehaviours(rng) for i in range(storecount)]
+    events = randomEvents(rng, eventsperstore)
+
+    t1 = time.perf_counter()
+    evaluations = 0
+    for behaviours in stores:
+        model = SwitchAggregatorModel(BehaviourStoreModel(behaviours))
+        for posixtime, event in events:
+            model.setTime(posixtime)
+            if event is None:
+                pass
+            elif event == "switchcraft":
+                model.switchCraft()
+            else:
+                model.switchCommand(event)
+        evaluations += len(events)
+    t2 = time.perf_counter()
+
+    print("stores: {0}, events per store: {1}".format(storecount, eventsperstore))
+    print("evaluated {0} combinations in {1:.2f} s: {2:.2f} million per minute".format(
+        evaluations, t2 - t1, evaluations / (t2 - t1) * 60 / 1e6))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,72 @@
+"""
+Records 200k AssetMacReport messages (50 assets, 20 Crownstones) with a CaptureRecorder, replays them
+at maximum speed with a CaptureReplayer and checks that the replayed messages equal the recorded ones. Prints the
+number of messages per second for recording, replaying to a counting subscriber, and replaying into a DecodePool
+that decodes them with their recorded times, as the plotters do. The replays leave out the UartParser, so that only
+the capture and the DecodePool are measured.
+
+    python -m BluenetTestSuite.benchmarks.uartcapturebenchmark
+"""
+import os
+import random
+import tempfile
+import time
+
+from crownstone_uart.core.UartEventBus import UartEventBus
+from crownstone_uart.core.uart.UartTypes import UartRxType
+from crownstone_uart.core.uart.uartPackets.AssetMacReport import AssetMacReport
+from crownstone_uart.core.uart.uartPackets.UartMessagePacket import UartMessagePacket
+from crownstone_uart.topics.SystemTopics import SystemTopics
+
+from BluenetTestSuite.utils.decodepool import DecodePool
+from BluenetTestSuite.utils.uartcapture import CaptureRecorder, CaptureReplayer
+
+
+def macReportPayload(asset, crownstone, rssi):
+    return list(asset.to_bytes(6, "little")) + [crownstone, rssi & 0xFF, 37]
+
+
+def run(messagecount=200000, assetcount=50, crownstonecount=20, seed=1):
+    rng = random.Random(seed)
+    messages = [UartMessagePacket(UartRxType.ASSET_MAC_RSSI_REPORT,
+                                  macReportPayload(rng.randrange(assetcount), rng.randrange(crownstonecount),
+                                                   rng.randrange(-90, -30)))
+                for i in range(messagecount)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "session.cap")
+
+        with CaptureRecorder(filename) as recorder:
+            t1 = time.perf_counter()
+            for msg in messages:
+                UartEventBus.emit(SystemTopics.uartNewMessage, msg)
+            t2 = time.perf_counter()
+        print("record:            {0:>10.0f} messages/s, {1} bytes".format(
+            messagecount / (t2 - t1), os.path.getsize(filename)))
+
+        replayed = []
+        subscription = UartEventBus.subscribe(SystemTopics.uartNewMessage, replayed.append)
+        with CaptureReplayer(filename, speed=0, parse=False) as replayer:
+            replayer.replay()
+        UartEventBus.unsubscribe(subscription)
+        print("replay:            {0:>10.0f} messages/s".format(replayer.replayedCount / replayer.replayDuration))
+        identical = all(a.opCode == b.opCode and list(a.payload) == list(b.payload)
+                        for a, b in zip(messages, replayed))
+        print("identical:         {0}".format(identical and len(replayed) == messagecount))
+
+        decoded = []
+        pool = DecodePool({UartRxType.ASSET_MAC_RSSI_REPORT: AssetMacReport},
+                          [lambda packet, timestamp: decoded.append(packet)], maxQueueSize=messagecount)
+        replayer = CaptureReplayer(filename, speed=0, parse=False)
+        subscription = UartEventBus.subscribe(SystemTopics.uartNewMessage,
+                                              lambda msg: pool.submit(msg.opCode, msg.payload, replayer.clock()))
+        with pool, replayer:
+            t1 = time.perf_counter()
+            replayer.replay()
+        t2 = time.perf_counter()
+        UartEventBus.unsubscribe(subscription)
+        print("replay and decode: {0:>10.0f} messages/s, {1} decoded".format(messagecount / (t2 - t1), len(decoded)))
+
+
+if __name__ == "__main__":
+    run()
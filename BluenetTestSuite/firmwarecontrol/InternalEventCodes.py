@@ -32,6 +32,8 @@ class EventType(IntEnum):
     CMD_DIMMING_ALLOWED           = EventTypeCategory.InternalBaseSwitch + 8
     CMD_SWITCH_AGGREGATOR_RESET   = EventTypeCategory.InternalBaseSwitch + 9
 
+    CMD_CLEAR_ALL_BEHAVIOUR       = EventTypeCategory.InternalBaseBehaviour + 6
+
     CMD_SET_TIME                  = EventTypeCategory.InternalBaseSystem + 2
 
     CMD_UPLOAD_FILTER = EventTypeCategory.InternalBaseLocalisation + 9
@@ -0,0 +1,236 @@
+"""
+Asyncio flavour of datatransport. Messages are serialised exactly like in datatransport, but sending returns
+an awaitable instead of blocking, so that scripts can overlap independent commands:
+
+    results = await asyncio.gather(
+        send_command(ControlType.ALLOW_DIMMING, [1]),
+        send_event(EventType.CMD_TEST_SET_TIME, Conversion.uint32_to_uint8_array(t)))
+
+Note: crownstone_uart has a single, process wide, event bus. All open uarts in a process receive every write,
+so driving several devices concurrently requires one process per device.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+from crownstone_core.protocol.BluenetTypes import ResultValue
+
+from crownstone_uart.core.UartEventBus import UartEventBus
+from crownstone_uart.core.uart.UartTypes import UartTxType
+from crownstone_uart.topics.SystemTopics import SystemTopics
+from crownstone_uart.topics.UartTopics import UartTopics
+
+from BluenetTestSuite.firmwarecontrol import datatransport
+from BluenetTestSuite.firmwarecontrol.datatransport import buildUartWrapperPacket, buildEventMessage, buildControlMessage, \
+    buildHelloPacket
+
+
+class PendingReply:
+    """
+    A message that awaits a reply of the firmware. expired: the message timed out, its reply is to be dropped.
+    """
+    def __init__(self, future):
+        self.future = future
+        self.answered = False
+        self.expired = False
+        # time.monotonic() at which the message timed out.
+        self.expiryTime = None
+
+
+class AsyncDataTransport:
+    """
+    Resolves the futures of sent messages with the replies of the firmware, in the event loop that awaits them.
+
+    A command resolves to the next result packet of its command type, an event to the next hello reply, as each
+    event is followed by a hello. Replies are matched first in first out. A message that times out resolves to None,
+    and a reply to it that arrives within lateReplyTimeout seconds is dropped.
+
+    Limitation: hello replies don't identify their hello. A reply to another sender's hello (datatransport,
+    CrownstoneUart) that arrives while an event is pending resolves that event early.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # keeps the order of the pending queues equal to the order of the writes.
+        self.writeLock = threading.RLock()
+
+        # pendingResults: dict (commandtype -> deque of PendingReply)
+        self.pendingResults = dict()
+        # pendingHellos: deque of PendingReply
+        self.pendingHellos = deque()
+        # number of hello messages written by send_event that haven't been replied to.
+        self.unansweredHellos = 0
+        self.hellopacket = buildHelloPacket()
+
+        # seconds after a timeout during which a reply is taken as the late reply of the message that timed out.
+        self.lateReplyTimeout = 1.0
+
+        # statistics
+        self.lateReplyCount = 0
+        self.lostReplyCount = 0
+
+        self.subscriptions = [
+            UartEventBus.subscribe(SystemTopics.resultPacket, self.onResultPacket),
+            UartEventBus.subscribe(UartTopics.hello, self.onHello),
+        ]
+
+    def close(self):
+        for subscription in self.subscriptions:
+            UartEventBus.unsubscribe(subscription)
+        self.subscriptions = []
+
+    @staticmethod
+    def resolve(future, value):
+        """
+        Sets the result of future in the loop it belongs to. Can be called from any thread.
+        """
+        def setresult():
+            if not future.done():
+                future.set_result(value)
+        future.get_loop().call_soon_threadsafe(setresult)
+
+    def dropLost(self, pending):
+        """
+        Removes the messages from the front of pending that timed out more than lateReplyTimeout seconds ago, and
+        returns how many were removed. Call with self.lock held.
+        """
+        now = time.monotonic()
+        count = 0
+        while pending and pending[0].expired and now - pending[0].expiryTime > self.lateReplyTimeout:
+            pending.popleft()
+            count += 1
+        self.lostReplyCount += count
+        return count
+
+    def dropLostHellos(self):
+        """
+        As dropLost, for the events. Their hellos won't be replied to anymore either. Call with self.lock held.
+        """
+        self.unansweredHellos = max(self.unansweredHellos - self.dropLost(self.pendingHellos), 0)
+
+    async def waitForLateReplies(self, pending):
+        """
+        Waits until the messages in pending that timed out can no longer get a late reply.
+        """
+        with self.lock:
+            deadlines = [reply.expiryTime + self.lateReplyTimeout for reply in pending if reply.expired]
+        if deadlines:
+            delay = max(deadlines) - time.monotonic()
+            if delay > 0:
+                # just past the deadline, so that dropLost removes them.
+                await asyncio.sleep(delay + 0.001)
+
+    async def drain(self, commandtype):
+        """
+        Waits until the commands of commandtype that timed out can no longer get a late reply, and removes them
+        from the queue. Returns how many were removed. Commands that still await their reply are left alone.
+        """
+        with self.lock:
+            pending = self.pendingResults.setdefault(commandtype, deque())
+        await self.waitForLateReplies(pending)
+        with self.lock:
+            return self.dropLost(pending)
+
+    def popPending(self, pending):
+        """
+        Returns the future of the oldest message in pending, or None if there is none or if it timed out, in
+        which case the reply is a late one. Call with self.lock held.
+        """
+        if not pending:
+            return None
+        self.dropLost(pending)
+        if not pending:
+            return None
+        reply = pending.popleft()
+        if reply.expired:
+            self.lateReplyCount += 1
+            return None
+        reply.answered = True
+        return reply.future
+
+    def onResultPacket(self, resultpacket):
+        if resultpacket.resultCode == ResultValue.WAIT_FOR_SUCCESS:
+            return
+        with self.lock:
+            future = self.popPending(self.pendingResults.get(resultpacket.commandTypeUInt16))
+        if future is not None:
+            self.resolve(future, resultpacket)
+
+    def onHello(self, hellopacket):
+        with self.lock:
+            self.dropLostHellos()
+            if self.unansweredHellos == 0:
+                return
+            self.unansweredHellos -= 1
+            future = self.popPending(self.pendingHellos)
+        if future is not None:
+            self.resolve(future, None)
+
+    async def waitFor(self, reply, timeout):
+        """
+        Awaits the reply for at most timeout seconds (datatransport.uartCommandTimeout if None).
+        Returns None on timeout, the reply then stays queued as expired for lateReplyTimeout seconds.
+        """
+        try:
+            return await asyncio.wait_for(reply.future, datatransport.uartCommandTimeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self.lock:
+                if not reply.answered and not reply.expired:
+                    reply.expired = True
+                    reply.expiryTime = time.monotonic()
+
+    async def send_command(self, commandtype, packetcontent, timeout=None):
+        """
+        Sends a control command, see datatransport.sendCommandToCrownstone.
+        Resolves to the result packet of the command, or None if the firmware didn't reply in time.
+        """
+        uartpacket = buildUartWrapperPacket(UartTxType.CONTROL, buildControlMessage(commandtype, packetcontent))
+        reply = PendingReply(asyncio.get_running_loop().create_future())
+        with self.lock:
+            pending = self.pendingResults.setdefault(commandtype, deque())
+        await self.waitForLateReplies(pending)
+        with self.writeLock:
+            with self.lock:
+                self.dropLost(pending)
+                pending.append(reply)
+            UartEventBus.emit(SystemTopics.uartWriteData, uartpacket)
+
+        return await self.waitFor(reply, timeout)
+
+    async def send_event(self, cs_event_type, cs_event_data, timeout=None):
+        """
+        Sends an event over the firmware internal event bus, see datatransport.sendEventToCrownstone.
+        Resolves to None once the firmware has handled the event.
+        """
+        uartpacket = buildUartWrapperPacket(UartTxType.MOCK_INTERNAL_EVT, buildEventMessage(cs_event_type, cs_event_data))
+        reply = PendingReply(asyncio.get_running_loop().create_future())
+        await self.waitForLateReplies(self.pendingHellos)
+        with self.writeLock:
+            with self.lock:
+                self.dropLostHellos()
+                self.pendingHellos.append(reply)
+                self.unansweredHellos += 1
+            UartEventBus.emit(SystemTopics.uartWriteData, uartpacket)
+            UartEventBus.emit(SystemTopics.uartWriteData, self.hellopacket)
+
+        return await self.waitFor(reply, timeout)
+
+
+defaultTransport = None
+
+def getAsyncDataTransport():
+    """
+    Returns the AsyncDataTransport used by send_command and send_event, constructing it on first use.
+    """
+    global defaultTransport
+    if defaultTransport is None:
+        defaultTransport = AsyncDataTransport()
+    return defaultTransport
+
+async def send_command(commandtype, packetcontent, timeout=None):
+    return await getAsyncDataTransport().send_command(commandtype, packetcontent, timeout)
+
+async def send_event(cs_event_type, cs_event_data, timeout=None):
+    return await getAsyncDataTransport().send_event(cs_event_type, cs_event_data, timeout)
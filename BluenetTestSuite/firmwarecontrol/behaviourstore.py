@@ -25,5 +25,5 @@ def sendBehaviour(index, behaviour):
     sleepAfterUartCommand()
 
 def sendClearBehaviourStoreEvent():
-    sendEventToCrownstone(0x100 + 170 + 6, [])
+    sendEventToCrownstone(EventType.CMD_CLEAR_ALL_BEHAVIOUR, [])
     sleepAfterUartCommand()
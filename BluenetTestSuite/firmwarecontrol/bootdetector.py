@@ -0,0 +1,89 @@
+from crownstone_core.protocol.BluenetTypes import ControlType
+
+from crownstone_uart.core.UartEventBus import UartEventBus
+from crownstone_uart.core.uart.UartTypes import UartRxType
+from crownstone_uart.topics.SystemTopics import SystemTopics
+
+import threading
+import time
+
+# seconds after a reset within which the dimmer has powered up, the fixed wait fullReset used to have.
+# The firmware doesn't report the dimmer powering up: tests that dim wait with FirmwareState.waitFor for the
+# Dimmer or SafeSwitch state they need, using this as timeout.
+DIMMER_POWER_UP_DELAY = 70.0
+
+# seconds fullReset waits for the crownstone to boot.
+BOOT_TIMEOUT = 20.0
+
+class BootDetector:
+    """
+    Detects the crownstone (re)booting from the uart stream. Use in a with-statement around the command
+    that resets the crownstone so that the subscriptions are in place before it goes down:
+
+        with BootDetector() as boot:
+            sendCommandToCrownstone(ControlType.RESET, [])
+            boot.wait(10)
+        print(boot.bootTime)
+
+    The crownstone is considered booted on the first BOOTED message, or on the first FIRMWARESTATE message
+    after the reset command was acknowledged for firmware that doesn't send BOOTED.
+
+    bootTime is in seconds since entering the with-statement, None until detected.
+    """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.subscriptions = []
+        self.startTime = None
+        self.resetAcknowledged = False
+        self.bootTime = None
+
+    def __enter__(self):
+        with self.condition:
+            self.startTime = time.monotonic()
+            self.resetAcknowledged = False
+            self.bootTime = None
+        self.subscriptions = [
+            UartEventBus.subscribe(SystemTopics.uartNewMessage, self.onMessage),
+            UartEventBus.subscribe(SystemTopics.resultPacket, self.onResultPacket),
+        ]
+        return self
+
+    def __exit__(self, type, value, traceback):
+        for subscription in self.subscriptions:
+            UartEventBus.unsubscribe(subscription)
+        self.subscriptions = []
+
+    def elapsed(self):
+        return time.monotonic() - self.startTime
+
+    def onResultPacket(self, resultpacket):
+        if resultpacket.commandTypeUInt16 == ControlType.RESET:
+            with self.condition:
+                self.resetAcknowledged = True
+
+    def onMessage(self, dataPacket):
+        if dataPacket.opCode == UartRxType.BOOTED:
+            with self.condition:
+                self.booted()
+        elif dataPacket.opCode == UartRxType.FIRMWARESTATE:
+            with self.condition:
+                if self.resetAcknowledged:
+                    self.booted()
+
+    def booted(self):
+        if self.bootTime is None:
+            self.bootTime = self.elapsed()
+            self.condition.notify_all()
+
+    def wait(self, timeout):
+        """
+        Blocks until the crownstone has booted or timeout seconds have passed since entering the with-statement.
+        Returns bootTime, or None on timeout.
+        """
+        with self.condition:
+            while self.bootTime is None:
+                remaining = self.startTime + timeout - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            return self.bootTime
@@ -1,27 +1,153 @@
 from crownstone_core.util.Conversion import Conversion
 from crownstone_core.protocol.BlePackets import ControlPacket
+from crownstone_core.protocol.BluenetTypes import ResultValue
 
 from crownstone_uart.core.UartEventBus import UartEventBus
+from crownstone_uart.core.uart.uartPackets.UartCommandHelloPacket import UartCommandHelloPacket
 from crownstone_uart.core.uart.uartPackets.UartWrapperPacket import UartWrapperPacket
 from crownstone_uart.core.uart.UartTypes import UartTxType, UartMessageType
 from crownstone_uart.topics.SystemTopics import SystemTopics
+from crownstone_uart.topics.UartTopics import UartTopics
 
+import threading
 import time
 
+# When True, sending a uart message blocks until the firmware acknowledged it (see UartCommandAcknowledgement).
+# When False, every message is followed by a fixed sleep of uartCommandTimeout seconds.
+ackDrivenCompletion = True
+
+# Maximum time in seconds to wait for an acknowledgement. This is also the length of the fixed sleep
+# when ackDrivenCompletion is disabled.
+uartCommandTimeout = 1.0
+
+def setAckDrivenCompletion(enabled, timeout=None):
+    """
+    Switches between ack driven completion of uart commands and the fixed delay after each command.
+    timeout: if not None, replaces uartCommandTimeout.
+    """
+    global ackDrivenCompletion, uartCommandTimeout
+    ackDrivenCompletion = enabled
+    if timeout is not None:
+        uartCommandTimeout = timeout
+
 def sleepAfterUartCommand():
-    time.sleep(1)
+    """
+    Gives the firmware time to handle the previous command. This is a no-op when ack driven completion
+    is enabled as the command already returned after the firmware acknowledged it.
+    """
+    if not ackDrivenCompletion:
+        time.sleep(uartCommandTimeout)
 
-def sendUnencryptedUartMessage(txType, data):
+class UartCommandAcknowledgement:
     """
-    Creates a uart wrapper packet, emits an event on the uart event bus and sleeps
-    a short moment to give firmware time to parse things.
+    Waits for the firmware to acknowledge a single uart message. Use in a with-statement around the emit
+    of the message so that the subscriptions on the event bus are in place before the message is written.
+
+    Control commands are acknowledged by a result packet with a matching command type. Intermediate
+    WAIT_FOR_SUCCESS results are skipped. Messages that have no reply, such as MOCK_INTERNAL_EVT, must be
+    followed by a hello message (see buildHelloPacket): the firmware handles uart messages in order, so
+    its hello reply indicates that the message before it has been handled. Hellos that arrive before our hello
+    has been written, such as the one the firmware sends after a reboot, are ignored.
+    """
+    def __init__(self, commandtype=None):
+        self.commandtype = commandtype
+        self.resultpacket = None
+        self.hellopacket = buildHelloPacket() if commandtype is None else None
+        self.helloWritten = False
+        self.completed = threading.Event()
+        self.subscriptions = []
+
+    def __enter__(self):
+        self.subscriptions = [
+            UartEventBus.subscribe(SystemTopics.uartWriteSuccess, self.onWriteSuccess),
+            UartEventBus.subscribe(UartTopics.hello, self.onHello),
+            UartEventBus.subscribe(SystemTopics.resultPacket, self.onResultPacket),
+        ]
+        return self
+
+    def __exit__(self, type, value, traceback):
+        for subscription in self.subscriptions:
+            UartEventBus.unsubscribe(subscription)
+        self.subscriptions = []
+
+    def onWriteSuccess(self, data):
+        if self.hellopacket is not None and list(data) == self.hellopacket:
+            self.helloWritten = True
+
+    def onHello(self, hellopacket):
+        if self.commandtype is None and self.helloWritten:
+            self.completed.set()
+
+    def onResultPacket(self, resultpacket):
+        if self.commandtype is None or resultpacket.commandTypeUInt16 != self.commandtype:
+            return
+        if resultpacket.resultCode == ResultValue.WAIT_FOR_SUCCESS:
+            return
+        self.resultpacket = resultpacket
+        self.completed.set()
+
+    def wait(self, timeout):
+        """
+        Blocks until the message is acknowledged or timeout seconds have passed.
+        Returns True if the message was acknowledged.
+        """
+        return self.completed.wait(timeout)
+
+def buildUartWrapperPacket(txType, data):
+    """
+    Returns the serialized, unencrypted uart wrapper packet for a message of type txType.
     """
     uart_message = []
     uart_message += Conversion.uint16_to_uint8_array(txType)
     uart_message += data
-    uart_warpper_packet = UartWrapperPacket(UartMessageType.UART_MESSAGE,uart_message).serialize()
-    UartEventBus.emit(SystemTopics.uartWriteData, uart_warpper_packet)
-    sleepAfterUartCommand()
+    return UartWrapperPacket(UartMessageType.UART_MESSAGE,uart_message).serialize()
+
+def buildHelloPacket():
+    """
+    Returns the serialized uart wrapper packet of a hello message, which the firmware replies to.
+    """
+    return buildUartWrapperPacket(UartTxType.HELLO, UartCommandHelloPacket().serialize())
+
+def buildEventMessage(cs_event_type, cs_event_data):
+    """
+    Returns the data of a MOCK_INTERNAL_EVT uart message for the firmware internal event bus.
+    """
+    uart_message = []
+    uart_message += Conversion.uint16_to_uint8_array(cs_event_type)
+    uart_message += cs_event_data
+    return uart_message
+
+def buildControlMessage(commandtype, packetcontent):
+    """
+    Returns the data of a CONTROL uart message.
+    """
+    controlPacket = ControlPacket(commandtype)
+    controlPacket.appendByteArray(packetcontent)
+    return controlPacket.serialize()
+
+def sendUnencryptedUartMessage(txType, data, commandtype=None):
+    """
+    Creates a uart wrapper packet and emits an event on the uart event bus. Then waits until the firmware
+    acknowledged the message, or at most uartCommandTimeout seconds. (When ack driven completion is
+    disabled it always sleeps that long to give firmware time to parse things.)
+
+    commandtype: control command type of the result packet that acknowledges this message,
+    or None if the firmware doesn't reply to it.
+    Returns the received result packet, or None if there wasn't any.
+    """
+    uart_warpper_packet = buildUartWrapperPacket(txType, data)
+
+    if not ackDrivenCompletion:
+        UartEventBus.emit(SystemTopics.uartWriteData, uart_warpper_packet)
+        sleepAfterUartCommand()
+        return None
+
+    with UartCommandAcknowledgement(commandtype) as acknowledgement:
+        UartEventBus.emit(SystemTopics.uartWriteData, uart_warpper_packet)
+        if commandtype is None:
+            UartEventBus.emit(SystemTopics.uartWriteData, acknowledgement.hellopacket)
+        acknowledgement.wait(uartCommandTimeout)
+        return acknowledgement.resultpacket
 
 
 def sendEventToCrownstone(cs_event_type, cs_event_data):
@@ -30,17 +156,13 @@ def sendEventToCrownstone(cs_event_type, cs_event_data):
     eventtype: CS_TYPE
     eventdata: corresponds to eventtype.
     """
-    uart_message = []
-    uart_message += Conversion.uint16_to_uint8_array(cs_event_type)
-    uart_message += cs_event_data
-    sendUnencryptedUartMessage(UartTxType.MOCK_INTERNAL_EVT, uart_message)
+    sendUnencryptedUartMessage(UartTxType.MOCK_INTERNAL_EVT, buildEventMessage(cs_event_type, cs_event_data))
 
 def sendCommandToCrownstone(commandtype, packetcontent):
     """
     Send a control command to the crownstone with the given commandtype.
     commandtype: as documented in PROTOCOL.md#command-types
     packetcontent: as documented in PROTOCOL.md
+    Returns the result packet of the command, or None if the firmware didn't reply in time.
     """
-    controlPacket = ControlPacket(commandtype)
-    controlPacket.appendByteArray(packetcontent)
-    sendUnencryptedUartMessage(UartTxType.CONTROL, controlPacket.serialize())
+    return sendUnencryptedUartMessage(UartTxType.CONTROL, buildControlMessage(commandtype, packetcontent), commandtype)
@@ -2,22 +2,34 @@
 Just a bunch of common methods
 """
 
-import time
+import logging
 
 from crownstone_core.protocol.BluenetTypes import ControlType, StateType
 from crownstone_core.util.Conversion import Conversion
 
 from BluenetTestSuite.firmwarecontrol.datatransport import *
+from BluenetTestSuite.firmwarecontrol.bootdetector import BootDetector, BOOT_TIMEOUT
 from BluenetTestSuite.firmwarecontrol.InternalEventCodes import EventType
 
 
 
-def fullReset():
-    print("Resetting crownstone and waiting for dimmer to have started for a cleaner test.")
-    sendCommandToCrownstone(ControlType.RESET, [])
-    for t in reversed(range(7)):
-        print("sleeping for {0} more seconds".format((t + 1) * 10))
-        time.sleep(10)
+def fullReset(timeout=BOOT_TIMEOUT):
+    """
+    Resets the crownstone and waits until it has booted, or timeout seconds have passed.
+    The dimmer may not have powered up yet when this returns: tests that dim should wait for the Dimmer or
+    SafeSwitch state they need with FirmwareState.waitFor, see bootdetector.DIMMER_POWER_UP_DELAY.
+    Returns the BootDetector, its bootTime contains the measured duration.
+    """
+    print("Resetting crownstone and waiting for it to boot for a cleaner test.")
+    with BootDetector() as boot:
+        sendCommandToCrownstone(ControlType.RESET, [])
+        boot.wait(timeout)
+
+    if boot.bootTime is None:
+        logging.warning("fullReset: no boot detected within {0} seconds".format(timeout))
+    else:
+        print("booted after {0:.2f} seconds".format(boot.bootTime))
+    return boot
 
 def getTime_uint32(hours, minutes, day=None):
     # day != 0  && (hours != 0 || minutes != 0): sunday
@@ -1,4 +1,4 @@
-import time, inspect, sys
+import time, inspect, sys, threading
 
 import datetime
 import pprint
@@ -11,32 +11,68 @@ from crownstone_uart.core.uart.UartTypes import UartRxType
 from crownstone_uart.topics.SystemTopics import SystemTopics
 
 
-from BluenetTestSuite.firmwarestate.firmwarestatehistoryentry import FirmwareStateHistoryEntry
+from BluenetTestSuite.firmwarestate.firmwarestatehistory import FirmwareStateHistory
 
 import logging
 logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.INFO)
 
+# argument for bytes.translate that deletes all non-ascii bytes.
+NON_ASCII_BYTES = bytes(range(128, 256))
+
 class FirmwareState:
     """
     Listens to UART over a port and keeps track of any state values logged by the firmware.
+
+    echo: print every state update to the console.
+    echoInterval: if non-zero, print at most one state update per echoInterval seconds, together
+    with the number of updates that weren't printed.
+    clock: returns the posix time with which the history entries are stamped, e.g. CaptureReplayer.clock
+    to keep the recorded times of a replayed capture.
     """
-    def __init__(self):
+    def __init__(self, echo=True, echoInterval=0.0, clock=time.time):
         self.uartSubscription = UartEventBus.subscribe(SystemTopics.uartNewMessage, self.parse)
 
         # statedict: dict (int -> dict (string -> value) ),
         # thisptr -> valuename -> value
         self.statedict = dict()
-        self.historylist = []
+        # historylist: FirmwareStateHistory, behaves as a list of FirmwareStateHistoryEntry
+        self.historylist = FirmwareStateHistory()
+
+        # classindex: dict (string -> dict (int -> dict (string -> value) ) ),
+        # typename -> thisptr -> statedict[thisptr]. Keeps queries by classname independent of the number
+        # of tracked objects. Kept up to date by construct, destruct and pushstatevalue.
+        self.classindex = dict()
+
+        # guards statedict, classindex and historylist: parse runs on the uart thread while
+        # tests query from their own thread.
+        self.lock = threading.RLock()
+        # notified after every parsed update, see waitUntil.
+        self.updated = threading.Condition(self.lock)
 
         # list of callbacks taking one firmwarestatehistoryentry as parameter
         self.onNewEntryParsed = []
+        # list of callbacks without parameters, called after clear
+        self.onCleared = []
+
+        # classnamecache: dict (string -> string), __PRETTY_FUNCTION__ -> classname
+        self.classnamecache = dict()
+
+        self.clock = clock
+        self.echo = echo
+        self.echoInterval = echoInterval
+        self.lastEchoTime = 0.0
+        self.suppressedEchoCount = 0
 
     def clear(self):
         """
         Clears the state dict.
         """
-        self.statedict.clear()
-        self.historylist.clear()
+        with self.lock:
+            self.statedict.clear()
+            self.classindex.clear()
+            self.historylist.clear()
+            for callback in self.onCleared:
+                callback()
 
     def classnamefromprettyfunction(self, prettyfunctionname):
         classname = ""
@@ -48,10 +84,36 @@ class FirmwareState:
             classname = prettyfunctionname.split("::")[0].split(" ")[-1]
         except Exception as inst:
             # the exception instance
-            print("couldn't identify classname: " + type(inst) + " " + prettyfunctionname)
+            print("couldn't identify classname: " + str(type(inst)) + " " + prettyfunctionname)
             pass
         return classname
 
+    def classnameof(self, prettyfunctionname):
+        """
+        Memoised classnamefromprettyfunction: the firmware logs from a limited number of functions.
+        """
+        classname = self.classnamecache.get(prettyfunctionname)
+        if classname is None:
+            classname = self.classnamecache[prettyfunctionname] = self.classnamefromprettyfunction(prettyfunctionname)
+        return classname
+
+    def echoUpdate(self, stringResult):
+        """
+        Prints a state update, taking self.echo and self.echoInterval into account.
+        """
+        if not self.echo:
+            return
+        if self.echoInterval:
+            now = time.monotonic()
+            if now - self.lastEchoTime < self.echoInterval:
+                self.suppressedEchoCount += 1
+                return
+            self.lastEchoTime = now
+            if self.suppressedEchoCount:
+                stringResult += " ({0} updates not shown)".format(self.suppressedEchoCount)
+                self.suppressedEchoCount = 0
+        print("{0}firmware state update: {2}{1}".format(Fore.LIGHTBLACK_EX,Style.RESET_ALL,stringResult))
+
     def parse(self, dataPacket):
         """
         Parses a message from crownstone of type UartRxType.FIRMWARESTATE, and calls the installed callbacks
@@ -59,79 +121,110 @@ class FirmwareState:
         """
         opCode = dataPacket.opCode
         if opCode == UartRxType.FIRMWARESTATE:
-            stringResult = ""
-            for byte in dataPacket.payload:
-                if byte < 128:
-                    stringResult += chr(byte)
+            stringResult = bytes(dataPacket.payload).translate(None, NON_ASCII_BYTES).decode("ascii")
 
-            print("{0}firmware state update: {2}{1}".format(Fore.LIGHTBLACK_EX,Style.RESET_ALL,stringResult))
-            statelist = stringResult.split("@")
+            self.echoUpdate(stringResult)
+            statelist = stringResult.split("@", 3)
+            if len(statelist) < 4:
+                print("couldn't parse firmware state update: " + stringResult)
+                return
 
-            try:
-                statelist[1] = self.classnamefromprettyfunction(statelist[1])
-            except:
-                print(stringResult)
+            statelist[1] = self.classnameof(statelist[1])
 
-            self.pushstatevalue("0x" + statelist[0], statelist[1], statelist[2], statelist[3])
-            self.pushhistoryvalue("0x" + statelist[0], statelist[1], statelist[2], statelist[3])
+            with self.lock:
+                self.pushstatevalue("0x" + statelist[0], statelist[1], statelist[2], statelist[3])
+                self.pushhistoryvalue("0x" + statelist[0], statelist[1], statelist[2], statelist[3])
+                newentry = self.historylist[-1]
+                self.updated.notify_all()
 
             for callback in self.onNewEntryParsed:
-                callback(self.historylist[-1])
+                callback(newentry)
 
     def construct(self, ptr, typename):
         """
         Appends [typename] to self.statedict[ptr]["typename."].
         """
-        if ptr not in self.statedict:
-            self.statedict[ptr] = dict()
-            self.statedict[ptr]["typename"] = ""
-        self.statedict[ptr]["typename"] += typename
+        with self.lock:
+            if ptr not in self.statedict:
+                self.statedict[ptr] = dict()
+                self.statedict[ptr]["typename"] = ""
+            self.settypename(ptr, self.statedict[ptr]["typename"] + typename)
 
     def destruct(self, ptr):
         """
         Removes the object with address [ptr] from [self.statedict]
         """
-        self.statedict.pop(ptr, None)
+        with self.lock:
+            obj = self.statedict.pop(ptr, None)
+            if obj is not None:
+                self.unindex(ptr, obj.get("typename"))
+
+    def settypename(self, ptr, typename):
+        """
+        Sets the typename of the object with address [ptr] and moves it in the class index accordingly.
+        """
+        obj = self.statedict[ptr]
+        self.unindex(ptr, obj.get("typename"))
+        obj["typename"] = typename
+        self.classindex.setdefault(typename, dict())[ptr] = obj
+
+    def unindex(self, ptr, typename):
+        objects = self.classindex.get(typename)
+        if objects is not None:
+            objects.pop(ptr, None)
+            if not objects:
+                del self.classindex[typename]
+
+    def objectsOfClass(self, classname):
+        """
+        Returns a list of the value dicts of all objects of type [classname].
+        """
+        with self.lock:
+            return list(self.classindex.get(classname, dict()).values())
 
     def pushstatevalue(self, ptr, classname, valuename, value):
         """
         Add or update value in the state dict. If ptr wasn't contained in it yet, adds an entry
         """
-        if ptr not in self.statedict:
-            self.construct(ptr, classname)
+        with self.lock:
+            if ptr not in self.statedict:
+                self.construct(ptr, classname)
 
-        self.statedict[ptr][valuename] = value
+            if valuename == "typename":
+                self.settypename(ptr, value)
+            else:
+                self.statedict[ptr][valuename] = value
 
     def pushhistoryvalue(self, ptr, classname, valuename, value):
         """
         Adds a record to the historylist.
         """
-        self.historylist += [FirmwareStateHistoryEntry(
-            datetime.datetime.now(), ptr, classname, valuename, value)]
+        with self.lock:
+            self.historylist.append(self.clock(), ptr, classname, valuename, value)
 
     def printhistory(self):
         prettyprinter = pprint.PrettyPrinter(indent=4)
         prettyprint = prettyprinter.pprint
-        prettyprint(self.historylist)
+        with self.lock:
+            prettyprint(self.historylist)
 
     def print(self):
         prettyprinter = pprint.PrettyPrinter(indent=4)
         prettyprint = prettyprinter.pprint
-        prettyprint(self.statedict)
+        with self.lock:
+            prettyprint(self.statedict)
 
     def getValue(self, classname, expressionname):
-        for ptr, obj in self.statedict.items():
-            if obj.get('typename') == classname:
-                return obj.get(expressionname)
+        for obj in self.objectsOfClass(classname):
+            return obj.get(expressionname)
         return None
 
     def getValues(self, classname, expressionname):
         result = []
-        for ptr, obj in self.statedict.items():
-            if obj.get('typename') == classname:
-                value = obj.get(expressionname)
-                if value is not None:
-                    result += [value]
+        for obj in self.objectsOfClass(classname):
+            value = obj.get(expressionname)
+            if value is not None:
+                result += [value]
         return result
 
     def assertFindFailuresMulti(self, classname, expressionname, values):
@@ -145,21 +238,58 @@ class FirmwareState:
 
         Note: value will be stringified.
         """
-        failures = []
         strvalues = [str(value) for value in values]
-        existsAny = False
-        for ptr, obj in self.statedict.items():
-            if obj.get('typename') == classname:
-                existsAny = True
-                if obj.get(expressionname) not in strvalues:
-                    failures += [ptr]
-        if existsAny:
-            return failures
-        return None
+        with self.lock:
+            objects = self.classindex.get(classname)
+            if not objects:
+                return None
+            return [ptr for ptr, obj in objects.items() if obj.get(expressionname) not in strvalues]
 
     def assertFindFailures(self, classname, expressionname, value):
         return self.assertFindFailuresMulti(classname, expressionname, [value])
 
+    def waitUntil(self, condition, timeout=10.0):
+        """
+        Blocks until condition() returns a non-Falsey value or timeout seconds have passed.
+        The condition is evaluated with self.lock held, once now and again after every parsed update.
+
+        Returns the last value returned by condition.
+        """
+        deadline = time.monotonic() + timeout
+        with self.updated:
+            result = condition()
+            while not result:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.updated.wait(remaining)
+                result = condition()
+            return result
+
+    def waitFor(self, classname, expressionname, predicate, timeout=10.0):
+        """
+        Blocks until all objects of type [classname] have a value for [expressionname] that satisfies
+        [predicate], or timeout seconds have passed. Returns True if it was satisfied.
+
+        predicate: a function taking the (string) value, or a value to compare with. In the latter case
+        the value will be stringified, as in assertFindFailures.
+        """
+        if not callable(predicate):
+            expected = str(predicate)
+            predicate = lambda value: value == expected
+
+        def satisfied():
+            objects = self.classindex.get(classname)
+            if not objects:
+                return False
+            for obj in objects.values():
+                value = obj.get(expressionname)
+                if value is None or not predicate(value):
+                    return False
+            return True
+
+        return self.waitUntil(satisfied, timeout)
+
 class Main:
     """
     If this file is run as stand alone script, it will output the current state of the firmware.
@@ -0,0 +1,135 @@
+import datetime
+from array import array
+
+from BluenetTestSuite.firmwarestate.firmwarestatehistoryentry import FirmwareStateHistoryEntry
+
+
+class StringTable:
+    """
+    Interns strings: maps each distinct string to a small integer id and back.
+    """
+    def __init__(self):
+        self.ids = dict()
+        self.strings = []
+
+    def intern(self, string):
+        stringid = self.ids.get(string)
+        if stringid is None:
+            stringid = self.ids[string] = len(self.strings)
+            self.strings.append(string)
+        return stringid
+
+    def find(self, string):
+        """
+        Returns the id of string, or None if it was never interned.
+        """
+        return self.ids.get(string)
+
+    def clear(self):
+        self.ids.clear()
+        self.strings.clear()
+
+
+class FirmwareStateHistory:
+    """
+    Append-only, columnar storage of the firmware state history.
+
+    Each column is an array: times as posix timestamps (float64) and ptrs, class names, value names
+    and values as ids into string tables. This takes a few tens of bytes per entry instead
+    of a python object holding a datetime and four strings.
+
+    Indexing and iterating yield FirmwareStateHistoryEntry views, so that the history can be used
+    as the list of entries it used to be.
+    """
+    def __init__(self):
+        self.times = array('d')
+        self.ptrs = array('I')
+        self.classnames = array('I')
+        self.valuenames = array('I')
+        self.values = array('I')
+
+        # ptrs are interned in their original notation: "0xA" and "0xa" stay distinct entries,
+        # as they were when the history was a list of entries.
+        self.ptrtable = StringTable()
+        self.classnametable = StringTable()
+        self.valuenametable = StringTable()
+        self.valuetable = StringTable()
+
+    def append(self, time, ptr, classname, valuename, value):
+        """
+        time: posix timestamp in seconds.
+        """
+        self.times.append(time)
+        self.ptrs.append(self.ptrtable.intern(ptr))
+        self.classnames.append(self.classnametable.intern(classname))
+        self.valuenames.append(self.valuenametable.intern(valuename))
+        self.values.append(self.valuetable.intern(value))
+
+    def clear(self):
+        for column in [self.times, self.ptrs, self.classnames, self.valuenames, self.values]:
+            del column[:]
+        self.ptrtable.clear()
+        self.classnametable.clear()
+        self.valuenametable.clear()
+        self.valuetable.clear()
+
+    def entry(self, index):
+        """
+        Returns a FirmwareStateHistoryEntry view of the entry at index.
+        """
+        return FirmwareStateHistoryEntry(
+            datetime.datetime.fromtimestamp(self.times[index]),
+            self.ptrtable.strings[self.ptrs[index]],
+            self.classnametable.strings[self.classnames[index]],
+            self.valuenametable.strings[self.valuenames[index]],
+            self.valuetable.strings[self.values[index]])
+
+    def value(self, index):
+        """
+        Returns the value of the entry at index, without constructing the entry.
+        """
+        return self.valuetable.strings[self.values[index]]
+
+    def indices(self, classname=None, valuename=None):
+        """
+        Returns the indices of the entries with the given classname and/or valuename,
+        comparing interned ids instead of strings.
+        """
+        classid = None if classname is None else self.classnametable.find(classname)
+        valueid = None if valuename is None else self.valuenametable.find(valuename)
+        if (classname is not None and classid is None) or (valuename is not None and valueid is None):
+            return []
+        return [i for i in range(len(self))
+                if (classid is None or self.classnames[i] == classid)
+                and (valueid is None or self.valuenames[i] == valueid)]
+
+    def filter(self, classname=None, valuename=None):
+        """
+        Returns the entries with the given classname and/or valuename as a list of FirmwareStateHistoryEntry.
+        """
+        return [self.entry(i) for i in self.indices(classname, valuename)]
+
+    def __len__(self):
+        # values is the last column append writes to, so that entries are
+        # complete up to this length while another thread is appending.
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.entry(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        return self.entry(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.entry(i)
+
+    def __reversed__(self):
+        for i in reversed(range(len(self))):
+            yield self.entry(i)
+
+    def __repr__(self):
+        return repr(list(self))
@@ -4,6 +4,8 @@ class FirmwareStateHistoryEntry:
     """
     [[datetime.datetime.now(), ptr, classname, valuename, value]]
     """
+    __slots__ = ["time", "ptr", "classname", "valuename", "value"]
+
     def __init__(self, time, ptr, classname, valuename, value):
         self.time = time
         self.ptr = ptr
@@ -0,0 +1,294 @@
+"""
+Executable reference model of the behaviour store, the behaviour and twilight conflict resolution and the
+SwitchAggregator (override, switchcraft, dumb home mode). Use it to generate the expected values of a scenario
+instead of writing them by hand:
+
+    store = BehaviourStoreModel([buildTwilight(9, 12, 80), buildSwitchBehaviour(13, 15, 100)])
+    model = SwitchAggregatorModel(store)
+    model.setTime(getTime_uint32(10, 0))
+    model.switchCraft()
+    model.getState()  # {'_overrideState': '255', '_behaviourState': '0', '_twilightState': '80', ...}
+
+The values returned by getState are formatted the way FirmwareState stores them, so that they can be passed to
+TestScenario.addExpect directly.
+
+Evaluating a store at a given time is a table lookup: the outcome of the conflict resolution is cached per minute
+of the week, which is exact as long as behaviour times are whole minutes (as buildSwitchBehaviour and
+buildTwilight produce). That keeps the model fast enough to check millions of (store, time, event)
+combinations per minute, see benchmarks/switchaggregatormodelbenchmark.py.
+"""
+from crownstone_core.packets.behaviour.BehaviourTypes import BehaviourType
+from crownstone_core.packets.behaviour.TimeDescription import BehaviourTimeType
+
+from BluenetTestSuite.firmwarecontrol.switchaggregator import SwitchCommandValue
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# the unix epoch was on a thursday. Index 0 of a week table is thursday 00:00.
+EPOCH_WEEKDAYS = ["Thursday", "Friday", "Saturday", "Sunday", "Monday", "Tuesday", "Wednesday"]
+
+# markers in the per minute tables of BehaviourStoreModel
+NOT_COMPUTED = 0xFF
+NOT_ACTIVE = 0xFE
+
+SMART_ON = SwitchCommandValue.CS_SWITCH_CMD_VAL_SMART_ON
+
+
+class BehaviourModel:
+    """
+    The parts of a behaviour that matter for conflict resolution, with times in minutes since midnight.
+    """
+    __slots__ = ["fromMinute", "untilMinute", "intensity", "activeDays"]
+
+    def __init__(self, behaviour, sunrise, sunset):
+        self.fromMinute = BehaviourModel.minuteOfDay(behaviour.fromTime, sunrise, sunset)
+        self.untilMinute = BehaviourModel.minuteOfDay(behaviour.untilTime, sunrise, sunset)
+        self.intensity = behaviour.intensity
+        # activeDays: list of 7 bools, indexed by day since epoch modulo 7
+        self.activeDays = [getattr(behaviour.activeDays, day) for day in EPOCH_WEEKDAYS]
+
+    @staticmethod
+    def minuteOfDay(behaviourtime, sunrise, sunset):
+        offset = behaviourtime.offset // 60
+        if behaviourtime.timeType == BehaviourTimeType.afterSunrise:
+            offset += sunrise
+        elif behaviourtime.timeType == BehaviourTimeType.afterSunset:
+            offset += sunset
+        return offset % MINUTES_PER_DAY
+
+    def priority(self, minuteofweek):
+        """
+        Returns None if this behaviour isn't active at minuteofweek, else a sort key for which the lowest value
+        wins the conflict resolution: the behaviour that started most recently wins, ties are broken by the
+        earliest until time and then by the lowest intensity. Behaviours with equal from and until
+        times are active all day. The day of a behaviour that passes midnight is the day it started on.
+        """
+        now = minuteofweek % MINUTES_PER_DAY
+        day = minuteofweek // MINUTES_PER_DAY
+        if self.fromMinute < self.untilMinute:
+            if not self.fromMinute <= now < self.untilMinute:
+                return None
+        elif self.fromMinute > self.untilMinute:
+            if now < self.untilMinute:
+                day -= 1
+            elif now < self.fromMinute:
+                return None
+
+        if not self.activeDays[day % 7]:
+            return None
+
+        return ((now - self.fromMinute) % MINUTES_PER_DAY,
+                (self.untilMinute - now) % MINUTES_PER_DAY,
+                self.intensity)
+
+
+class BehaviourStoreModel:
+    """
+    Resolves the intensity of the switch behaviours and the twilights in a behaviour store at a given time.
+
+    behaviours: dict (index -> behaviour) or an iterable of behaviours, e.g. built with buildSwitchBehaviour
+    and buildTwilight.
+    sunrise, sunset: in minutes since midnight, used for behaviours relative to the sun.
+    """
+    def __init__(self, behaviours=None, sunrise=7 * 60, sunset=20 * 60):
+        self.sunrise = sunrise
+        self.sunset = sunset
+        self.switchBehaviours = []
+        self.twilights = []
+        self.clearCache()
+
+        if behaviours is not None:
+            if isinstance(behaviours, dict):
+                behaviours = [behaviours[index] for index in sorted(behaviours)]
+            for behaviour in behaviours:
+                self.add(behaviour)
+
+    def add(self, behaviour):
+        model = BehaviourModel(behaviour, self.sunrise, self.sunset)
+        if behaviour.behaviourType == BehaviourType.twilight:
+            self.twilights.append(model)
+        else:
+            self.switchBehaviours.append(model)
+        self.clearCache()
+
+    def clear(self):
+        self.switchBehaviours = []
+        self.twilights = []
+        self.clearCache()
+
+    def clearCache(self):
+        self.switchTable = bytearray([NOT_COMPUTED]) * MINUTES_PER_WEEK
+        self.twilightTable = bytearray([NOT_COMPUTED]) * MINUTES_PER_WEEK
+
+    @staticmethod
+    def resolve(behaviours, minuteofweek):
+        winner = None
+        for behaviour in behaviours:
+            priority = behaviour.priority(minuteofweek)
+            if priority is not None and (winner is None or priority < winner):
+                winner = priority
+        return NOT_ACTIVE if winner is None else winner[2]
+
+    def behaviourIntensity(self, posixtime):
+        """
+        Returns the intensity of the winning switch behaviour at posixtime, or None if none is active.
+        """
+        minuteofweek = (posixtime // 60) % MINUTES_PER_WEEK
+        value = self.switchTable[minuteofweek]
+        if value == NOT_COMPUTED:
+            value = self.switchTable[minuteofweek] = BehaviourStoreModel.resolve(self.switchBehaviours, minuteofweek)
+        return None if value == NOT_ACTIVE else value
+
+    def twilightIntensity(self, posixtime):
+        """
+        Returns the intensity of the winning twilight at posixtime, or None if none is active.
+        """
+        minuteofweek = (posixtime // 60) % MINUTES_PER_WEEK
+        value = self.twilightTable[minuteofweek]
+        if value == NOT_COMPUTED:
+            value = self.twilightTable[minuteofweek] = BehaviourStoreModel.resolve(self.twilights, minuteofweek)
+        return None if value == NOT_ACTIVE else value
+
+
+class SwitchAggregatorModel:
+    """
+    Model of the SwitchAggregator state for a behaviour store. Optional values are None when empty.
+
+    The aggregated state is:
+        - the override when it is opaque (0-100),
+        - with a translucent override (SMART_ON): the minimum of behaviour and twilight state when a switch
+          behaviour is active, else the twilight state,
+        - without override: the minimum of behaviour and twilight state when a switch behaviour is active, else 0.
+    The override is cleared when all switch behaviours become inactive, and an override of 0 is cleared when a
+    switch behaviour becomes active. In dumb home mode the handlers are inactive and their states are empty.
+    """
+    def __init__(self, store=None, allowDimming=True, smartHome=True):
+        self.store = BehaviourStoreModel() if store is None else store
+        self.allowDimming = allowDimming
+        self.smartHome = smartHome
+        self.time = None
+        self.reset()
+
+    def reset(self):
+        """
+        Clears all state, as after a reboot with an empty stored switch state.
+        """
+        self.behaviourActive = False
+        self.overrideState = None
+        self.behaviourState = None
+        self.twilightState = None
+        self.aggregatedState = None
+
+    def setTime(self, posixtime):
+        self.time = posixtime
+        self.update()
+
+    def setSmartHome(self, smartHome):
+        self.smartHome = smartHome
+        self.update()
+
+    def setAllowDimming(self, allowDimming):
+        self.allowDimming = allowDimming
+        self.disallowDimmingOverride()
+        self.update()
+
+    def update(self):
+        """
+        Evaluates the behaviour store at self.time and recomputes the aggregated state.
+        """
+        if not self.smartHome:
+            self.behaviourState = None
+            self.twilightState = None
+            behaviouractive = False
+        elif self.time is None:
+            self.behaviourState = 0
+            self.twilightState = 100
+            behaviouractive = False
+        else:
+            behaviourintensity = self.store.behaviourIntensity(self.time)
+            twilightintensity = self.store.twilightIntensity(self.time)
+            behaviouractive = behaviourintensity is not None
+            self.behaviourState = behaviourintensity if behaviouractive else 0
+            self.twilightState = 100 if twilightintensity is None else twilightintensity
+
+        if behaviouractive != self.behaviourActive:
+            if not behaviouractive or self.overrideState == 0:
+                self.overrideState = None
+            self.behaviourActive = behaviouractive
+
+        twilight = 100 if self.twilightState is None else self.twilightState
+        if self.overrideState is None or self.overrideState == SMART_ON:
+            if self.behaviourActive:
+                self.aggregatedState = min(self.behaviourState, twilight)
+            else:
+                self.aggregatedState = 0 if self.overrideState is None else twilight
+        else:
+            self.aggregatedState = self.overrideState
+
+    def switchCraft(self):
+        """
+        Toggles: an override of 0 when the light is currently on, a translucent override otherwise.
+        """
+        if self.aggregatedState is not None and self.aggregatedState > 0:
+            self.overrideState = 0
+        else:
+            self.overrideState = SMART_ON
+        self.update()
+
+    def switchCommand(self, value):
+        """
+        Handles the value of a SWITCH control command, see SwitchCommandValue.
+        The debug reset values clear state without recomputing it.
+        """
+        if value <= SwitchCommandValue.CS_SWITCH_CMD_VAL_FULLY_ON:
+            self.overrideState = value
+            self.disallowDimmingOverride()
+        elif value == SwitchCommandValue.CS_SWITCH_CMD_VAL_TOGGLE:
+            self.switchCraft()
+            return
+        elif value == SwitchCommandValue.CS_SWITCH_CMD_VAL_BEHAVIOUR:
+            self.overrideState = None
+        elif value == SwitchCommandValue.CS_SWITCH_CMD_VAL_SMART_ON:
+            self.overrideState = SMART_ON
+        elif value == SwitchCommandValue.CS_SWITCH_CMD_VAL_DEBUG_RESET_ALL:
+            self.overrideState = None
+            self.aggregatedState = None
+            self.behaviourState = None
+            self.twilightState = None
+            return
+        elif value == SwitchCommandValue.CS_SWITCH_CMD_VAL_DEBUG_RESET_AGG:
+            self.aggregatedState = None
+            return
+        elif value == SwitchCommandValue.CS_SWITCH_CMD_VAL_DEBUG_RESET_OVERRIDE:
+            self.overrideState = None
+            return
+        elif value == SwitchCommandValue.CS_SWITCH_CMD_VAL_DEBUG_RESET_AGG_OVERRIDE:
+            self.overrideState = None
+            self.aggregatedState = None
+            return
+        else:
+            return
+        self.update()
+
+    def disallowDimmingOverride(self):
+        """
+        When dimming isn't allowed, dimmed overrides are rounded up to fully on.
+        """
+        if not self.allowDimming and self.overrideState is not None and 0 < self.overrideState < 100:
+            self.overrideState = 100
+
+    @staticmethod
+    def format(value):
+        return "-1" if value is None else str(value)
+
+    def getState(self):
+        """
+        Returns dict (valuename -> value) of the SwitchAggregator values, formatted as in FirmwareState.
+        """
+        return {
+            "_overrideState": SwitchAggregatorModel.format(self.overrideState),
+            "_behaviourState": SwitchAggregatorModel.format(self.behaviourState),
+            "_twilightState": SwitchAggregatorModel.format(self.twilightState),
+            "_aggregatedState": SwitchAggregatorModel.format(self.aggregatedState),
+        }
@@ -1,5 +1,78 @@
 """
 Runs all files in ./tests/ and collects stats on their successes.
-"""
 
+The uart connection and log strings are set up once per device, see testframework/session.py. With more than
+one port the entry points are distributed over the devices and run in parallel, see testframework/scheduler.py.
+
+    python -m BluenetTestSuite.runtests --port /dev/ttyACM0 --logstrings extracted_logs.json
+    python -m BluenetTestSuite.runtests --alldevices
+    python -m BluenetTestSuite.runtests --simulator 4 -k dumbhomemode -k singleswitchbehaviour
+"""
+import argparse
 import sys
+from contextlib import ExitStack
+
+from BluenetTestSuite.testframework.session import TestSession, discoverEntryPoints, loadEntryPoint
+from BluenetTestSuite.testframework.scheduler import TestDurations, discoverPorts, longestFirst, runScheduled, \
+    DEFAULT_DURATIONS_FILE
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Runs the bluenet test suite")
+    parser.add_argument("--port", dest="ports", action="append", default=[],
+                        help="uart port of a test subject, can be repeated to run on several devices in parallel")
+    parser.add_argument("--alldevices", action="store_true", help="run on all attached devices (/dev/ttyACM*)")
+    parser.add_argument("--logstrings", default=None, help="extracted_logs.json of the firmware build")
+    parser.add_argument("--simulator", type=int, nargs="?", const=1, default=0, metavar="COUNT",
+                        help="run against COUNT CrownstoneSimulators instead of devices")
+    parser.add_argument("--durations", default=DEFAULT_DURATIONS_FILE,
+                        help="json file with the recorded durations, used to run the longest tests first")
+    parser.add_argument("-k", dest="filters", action="append", default=[],
+                        help="only run entry points whose name contains this string, can be repeated")
+    parser.add_argument("--list", action="store_true", help="list the entry points and exit")
+    return parser.parse_args()
+
+
+def runSession(names, port, logStringsFile, durationsFile):
+    durations = TestDurations(durationsFile)
+    with TestSession(port=port, logStringsFile=logStringsFile) as session:
+        for name in names:
+            session.run(loadEntryPoint(name))
+    durations.update(session.records)
+    durations.save()
+    return session.printReport()
+
+
+def main():
+    args = parseArguments()
+
+    names = [entrypoint.name for entrypoint in discoverEntryPoints()]
+    if args.filters:
+        names = [name for name in names if any(f in name for f in args.filters)]
+    names = longestFirst(names, TestDurations(args.durations))
+
+    if args.list:
+        for name in names:
+            print(name)
+        return 0
+
+    with ExitStack() as stack:
+        ports = list(args.ports)
+        if args.alldevices:
+            ports += [port for port in discoverPorts() if port not in ports]
+        if args.simulator:
+            from BluenetTestSuite.simulator.crownstonesimulator import CrownstoneSimulator
+            ports += [stack.enter_context(CrownstoneSimulator()).port for i in range(args.simulator)]
+        if not ports:
+            ports = ["/dev/ttyACM0"]
+
+        if len(ports) == 1:
+            failurecount = runSession(names, ports[0], args.logstrings, args.durations)
+        else:
+            failurecount = runScheduled(names, ports, args.logstrings, args.durations)
+
+    return 1 if failurecount else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
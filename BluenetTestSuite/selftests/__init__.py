@@ -0,0 +1,5 @@
+"""
+Checks of the test suite itself, run against a CrownstoneSimulator so that no device is needed:
+
+    python -m pytest BluenetTestSuite/selftests
+"""
@@ -0,0 +1,87 @@
+"""
+Checks which assets AssetPages shows in each order: the pages of the id order, and the top-K of the active and
+switched orders, in which the assets that stay selected keep their subplot.
+"""
+from BluenetTestSuite.utils.assetpages import AssetPages
+
+
+def touch(pages, assetIds, timestamp, count=1):
+    for i in range(count):
+        for assetId in assetIds:
+            pages.touch(assetId, timestamp)
+
+
+def test_idOrderPages():
+    pages = AssetPages(rows=2, cols=2, order="id")
+    # no assets: one empty page, which paging doesn't leave.
+    assert pages.visible(0) == []
+    pages.nextPage()
+    pages.nextPage(-1)
+    assert pages.visible(0) == []
+    assert pages.page == 0
+
+    touch(pages, range(10), 0)
+    assert pages.visible(0) == [0, 1, 2, 3]
+    assert pages.pageCount == 3
+
+    pages.nextPage()
+    pages.nextPage()
+    assert pages.visible(0) == [8, 9]
+    pages.nextPage()
+    assert pages.visible(0) == [0, 1, 2, 3]
+    pages.nextPage(-1)
+    assert pages.visible(0) == [8, 9]
+
+    # new assets are shown on the page they belong to, the page stays.
+    touch(pages, range(10, 14), 1)
+    assert pages.visible(1) == [8, 9, 10, 11]
+    assert pages.pageCount == 4
+
+    # the page is clamped to the last page when there are less assets.
+    for assetId in range(6, 14):
+        del pages.assets[assetId]
+    assert pages.visible(2) == [4, 5]
+    assert (pages.page, pages.pageCount) == (1, 2)
+
+
+def test_activeOrderKeepsSlots():
+    pages = AssetPages(rows=2, cols=2, order="active", reselectInterval=5.0, activityWindow=10.0)
+    touch(pages, "abcd", 0, count=10)
+    touch(pages, "e", 0)
+    assert pages.visible(0) == ["a", "b", "c", "d"]
+
+    # e becomes the most active and b falls out of the top 4: e takes the subplot of b.
+    touch(pages, "acde", 4, count=10)
+    assert pages.visible(4) == ["a", "b", "c", "d"]
+    assert pages.visible(5) == ["a", "e", "c", "d"]
+
+    # the selection is only recomputed every reselectInterval seconds.
+    touch(pages, "b", 6, count=100)
+    assert pages.visible(9) == ["a", "e", "c", "d"]
+    assert "b" in pages.visible(10)
+    # paging does nothing in the top-K orders.
+    pages.nextPage()
+    assert pages.page == 0
+
+
+def test_switchedOrderKeepsSlots():
+    pages = AssetPages(rows=1, cols=3, order="switched", reselectInterval=5.0)
+    touch(pages, "abcd", 0)
+    # the assets that never switched fill up the remaining subplots.
+    pages.switched("b", 1)
+    assert len(pages.visible(1)) == 3
+    assert "b" in pages.visible(1)
+
+    for assetId, timestamp in zip("abc", [2, 3, 4]):
+        pages.switched(assetId, timestamp)
+    assert pages.visible(6) == ["a", "b", "c"]
+
+    # d switched the most recently, a the longest ago: d takes the subplot of a.
+    pages.switched("d", 7)
+    pages.switched("b", 8)
+    assert pages.visible(11) == ["d", "b", "c"]
+
+    # m cycles the orders, starting with an empty selection.
+    pages.nextOrder()
+    assert pages.order == "id"
+    assert pages.visible(11) == ["a", "b", "c"]
@@ -0,0 +1,144 @@
+"""
+Checks that a command whose reply is lost, or arrives late, doesn't make the next commands of its type time out,
+that events only count their own hellos, and that a reply to another sender's hello still resolves an event (the
+documented limitation). The firmware is faked by a subscriber that replies to the writes.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from crownstone_core.packets.ResultPacket import ResultPacket
+from crownstone_core.protocol.BluenetTypes import ControlType, ResultValue
+
+from crownstone_uart.core.UartEventBus import UartEventBus
+from crownstone_uart.topics.SystemTopics import SystemTopics
+from crownstone_uart.topics.UartTopics import UartTopics
+
+from BluenetTestSuite.firmwarecontrol.asynctransport import AsyncDataTransport
+from BluenetTestSuite.firmwarecontrol.InternalEventCodes import EventType
+
+
+def resultPacket(commandtype, number):
+    """
+    A result packet of commandtype with payload [number].
+    """
+    return ResultPacket([5] + list(int(commandtype).to_bytes(2, "little"))
+                        + list(int(ResultValue.SUCCESS).to_bytes(2, "little")) + [1, 0, number])
+
+
+class FakeFirmware:
+    """
+    Replies to the n-th write with result packet n, after delays[n] seconds, or not at all if delays[n] is None.
+    Writes beyond the delays are replied to immediately.
+    """
+    def __init__(self, commandtype, delays):
+        self.commandtype = commandtype
+        self.delays = delays
+        self.writeCount = 0
+        self.subscription = UartEventBus.subscribe(SystemTopics.uartWriteData, self.onWrite)
+
+    def close(self):
+        UartEventBus.unsubscribe(self.subscription)
+
+    def onWrite(self, data):
+        number = self.writeCount
+        self.writeCount += 1
+        delay = self.delays[number] if number < len(self.delays) else 0
+        reply = lambda: UartEventBus.emit(SystemTopics.resultPacket, resultPacket(self.commandtype, number))
+        if delay == 0:
+            reply()
+        elif delay is not None:
+            threading.Timer(delay, reply).start()
+
+
+class FakeHelloFirmware:
+    """
+    Replies to every written hello message.
+    """
+    def __init__(self, hellopacket):
+        self.hellopacket = hellopacket
+        self.subscription = UartEventBus.subscribe(SystemTopics.uartWriteData, self.onWrite)
+
+    def close(self):
+        UartEventBus.unsubscribe(self.subscription)
+
+    def onWrite(self, data):
+        if list(data) == self.hellopacket:
+            UartEventBus.emit(UartTopics.hello, None)
+
+
+@pytest.fixture
+def transport():
+    transport = AsyncDataTransport()
+    transport.lateReplyTimeout = 0.2
+    yield transport
+    transport.close()
+
+
+def sendCommands(transport, count, timeout=0.1):
+    """
+    Sends count ALLOW_DIMMING commands one after the other, returns the payloads of the results (None if none).
+    """
+    async def send():
+        results = []
+        for i in range(count):
+            result = await transport.send_command(ControlType.ALLOW_DIMMING, [1], timeout=timeout)
+            results.append(None if result is None else result.payload)
+        return results
+    return asyncio.run(send())
+
+
+def test_lostReplyDoesntShiftMatching(transport):
+    firmware = FakeFirmware(ControlType.ALLOW_DIMMING, [None])
+    try:
+        assert sendCommands(transport, 4) == [None, [1], [2], [3]]
+    finally:
+        firmware.close()
+    assert transport.lostReplyCount == 1
+    assert transport.lateReplyCount == 0
+
+
+def test_lateReplyIsDropped(transport):
+    firmware = FakeFirmware(ControlType.ALLOW_DIMMING, [0.15])
+    try:
+        assert sendCommands(transport, 3) == [None, [1], [2]]
+    finally:
+        firmware.close()
+    assert transport.lateReplyCount == 1
+    assert transport.lostReplyCount == 0
+
+
+def test_otherSendersHellosArentCounted(transport):
+    # hellos written by another sender, e.g. datatransport, whose replies got lost.
+    for i in range(2):
+        UartEventBus.emit(SystemTopics.uartWriteSuccess, transport.hellopacket)
+    assert transport.unansweredHellos == 0
+
+    firmware = FakeHelloFirmware(transport.hellopacket)
+    try:
+        # send_event resolves to None either way, a timeout would take the full second.
+        t1 = time.monotonic()
+        asyncio.run(transport.send_event(EventType.CMD_TEST_SET_TIME, [0, 0, 0, 0], timeout=1))
+        assert time.monotonic() - t1 < 0.5
+    finally:
+        firmware.close()
+    assert transport.unansweredHellos == 0
+    assert not transport.pendingHellos
+
+
+def test_otherSendersHelloReplyResolvesEvent(transport):
+    # no firmware replies to the event, but a hello reply for another sender arrives while it is pending.
+    async def send():
+        event = asyncio.ensure_future(transport.send_event(EventType.CMD_TEST_SET_TIME, [0, 0, 0, 0], timeout=1))
+        await asyncio.sleep(0.05)
+        UartEventBus.emit(UartTopics.hello, None)
+        await event
+
+    t1 = time.monotonic()
+    asyncio.run(send())
+    assert time.monotonic() - t1 < 0.5
+    assert not transport.pendingHellos
+    # the event's own hello reply will arrive later on: it isn't taken for an event sent after it.
+    assert transport.unansweredHellos == 0
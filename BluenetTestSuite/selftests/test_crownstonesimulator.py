@@ -0,0 +1,160 @@
+"""
+Talks to the CrownstoneSimulator over its pty without CrownstoneUart: checks that CONTROL and HELLO messages are
+answered, that MOCK_INTERNAL_EVT messages are handled in order, that the state is reported with FIRMWARESTATE lines
+and that the simulated clock runs clockSpeed times as fast as the wall clock.
+"""
+import os
+import select
+import time
+import tty
+
+import pytest
+from crownstone_core.protocol.BluenetTypes import ControlType, ResultValue
+from crownstone_core.util.Conversion import Conversion
+from crownstone_uart.core.uart.UartTypes import UartMessageType, UartRxType, UartTxType
+
+from BluenetTestSuite.firmwarecontrol.InternalEventCodes import EventType
+from BluenetTestSuite.firmwarecontrol.behaviourstore import buildSwitchBehaviour
+from BluenetTestSuite.firmwarecontrol.datatransport import buildControlMessage, buildEventMessage, \
+    buildHelloPacket, buildUartWrapperPacket
+from BluenetTestSuite.firmwarecontrol.utils import getTime_uint32
+from BluenetTestSuite.simulator.crownstonesimulator import CrownstoneSimulator, UartFrameDecoder
+
+
+class PtyClient:
+    """
+    The test suite side of the pty: writes uart wrapper packets and decodes the messages of the simulator
+    into [opcode, payload].
+    """
+    def __init__(self, port):
+        self.fd = os.open(port, os.O_RDWR | os.O_NOCTTY)
+        tty.setraw(self.fd)
+        self.decoder = UartFrameDecoder()
+        self.received = []
+
+    def close(self):
+        os.close(self.fd)
+
+    def write(self, packet):
+        os.write(self.fd, bytes(packet))
+
+    def send(self, txType, data):
+        self.write(buildUartWrapperPacket(txType, data))
+
+    def read(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            for messageType, payload in self.decoder.feed(os.read(self.fd, 4096)):
+                if messageType == UartMessageType.UART_MESSAGE and len(payload) >= 2:
+                    self.received.append([Conversion.uint8_array_to_uint16(payload[0:2]), payload[2:]])
+
+    def waitFor(self, predicate, timeout=2.0, start=None):
+        """
+        Returns the first message that satisfies predicate(opcode, payload), None on timeout. Searches the messages
+        received from now on, or from index start of self.received. The messages received until then are kept in
+        self.received.
+        """
+        checked = len(self.received) if start is None else start
+        deadline = time.monotonic() + timeout
+        while True:
+            for opcode, payload in self.received[checked:]:
+                if predicate(opcode, payload):
+                    return [opcode, payload]
+            checked = len(self.received)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self.read(remaining)
+
+    def stateLines(self):
+        return [bytes(payload).decode("ascii") for opcode, payload in self.received
+                if opcode == UartRxType.FIRMWARESTATE]
+
+
+def isResult(commandtype):
+    return lambda opcode, payload: opcode == UartRxType.RESULT_PACKET \
+        and Conversion.uint8_array_to_uint16(payload[1:3]) == commandtype
+
+
+def isStateLine(text):
+    return lambda opcode, payload: opcode == UartRxType.FIRMWARESTATE and bytes(payload).decode("ascii").endswith(text)
+
+
+def resultCode(message):
+    return Conversion.uint8_array_to_uint16(message[1][3:5])
+
+
+@pytest.fixture
+def simulator():
+    with CrownstoneSimulator(bootDelay=0.1) as simulator:
+        yield simulator
+
+
+@pytest.fixture
+def client(simulator):
+    client = PtyClient(simulator.port)
+    yield client
+    client.close()
+
+
+def test_controlIsAnsweredWithResultPacket(client):
+    client.send(UartTxType.CONTROL, buildControlMessage(ControlType.SWITCH, [100]))
+    result = client.waitFor(isResult(ControlType.SWITCH))
+    assert result is not None
+    assert resultCode(result) == ResultValue.SUCCESS
+
+    # the state changes it caused are reported as FIRMWARESTATE lines, before the result.
+    lines = client.stateLines()
+    assert "20003a10@void SwitchAggregator::pushState()@_overrideState@100" in lines
+    assert any(line.startswith("20003c00@void SafeSwitch::setState(switch_state_t)@storedState.state.") for line in lines)
+
+    # commands the simulator doesn't know are answered too.
+    client.send(UartTxType.CONTROL, buildControlMessage(ControlType.FACTORY_RESET, []))
+    assert resultCode(client.waitFor(isResult(ControlType.FACTORY_RESET))) == ResultValue.NOT_IMPLEMENTED
+
+
+def test_helloIsAnswered(client):
+    client.write(buildHelloPacket())
+    assert client.waitFor(lambda opcode, payload: opcode == UartRxType.HELLO) is not None
+
+
+def test_eventIsHandledInOrder(client):
+    client.send(UartTxType.CONTROL, buildControlMessage(ControlType.SWITCH, [0]))
+    assert client.waitFor(isResult(ControlType.SWITCH)) is not None
+    switched = len(client.received)
+
+    # the firmware doesn't reply to events: the hello after it is answered once the event has been handled.
+    client.send(UartTxType.MOCK_INTERNAL_EVT, buildEventMessage(EventType.CMD_SWITCH_TOGGLE, []))
+    client.write(buildHelloPacket())
+    assert client.waitFor(lambda opcode, payload: opcode == UartRxType.HELLO) is not None
+
+    handled = client.received[switched:-1]
+    assert [opcode for opcode, payload in handled if opcode != UartRxType.FIRMWARESTATE] == []
+    # toggled on.
+    assert "20003c40@void Relay::set(bool)@on@True" in [bytes(payload).decode("ascii") for opcode, payload in handled]
+
+
+def test_clockSpeed():
+    with CrownstoneSimulator(clockSpeed=600, bootDelay=0.1) as simulator:
+        client = PtyClient(simulator.port)
+        try:
+            client.send(UartTxType.CONTROL, buildControlMessage(ControlType.REPLACE_BEHAVIOUR,
+                                                                [0] + buildSwitchBehaviour(13, 15, 70).serialize()))
+            assert resultCode(client.waitFor(isResult(ControlType.REPLACE_BEHAVIOUR))) == ResultValue.SUCCESS
+
+            # a simulated minute before the behaviour starts: 0.1 s at 600 times the wall clock.
+            start = getTime_uint32(12, 59, 0)
+            sent = len(client.received)
+            client.send(UartTxType.CONTROL, buildControlMessage(ControlType.SET_TIME,
+                                                                Conversion.uint32_to_uint8_array(start)))
+            t1 = time.monotonic()
+            assert client.waitFor(isResult(ControlType.SET_TIME), start=sent) is not None
+            assert client.waitFor(isStateLine("@_behaviourState@70"), timeout=5, start=sent) is not None
+            # at the wall clock it would have taken a minute.
+            assert 0.05 < time.monotonic() - t1 < 1
+
+            elapsed = time.monotonic() - t1
+            simulated = simulator.getTime() - start
+            assert 600 * (elapsed - 0.2) <= simulated <= 600 * (elapsed + 0.2)
+        finally:
+            client.close()
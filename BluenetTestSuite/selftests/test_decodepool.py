@@ -0,0 +1,93 @@
+"""
+Checks that the DecodePool delivers the packets in the order they were submitted, however many workers decode them,
+that it counts what it drops, that stop delivers what is still queued and that a failing consumer doesn't stop it.
+"""
+import random
+import time
+
+from BluenetTestSuite.utils.decodepool import DecodePool
+
+OPCODE = 1
+
+
+class FakePacket:
+    """
+    Deserializes to the first byte of the payload. A payload starting with 255 can't be decoded.
+    """
+    def __init__(self):
+        self.value = None
+
+    def deserialize(self, payload):
+        if payload[0] == 255:
+            raise ValueError("undecodable")
+        self.value = payload[0]
+
+
+class Recorder:
+    """
+    Consumer that records the values of the packets, slowly now and then so that the workers get out of step.
+    """
+    def __init__(self, seed=0):
+        self.values = []
+        self.rng = random.Random(seed)
+
+    def __call__(self, packet, timestamp):
+        if self.rng.random() < 0.05:
+            time.sleep(0.001)
+        self.values.append(packet.value)
+
+
+def pool(consumers, **kwargs):
+    return DecodePool({OPCODE: FakePacket}, consumers, **kwargs)
+
+
+def test_packetsAreDeliveredInSubmitOrder():
+    recorder = Recorder()
+    values = [i % 200 for i in range(5000)]
+    with pool([recorder], workers=4, batchSize=7) as decodepool:
+        for value in values:
+            decodepool.submit(OPCODE, [value])
+            # other opcodes are ignored.
+            decodepool.submit(OPCODE + 1, [value])
+    assert recorder.values == values
+    assert decodepool.receivedCount == decodepool.decodedCount == len(values)
+
+
+def test_overflowIsDroppedAndCounted():
+    recorder = Recorder()
+    decodepool = pool([recorder], workers=3, maxQueueSize=100, batchSize=10)
+    # not started: nothing is taken from the queue.
+    for value in range(150):
+        decodepool.submit(OPCODE, [value])
+    assert decodepool.droppedCount == 50
+    assert decodepool.queueDepth == 100
+
+    decodepool.start()
+    decodepool.stop()
+    assert recorder.values == list(range(100))
+
+
+def test_stopDeliversWhatIsQueued():
+    recorder = Recorder()
+    decodepool = pool([recorder], workers=4, batchSize=5)
+    decodepool.start()
+    for value in range(1000):
+        decodepool.submit(OPCODE, [value % 200])
+    decodepool.stop()
+    assert recorder.values == [value % 200 for value in range(1000)]
+    assert decodepool.queueDepth == 0
+
+
+def test_errorsAreCounted():
+    recorder = Recorder()
+    def failing(packet, timestamp):
+        if packet.value % 10 == 0:
+            raise RuntimeError("consumer failed")
+
+    with pool([failing, recorder], workers=2, batchSize=3) as decodepool:
+        for value in range(100):
+            decodepool.submit(OPCODE, [value])
+        decodepool.submit(OPCODE, [255])
+    assert recorder.values == list(range(100))
+    assert decodepool.consumerErrorCount == 10
+    assert decodepool.decodeErrorCount == 1
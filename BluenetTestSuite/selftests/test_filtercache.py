@@ -0,0 +1,69 @@
+"""
+Checks that the FilterCache returns the same serialization as building the filter, keeps filters that differ only in
+their input or asset id source apart, and rebuilds corrupt entries.
+"""
+import os
+
+from crownstone_core.packets.assetFilter.FilterMetaDataPackets import FilterType, InputDescriptionFullAdData, \
+    InputDescriptionMacAddress, InputDescriptionMaskedAdData
+from crownstone_core.packets.assetFilter.FilterOutputPackets import FilterOutputDescriptionType
+
+from BluenetTestSuite.utils.filtercache import FilterCache
+from BluenetTestSuite.utils.filterexamples import filterExactMacInForwarderMacOut, \
+    filterExactMacInForwarderShortIdOut, filterExactMacInNearestShortIdOut
+
+MACLIST = ["60:c0:bf:28:0d:ae", "ac:23:3f:71:cd:36", "d1:e3:33:87:a4:55"]
+
+
+def test_hitEqualsBuiltFilter(tmp_path):
+    built = filterExactMacInForwarderMacOut(MACLIST)
+    built.setFilterId(0)
+    cache = FilterCache(str(tmp_path))
+
+    first = filterExactMacInForwarderMacOut(MACLIST, cache=cache)
+    second = filterExactMacInForwarderMacOut(MACLIST, cache=FilterCache(str(tmp_path)))
+
+    assert (cache.hits, cache.misses) == (0, 1)
+    for cached in (first, second):
+        assert cached.serialize() == built.serialize()
+        assert cached.getCrc() == built.getCrc()
+
+
+def test_corruptEntryIsAMiss(tmp_path):
+    cache = FilterCache(str(tmp_path))
+    expected = filterExactMacInForwarderMacOut(MACLIST, cache=cache)
+    [name] = os.listdir(str(tmp_path))
+    path = os.path.join(str(tmp_path), name)
+
+    for content in [b"", b"\x01\x02", open(path, "rb").read()[:-1]]:
+        with open(path, "wb") as file:
+            file.write(content)
+        cache = FilterCache(str(tmp_path))
+        assert filterExactMacInForwarderMacOut(MACLIST, cache=cache).serialize() == expected.serialize()
+        assert (cache.hits, cache.misses) == (0, 1)
+    assert os.listdir(str(tmp_path)) == [name]
+
+
+def test_keyIncludesInputAndIdSource():
+    def key(inputdescription, idsource):
+        return FilterCache.key(MACLIST, FilterType.EXACT_MATCH, inputdescription, FilterOutputDescriptionType.ASSET_ID,
+                               idsource, 0)
+
+    descriptions = [None, InputDescriptionMacAddress(), InputDescriptionFullAdData(0x09),
+                    InputDescriptionFullAdData(0x08), InputDescriptionMaskedAdData(0xFF, 0b11),
+                    InputDescriptionMaskedAdData(0xFF, 0b111)]
+    keys = {key(inputdescription, idsource) for inputdescription in descriptions for idsource in descriptions}
+    assert len(keys) == len(descriptions) ** 2
+    # equal descriptions give equal keys.
+    assert key(InputDescriptionMacAddress(), None) == key(InputDescriptionMacAddress(), None)
+
+
+def test_filtersWithOtherOutputsAreKeptApart(tmp_path):
+    cache = FilterCache(str(tmp_path))
+    for example in [filterExactMacInForwarderMacOut, filterExactMacInForwarderShortIdOut,
+                    filterExactMacInNearestShortIdOut]:
+        built = example(MACLIST)
+        built.setFilterId(0)
+        assert example(MACLIST, cache=cache).serialize() == built.serialize()
+    assert (cache.hits, cache.misses) == (0, 3)
+    assert len(os.listdir(str(tmp_path))) == 3
@@ -0,0 +1,148 @@
+"""
+Checks that a chunk whose result packet is lost is retransmitted after the uploader drained, without making the
+other chunks fail, and that no timed out chunk is left on the transport afterwards.
+
+Checks that sync, against the filter store of the simulator, only removes, uploads and commits what differs.
+"""
+import asyncio
+
+import pytest
+
+from crownstone_core.protocol.BluenetTypes import ControlType
+from crownstone_uart import CrownstoneUart
+
+from BluenetTestSuite.firmwarecontrol.asynctransport import AsyncDataTransport
+from BluenetTestSuite.selftests.test_asynctransport import FakeFirmware
+from BluenetTestSuite.simulator.crownstonesimulator import CrownstoneSimulator
+from BluenetTestSuite.utils.filterexamples import filterExactMacInForwarderMacOut
+from BluenetTestSuite.utils.filterupload import FilterUploader
+
+
+@pytest.fixture
+def transport():
+    transport = AsyncDataTransport()
+    transport.lateReplyTimeout = 0.2
+    yield transport
+    transport.close()
+
+
+def upload(transport, chunks, retries=5):
+    uploader = FilterUploader(window=4, retries=retries, timeout=0.1, transport=transport)
+    return uploader, asyncio.run(uploader.uploadChunks(chunks))
+
+
+def test_lostResultIsRetransmitted(transport):
+    chunks = [[i] for i in range(8)]
+    firmware = FakeFirmware(ControlType.ASSET_FILTER_UPLOAD, [0, None])
+    try:
+        uploader, ok = upload(transport, chunks)
+    finally:
+        firmware.close()
+
+    assert ok
+    assert uploader.failedChunkCount == 0
+    assert uploader.drainCount >= 1
+    assert uploader.retransmissionCount >= 1
+    assert transport.lostReplyCount >= 1
+    assert not transport.pendingResults[ControlType.ASSET_FILTER_UPLOAD]
+
+
+def test_noResultsFailAfterRetries(transport):
+    chunks = [[i] for i in range(3)]
+    firmware = FakeFirmware(ControlType.ASSET_FILTER_UPLOAD, [None] * 100)
+    try:
+        uploader, ok = upload(transport, chunks, retries=1)
+    finally:
+        firmware.close()
+
+    assert not ok
+    assert firmware.writeCount == 6
+    assert uploader.failedChunkCount == 3
+    assert uploader.retransmissionCount == 3
+    assert not transport.pendingResults[ControlType.ASSET_FILTER_UPLOAD]
+
+
+class RecordingTransport(AsyncDataTransport):
+    """
+    Records the type of each command sent.
+    """
+    def __init__(self):
+        super(RecordingTransport, self).__init__()
+        self.commandtypes = []
+
+    async def send_command(self, commandtype, packetcontent, timeout=None):
+        self.commandtypes.append(commandtype)
+        return await super(RecordingTransport, self).send_command(commandtype, packetcontent, timeout)
+
+
+@pytest.fixture
+def simulator():
+    with CrownstoneSimulator() as simulator:
+        uart = CrownstoneUart()
+        uart.initialize_usb_sync(port=simulator.port)
+        try:
+            yield simulator
+        finally:
+            uart.stop()
+
+
+def trackingFilters(maclists):
+    filters = []
+    for filterId, maclist in enumerate(maclists):
+        trackingfilter = filterExactMacInForwarderMacOut(maclist)
+        trackingfilter.setFilterId(filterId)
+        filters.append(trackingfilter)
+    return filters
+
+
+def sync(trackingfilters):
+    """
+    Returns the uploader, its result and the types of the commands it sent.
+    """
+    transport = RecordingTransport()
+    try:
+        uploader = FilterUploader(timeout=1, transport=transport)
+        return uploader, asyncio.run(uploader.sync(trackingfilters)), transport.commandtypes
+    finally:
+        transport.close()
+
+
+MACLISTS = [["60:c0:bf:28:0d:ae"], ["ac:23:3f:71:cd:36", "d1:e3:33:87:a4:55"], ["d1:e3:33:87:a4:56"]]
+
+
+def test_resyncIsNoOp(simulator):
+    filters = trackingFilters(MACLISTS)
+    uploader, ok, commandtypes = sync(filters)
+    assert ok
+    assert uploader.uploadedIds == [0, 1, 2]
+    assert simulator.filterStore.masterVersion == 1
+
+    uploader, ok, commandtypes = sync(filters)
+    assert ok
+    assert (uploader.uploadedIds, uploader.removedIds) == ([], [])
+    assert commandtypes == [ControlType.ASSET_FILTER_GET_SUMMARIES]
+    assert simulator.filterStore.masterVersion == 1
+
+
+def test_changedFilterIsReplaced(simulator):
+    assert sync(trackingFilters(MACLISTS))[1]
+
+    changed = MACLISTS[:1] + [["ac:23:3f:71:cd:37"]] + MACLISTS[2:]
+    uploader, ok, commandtypes = sync(trackingFilters(changed))
+    assert ok
+    assert (uploader.uploadedIds, uploader.removedIds) == ([1], [1])
+    assert commandtypes.count(ControlType.ASSET_FILTER_REMOVE) == 1
+    assert commandtypes.count(ControlType.ASSET_FILTER_COMMIT_CHANGES) == 1
+    assert sorted(simulator.filterStore.filters) == [0, 1, 2]
+    assert simulator.filterStore.masterVersion == 2
+
+
+def test_extraFilterIsRemoved(simulator):
+    assert sync(trackingFilters(MACLISTS))[1]
+
+    uploader, ok, commandtypes = sync(trackingFilters(MACLISTS[:2]))
+    assert ok
+    assert (uploader.uploadedIds, uploader.removedIds) == ([], [2])
+    assert ControlType.ASSET_FILTER_UPLOAD not in commandtypes
+    assert sorted(simulator.filterStore.filters) == [0, 1]
+    assert simulator.filterStore.masterVersion == 2
@@ -0,0 +1,225 @@
+"""
+Checks how FirmwareState parses FIRMWARESTATE messages and echoes them, that waitUntil and waitFor wake up on
+updates parsed by another thread, and its class index: lookups by class name give the same objects as scanning the
+whole statedict, while objects are constructed, renamed and destructed, and clear empties the index.
+"""
+import datetime
+import itertools
+import random
+import threading
+import time
+import types
+
+import pytest
+from crownstone_uart.core.UartEventBus import UartEventBus
+from crownstone_uart.core.uart.UartTypes import UartRxType
+
+from BluenetTestSuite.firmwarestate import firmwarestate
+from BluenetTestSuite.firmwarestate.firmwarestate import FirmwareState
+
+
+class FakePacket:
+    def __init__(self, line, opCode=UartRxType.FIRMWARESTATE):
+        self.opCode = opCode
+        self.payload = list(line.encode("ascii"))
+
+
+def stateLine(ptr, classname, valuename, value):
+    return "{0:x}@void {1}::update()@{2}@{3}".format(ptr, classname, valuename, value)
+
+
+@pytest.fixture
+def FW():
+    # history entries are stamped 1, 2, 3.. so that the tests can tell which update came when.
+    firmwarestate = FirmwareState(echo=False, clock=itertools.count(1).__next__)
+    yield firmwarestate
+    UartEventBus.unsubscribe(firmwarestate.uartSubscription)
+
+
+class Updater(threading.Thread):
+    """
+    Parses the given lines, one per interval, as the uart thread does.
+    """
+    def __init__(self, FW, lines, interval=0.05):
+        super().__init__(daemon=True)
+        self.FW = FW
+        self.lines = lines
+        self.interval = interval
+
+    def run(self):
+        for line in self.lines:
+            time.sleep(self.interval)
+            self.FW.parse(FakePacket(line))
+
+
+def test_parseValidLine(FW):
+    parsed = []
+    FW.onNewEntryParsed.append(parsed.append)
+    # non-ascii bytes are dropped and the value may contain '@'.
+    packet = FakePacket("20003c00@void SafeSwitch::setState(switch_state_t)@storedState.state.dimmer@80")
+    packet.payload[10:10] = [0xff, 0x80]
+    FW.parse(packet)
+
+    assert FW.statedict == {"0x20003c00": {"typename": "SafeSwitch", "storedState.state.dimmer": "80"}}
+    assert FW.getValue("SafeSwitch", "storedState.state.dimmer") == "80"
+    assert len(parsed) == 1
+    assert (parsed[0].ptr, parsed[0].classname, parsed[0].valuename, parsed[0].value) == \
+        ("0x20003c00", "SafeSwitch", "storedState.state.dimmer", "80")
+
+    FW.parse(FakePacket("20003c00@void SafeSwitch::log()@name@a@b"))
+    assert FW.getValue("SafeSwitch", "name") == "a@b"
+    assert FW.classnamecache == {
+        "void SafeSwitch::setState(switch_state_t)": "SafeSwitch", "void SafeSwitch::log()": "SafeSwitch"}
+
+
+def test_parseMalformedLine(FW, capsys):
+    parsed = []
+    FW.onNewEntryParsed.append(parsed.append)
+    FW.parse(FakePacket("20003c00@void Relay::set(bool)@on"))
+    assert "couldn't parse firmware state update" in capsys.readouterr().out
+    # other opcodes are ignored.
+    FW.parse(FakePacket(stateLine(0x20003c00, "Relay", "on", "1"), opCode=UartRxType.HELLO))
+
+    assert FW.statedict == {}
+    assert len(FW.historylist) == 0
+    assert parsed == []
+
+    # a malformed update doesn't stop the ones after it.
+    FW.parse(FakePacket(stateLine(0x20003c00, "Relay", "on", "1")))
+    assert FW.getValue("Relay", "on") == "1"
+
+
+def test_echo(FW, capsys):
+    FW.echo = True
+    FW.parse(FakePacket(stateLine(0x1000, "Relay", "on", "1")))
+    assert "firmware state update: 1000@void Relay::update()@on@1" in capsys.readouterr().out
+
+
+def test_echoIsRateLimited(FW, capsys, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(firmwarestate, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    FW.echo = True
+    FW.echoInterval = 1.0
+
+    for i in range(5):
+        now[0] += 0.1
+        FW.parse(FakePacket(stateLine(0x1000, "Relay", "on", i)))
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+    assert "@on@0" in lines[0] and "not shown" not in lines[0]
+
+    now[0] += 1.0
+    FW.parse(FakePacket(stateLine(0x1000, "Relay", "on", 5)))
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+    assert "@on@5 (4 updates not shown)" in lines[0]
+    # every update is tracked, whether it is echoed or not.
+    assert len(FW.historylist) == 6
+
+
+def test_waitForWakesOnMatchingUpdate(FW):
+    FW.parse(FakePacket(stateLine(0x1000, "Relay", "on", "0")))
+    updater = Updater(FW, [stateLine(0x1000, "Relay", "on", "0"), stateLine(0x2000, "Dimmer", "intensity", "50"),
+                           stateLine(0x1000, "Relay", "on", "1"), stateLine(0x1000, "Relay", "on", "0")],
+                      interval=0.1)
+    t1 = time.monotonic()
+    updater.start()
+    assert FW.waitFor("Relay", "on", 1, timeout=5)
+    duration = time.monotonic() - t1
+    # woken by the third update, stamped 4, not by the timeout and not before.
+    latest = FW.historylist[-1]
+    updater.join()
+
+    assert 0.25 < duration < 2
+    assert (latest.time, latest.value) == (datetime.datetime.fromtimestamp(4), "1")
+
+
+def test_waitUntilTimesOut(FW):
+    updater = Updater(FW, [stateLine(0x1000, "Relay", "on", "0")] * 10, interval=0.02)
+    t1 = time.monotonic()
+    updater.start()
+    assert FW.waitFor("Relay", "on", 1, timeout=0.3) is False
+    duration = time.monotonic() - t1
+    updater.join()
+    assert 0.3 <= duration < 2
+
+    # waitUntil returns the last value of the condition.
+    assert FW.waitUntil(lambda: FW.getValue("Relay", "on"), timeout=0.1) == "0"
+    assert FW.waitUntil(lambda: [], timeout=0.1) == []
+
+
+def test_waitForIgnoresStaleValues(FW):
+    # the value was once the expected one, but isn't anymore.
+    FW.parse(FakePacket(stateLine(0x1000, "Relay", "on", "1")))
+    FW.parse(FakePacket(stateLine(0x1000, "Relay", "on", "0")))
+    assert not FW.waitFor("Relay", "on", 1, timeout=0.2)
+
+    # all objects of a class have to match: one that still has the expected value isn't enough.
+    FW.parse(FakePacket(stateLine(0x2000, "Relay", "on", "1")))
+    assert not FW.waitFor("Relay", "on", 1, timeout=0.2)
+
+    # nor does a value of the expected name on another class.
+    Updater(FW, [stateLine(0x3000, "Dimmer", "on", "1"), stateLine(0x1000, "Relay", "on", "1")]).start()
+    assert FW.waitFor("Relay", "on", lambda value: value == "1", timeout=5)
+    assert FW.getValues("Relay", "on") == ["1", "1"]
+
+
+def linearScan(FW, classname):
+    """
+    The lookup as it was before the class index.
+    """
+    return [obj for obj in FW.statedict.values() if obj.get("typename") == classname]
+
+
+def assertIndexMatchesScan(FW, classnames):
+    for classname in classnames:
+        indexed = FW.objectsOfClass(classname)
+        scanned = linearScan(FW, classname)
+        assert sorted(map(id, indexed)) == sorted(map(id, scanned)), classname
+        # the index keeps the objects of a class in the order they joined it, not in statedict order.
+        assert sorted(FW.getValues(classname, "value")) == sorted(obj["value"] for obj in scanned if "value" in obj)
+
+
+def test_classIndexMatchesLinearScan(FW):
+    rng = random.Random(0)
+    classnames = ["Relay", "Dimmer", "SafeSwitch", "SwitchAggregator"]
+    ptrs = range(0x2000, 0x2040, 4)
+    for step in range(2000):
+        ptr = rng.choice(ptrs)
+        action = rng.random()
+        if action < 0.6:
+            FW.parse(FakePacket(stateLine(ptr, rng.choice(classnames), "value", step)))
+        elif action < 0.7:
+            # the firmware logs the typename of an object explicitly, this moves it to another class.
+            FW.parse(FakePacket(stateLine(ptr, rng.choice(classnames), "typename", rng.choice(classnames))))
+        elif action < 0.8:
+            # a derived class: construct extends the typename.
+            FW.construct("0x{0:x}".format(ptr), "Derived")
+        else:
+            FW.destruct("0x{0:x}".format(ptr))
+        if step % 50 == 0:
+            assertIndexMatchesScan(FW, classnames + [c + "Derived" for c in classnames])
+
+    assertIndexMatchesScan(FW, classnames + [c + "Derived" for c in classnames])
+    # no empty classes are left behind.
+    assert all(FW.classindex.values())
+    assert sum(map(len, FW.classindex.values())) == len(FW.statedict)
+
+
+def test_clearResetsClassIndex(FW):
+    cleared = []
+    FW.onCleared.append(lambda: cleared.append(True))
+    for ptr in range(10):
+        FW.parse(FakePacket(stateLine(0x1000 + ptr, "Relay", "on", "1")))
+    assert len(FW.objectsOfClass("Relay")) == 10
+
+    FW.clear()
+    assert FW.classindex == {}
+    assert FW.objectsOfClass("Relay") == []
+    assert FW.getValue("Relay", "on") is None
+    assert cleared == [True]
+
+    # objects logged after the clear are indexed again.
+    FW.parse(FakePacket(stateLine(0x1000, "Relay", "on", "0")))
+    assert FW.getValue("Relay", "on") == "0"
+    assert FW.objectsOfClass("Relay") == linearScan(FW, "Relay")
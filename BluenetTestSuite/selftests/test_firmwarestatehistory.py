@@ -0,0 +1,72 @@
+"""
+Checks that the columnar FirmwareStateHistory behaves as the list of FirmwareStateHistoryEntry it replaced: the same
+entries come back by index, slice and iteration, and indices/filter select what a scan of that list would.
+"""
+import datetime
+import random
+
+from BluenetTestSuite.firmwarestate.firmwarestatehistory import FirmwareStateHistory
+from BluenetTestSuite.firmwarestate.firmwarestatehistoryentry import FirmwareStateHistoryEntry
+
+
+def fields(entry):
+    return (entry.time, entry.ptr, entry.classname, entry.valuename, entry.value)
+
+
+def fill(history, count, seed=0):
+    """
+    Appends count random entries to history and returns them as the list of entries the history used to be.
+    """
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        time = 1600000000.0 + i * 0.25
+        ptr = rng.choice(["0x20001000", "0x20001004", "0xA", "0xa", "thisptr"])
+        classname = rng.choice(["Relay", "Dimmer", "SafeSwitch"])
+        valuename = rng.choice(["on", "intensity", "typename"])
+        value = str(rng.randrange(5))
+        history.append(time, ptr, classname, valuename, value)
+        entries.append(FirmwareStateHistoryEntry(
+            datetime.datetime.fromtimestamp(time), ptr, classname, valuename, value))
+    return entries
+
+
+def test_historyBehavesAsListOfEntries():
+    history = FirmwareStateHistory()
+    entries = fill(history, 500)
+
+    assert len(history) == len(entries)
+    assert list(map(fields, history)) == list(map(fields, entries))
+    assert list(map(fields, reversed(history))) == list(map(fields, reversed(entries)))
+    assert fields(history[-1]) == fields(entries[-1])
+    assert list(map(fields, history[10:20:3])) == list(map(fields, entries[10:20:3]))
+    assert [history.value(i) for i in range(len(history))] == [entry.value for entry in entries]
+
+
+def test_indicesMatchScan():
+    history = FirmwareStateHistory()
+    entries = fill(history, 500)
+
+    for classname in [None, "Relay", "Dimmer", "Unknown"]:
+        for valuename in [None, "on", "typename", "unknown"]:
+            expected = [i for i, entry in enumerate(entries)
+                        if (classname is None or entry.classname == classname)
+                        and (valuename is None or entry.valuename == valuename)]
+            assert history.indices(classname, valuename) == expected, (classname, valuename)
+            assert list(map(fields, history.filter(classname, valuename))) == \
+                [fields(entries[i]) for i in expected]
+
+
+def test_ptrsKeepTheirNotation():
+    history = FirmwareStateHistory()
+    # the same address in different notations, they used to be kept apart as strings.
+    history.append(0.0, "0xA", "Relay", "on", "1")
+    history.append(1.0, "0xa", "Relay", "on", "0")
+    history.append(2.0, "0x0a", "Relay", "on", "1")
+    history.append(3.0, "0xA", "Relay", "on", "0")
+    assert [entry.ptr for entry in history] == ["0xA", "0xa", "0x0a", "0xA"]
+
+    history.clear()
+    assert len(history) == 0
+    history.append(0.0, "0xa", "Relay", "on", "1")
+    assert history[0].ptr == "0xa"
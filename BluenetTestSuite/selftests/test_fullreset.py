@@ -0,0 +1,51 @@
+"""
+Checks that fullReset returns once the crownstone has booted, without waiting for the dimmer, and that a test that
+dims gets its dimmer state by waiting for it with FirmwareState.waitFor.
+"""
+import time
+
+from crownstone_core.protocol.BluenetTypes import ControlType
+from crownstone_uart import CrownstoneUart
+from crownstone_uart.core.UartEventBus import UartEventBus
+
+from BluenetTestSuite.firmwarecontrol.datatransport import sendCommandToCrownstone
+from BluenetTestSuite.firmwarecontrol.utils import fullReset
+from BluenetTestSuite.firmwarestate.firmwarestate import FirmwareState
+from BluenetTestSuite.simulator.crownstonesimulator import CrownstoneSimulator
+
+
+def test_returnsOnBoot():
+    # the dimmer powers up long after the test ends, as far as fullReset is concerned it never does.
+    with CrownstoneSimulator(bootDelay=0.2, dimmerPowerUpDelay=1000) as simulator:
+        uart = CrownstoneUart()
+        uart.initialize_usb_sync(port=simulator.port)
+        try:
+            t1 = time.monotonic()
+            boot = fullReset(timeout=10)
+            duration = time.monotonic() - t1
+        finally:
+            uart.stop()
+    assert boot.bootTime is not None
+    assert duration < 2
+
+
+def test_dimmingWaitsForTheDimmer():
+    with CrownstoneSimulator(bootDelay=0.2, dimmerPowerUpDelay=1.0) as simulator:
+        uart = CrownstoneUart()
+        uart.initialize_usb_sync(port=simulator.port)
+        FW = FirmwareState(echo=False)
+        try:
+            boot = fullReset(timeout=10)
+            sendCommandToCrownstone(ControlType.ALLOW_DIMMING, [1])
+            sendCommandToCrownstone(ControlType.SWITCH, [50])
+
+            # the dimmer isn't powered yet, the relay is switched instead.
+            assert FW.waitFor("Relay", "on", True, timeout=5)
+            assert FW.getValue("Dimmer", "intensity") == "0"
+
+            assert FW.waitFor("Dimmer", "intensity", 50, timeout=10)
+            assert FW.waitFor("Relay", "on", False, timeout=5)
+            assert boot.elapsed() >= boot.bootTime + 1.0
+        finally:
+            UartEventBus.unsubscribe(FW.uartSubscription)
+            uart.stop()
@@ -0,0 +1,85 @@
+"""
+Checks that the lines of a LivePlot stay within its point and marker budgets, however many lines and samples it
+gets, and that streams are only rendered within its time window.
+"""
+import datetime
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from BluenetTestSuite.utils.liveplot import LivePlot, BlitRenderer, toDateNums
+from BluenetTestSuite.utils.rssistream import RssiStream, NearestStream
+
+
+def liveplot(**kwargs):
+    fig = Figure(figsize=(8, 4), dpi=100)
+    FigureCanvasAgg(fig)
+    plot = LivePlot(fig.subplots(), datetime.timedelta(seconds=60), **kwargs)
+    return fig, plot
+
+
+def samples(now, count):
+    times = np.datetime64(now) - np.arange(count)[::-1] * np.timedelta64(60 * 1000000 // count, "us")
+    return times, np.random.default_rng(count).integers(-80, -40, count)
+
+
+def test_denseLinesShareThePointBudget():
+    now = datetime.datetime(2021, 1, 1, 12)
+    fig, plot = liveplot(maxPoints=2000, maxMarkers=500)
+    plot.setTimeWindow(now)
+    times, rssis = samples(now, 20000)
+    # the lines that were set before the others existed get their share from the next frame on.
+    for frame in range(2):
+        for key in range(20):
+            plot.setLine(key, times, rssis, marker='o')
+        BlitRenderer(fig, [plot]).render()
+
+    # each line gets 1/20 of the budget, plus the points just outside the time window.
+    assert sum(len(line.get_xdata()) for line in plot.lines.values()) <= 2000 + 20 * 2
+    assert all(line.get_marker() == 'None' for line in plot.lines.values())
+
+
+def test_sparseLinesKeepTheirMarkers():
+    now = datetime.datetime(2021, 1, 1, 12)
+    fig, plot = liveplot(maxPoints=2000, maxMarkers=500)
+    plot.setTimeWindow(now)
+    times, rssis = samples(now, 60)
+    for key in range(5):
+        plot.setLine(key, times, rssis, marker='o')
+    assert all(line.get_marker() == 'o' for line in plot.lines.values())
+    assert all(len(line.get_xdata()) == 60 for line in plot.lines.values())
+
+    # a line that becomes dense loses its markers, and gets them back when it's sparse again.
+    plot.setLine(0, *samples(now, 5000), marker='o')
+    assert plot.lines[0].get_marker() == 'None'
+    plot.setLine(0, times, rssis, marker='o')
+    assert plot.lines[0].get_marker() == 'o'
+
+    plot.clear()
+    assert plot.markers == {}
+
+
+def test_streamIsRenderedWithinTheTimeWindow():
+    now = datetime.datetime(2021, 1, 1, 12)
+    fig, plot = liveplot()
+    plot.setTimeWindow(now)
+    rssiStream = RssiStream("asset", 1)
+    nearestStream = NearestStream("asset")
+    for second in range(600):
+        timestamp = now - datetime.timedelta(seconds=600 - second)
+        rssiStream.addNewEntry(timestamp, -second % 50)
+        nearestStream.addNewEntry(timestamp, -second % 50, second // 100, blockPlot=True)
+
+    times, rssis = plot.setStream("rssi", rssiStream)
+    # the 60 visible samples, the one before the time window, each block plotted.
+    assert len(times) == 2 * 61 - 1
+    assert np.array_equal(times, toDateNums(rssiStream.times)[-len(times):])
+    assert np.array_equal(rssis, rssiStream.rssis[-len(times):])
+    assert np.array_equal(plot.lines["rssi"].get_xdata(), times)
+
+    times, rssis, receivers = plot.setStream("nearest", nearestStream)
+    assert len(times) == 2 * 61 - 1
+    assert np.array_equal(times, toDateNums(nearestStream.times)[-len(times):])
+    assert np.array_equal(rssis, nearestStream.rssis[-len(times):])
+    assert np.array_equal(receivers, nearestStream.receivers[-len(times):])
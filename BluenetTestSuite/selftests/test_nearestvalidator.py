@@ -0,0 +1,37 @@
+"""
+Checks of the NearestCrownstoneValidator and the asset id it derives from a MAC address.
+"""
+import zlib
+
+from BluenetTestSuite.utils.nearestvalidator import NearestCrownstoneValidator, assetIdFromMac
+
+MAC = "ac:23:3f:71:cd:36"
+
+
+def test_assetIdFromMac():
+    # crc32 (as zlib computes it) of the MAC in advertised, reversed, byte order.
+    advertised = bytes(reversed(bytes.fromhex(MAC.replace(":", ""))))
+    assert assetIdFromMac(MAC) == zlib.crc32(advertised) & 0xFFFFFF == 0x19948f
+    assert assetIdFromMac(MAC.upper()) == assetIdFromMac(MAC)
+
+
+def test_matchAndMismatch():
+    validator = NearestCrownstoneValidator(margin=3, accommodationTime=2, reportInterval=0)
+    assetId = assetIdFromMac(MAC)
+    validator.rssi(assetId, 1, -50, 0.0)
+    validator.rssi(assetId, 2, -70, 0.0)
+    validator.nearest(assetId, 1, 0.5)
+    validator.nearest(assetId, 2, 3.0)
+
+    assert (validator.matchCount, validator.mismatchCount) == (1, 1)
+    assert validator.assetIdsMatch
+
+
+def test_warnsWhenNoAssetIdMatches(capsys):
+    validator = NearestCrownstoneValidator(reportInterval=0, idCheckUpdates=10)
+    validator.rssi(assetIdFromMac(MAC), 1, -50, 0.0)
+    for i in range(10):
+        validator.nearest(0x123456, 1, 0.1 * i)
+
+    assert validator.assetIdsMatch is False
+    assert "none of the asset ids in 10 updates" in capsys.readouterr().out
@@ -0,0 +1,110 @@
+"""
+Checks the files ReportWriter writes: a header per packet class per file, when it flushes, how it rotates and prunes
+the rotated files, and that it appends to an existing file.
+"""
+import types
+
+from BluenetTestSuite.utils import reportwriter
+from BluenetTestSuite.utils.reportwriter import ReportWriter
+
+
+class FakeReport:
+    def __init__(self, name, rssi):
+        self.name = name
+        self.rssi = rssi
+
+
+class OtherReport:
+    def __init__(self, channel):
+        self.channel = channel
+
+
+def lines(path):
+    with open(path, encoding="utf-8") as file:
+        return file.read().splitlines()
+
+
+def headers(path):
+    return [line for line in lines(path) if line.startswith("# ") and not line.startswith("# Tracker")]
+
+
+def test_oneHeaderPerClassPerFile(tmp_path):
+    path = tmp_path / "reports.csv"
+    with ReportWriter(str(path), maxBytes=0) as writer:
+        writer.write([[1.0, FakeReport("a", -60)], [2.0, OtherReport(37)]])
+        writer.write([[3.0, FakeReport("b", -61)], [4.0, FakeReport("c", -62)]])
+
+    assert headers(path) == ["# FakeReport: time,type,name,rssi", "# OtherReport: time,type,channel"]
+    assert lines(path)[-1] == "4.000000,FakeReport,c,-62"
+    assert writer.reportCount == 4
+
+
+def test_flushOnSizeAndInterval(tmp_path, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(reportwriter, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    path = tmp_path / "reports.csv"
+    writer = ReportWriter(str(path), maxBytes=0, flushInterval=10.0, flushSize=1000)
+    writer.open()
+    writer.flush()
+
+    writer.write([[1.0, FakeReport("a", -60)]])
+    assert len(lines(path)) == 1
+
+    # flushSize is reached.
+    writer.write([[2.0, FakeReport("b" * 1000, -60)]])
+    assert lines(path)[-1].startswith("2.000000")
+
+    # flushInterval has passed.
+    writer.write([[3.0, FakeReport("c", -60)]])
+    assert lines(path)[-1].startswith("2.000000")
+    now[0] += 10.0
+    writer.write([[4.0, FakeReport("d", -60)]])
+    assert lines(path)[-1].startswith("4.000000")
+    writer.close()
+
+
+def test_sizeIsCountedInBytes(tmp_path):
+    path = tmp_path / "reports.csv"
+    with ReportWriter(str(path), maxBytes=0) as writer:
+        writer.write([[1.0, FakeReport("é" * 100, -60)]])
+        writer.flush()
+        assert writer.size == path.stat().st_size
+
+
+def test_rotationAndPruning(tmp_path):
+    path = tmp_path / "reports.csv"
+    with ReportWriter(str(path), maxBytes=200, backupCount=2) as writer:
+        for i in range(5):
+            # each write takes the file beyond maxBytes.
+            writer.write([[float(i), FakeReport("x" * 200, i)]])
+
+    assert writer.rotation == 5
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["reports.csv", "reports.csv.4", "reports.csv.5"]
+    # every rotated file starts with its own header.
+    for rotated, i in [("reports.csv.4", 3), ("reports.csv.5", 4)]:
+        assert headers(tmp_path / rotated) == ["# FakeReport: time,type,name,rssi"]
+        assert lines(tmp_path / rotated)[-1].endswith(",{0}".format(i))
+
+    # a new writer continues the numbering.
+    with ReportWriter(str(path), maxBytes=200, backupCount=2) as writer:
+        writer.write([[5.0, FakeReport("x" * 200, 5)]])
+    assert writer.rotation == 6
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["reports.csv", "reports.csv.5", "reports.csv.6"]
+
+
+def test_reopenAppends(tmp_path):
+    path = tmp_path / "reports.csv"
+    with ReportWriter(str(path)) as writer:
+        writer.write([[1.0, FakeReport("a", -60)]])
+    before = lines(path)
+
+    with ReportWriter(str(path)) as writer:
+        # counting on from the size of the existing file.
+        writer.flush()
+        assert writer.size == path.stat().st_size
+        writer.write([[2.0, FakeReport("b", -61)]])
+
+    after = lines(path)
+    assert after[:len(before)] == before
+    assert after[len(before)].startswith("# Tracker file created on")
+    assert after[-1] == "2.000000,FakeReport,b,-61"
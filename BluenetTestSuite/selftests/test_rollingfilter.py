@@ -0,0 +1,49 @@
+"""
+Checks the rolling filters against statistics.median and statistics.mean over the n samples before each sample.
+"""
+import random
+import statistics
+
+import pytest
+
+from BluenetTestSuite.utils.rollingfilter import RollingMedian, RollingMean, slidingMedian, slidingMean
+
+
+def reference(values, n, reduce):
+    """
+    reduce over the n values before each value, the first value is passed through.
+    """
+    return [values[0] if i == 0 else reduce(values[max(0, i - n):i]) for i in range(len(values))]
+
+
+def series(length, seed):
+    rng = random.Random(seed)
+    # rssi like integers, with many duplicates, and a few floats.
+    return [rng.randrange(-90, -40) if rng.random() < 0.9 else rng.uniform(-90, -40) for i in range(length)]
+
+
+@pytest.mark.parametrize("n", [1, 2, 5, 8])
+@pytest.mark.parametrize("length", [1, 3, 100])
+def test_median(n, length):
+    values = series(length, seed=n * 1000 + length)
+    expected = reference(values, n, statistics.median)
+
+    medianfilter = RollingMedian(n)
+    assert [medianfilter.push(value) for value in values] == pytest.approx(expected)
+    assert list(slidingMedian(values, n)) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("n", [1, 2, 5, 8])
+@pytest.mark.parametrize("length", [1, 3, 100])
+def test_mean(n, length):
+    values = series(length, seed=n * 1000 + length)
+    expected = reference(values, n, statistics.mean)
+
+    meanfilter = RollingMean(n)
+    assert [meanfilter.push(value) for value in values] == pytest.approx(expected)
+    assert list(slidingMean(values, n)) == pytest.approx(expected)
+
+
+def test_emptySeries():
+    assert len(slidingMedian([], 5)) == 0
+    assert len(slidingMean([], 5)) == 0
@@ -0,0 +1,169 @@
+"""
+Replays a capture of rssi firmware state updates through the rssidatatracker script, and checks its filtered rssi
+streams, its per pair history lookups and its headless snapshots.
+"""
+import datetime
+import os
+import statistics
+
+from crownstone_uart.core.UartEventBus import UartEventBus
+from crownstone_uart.core.uart.UartTypes import UartRxType
+from crownstone_uart.core.uart.uartPackets.UartMessagePacket import UartMessagePacket
+from crownstone_uart.topics.SystemTopics import SystemTopics
+
+from BluenetTestSuite.firmwarestate.firmwarestate import FirmwareState
+from BluenetTestSuite.testscripts import rssidatatracker
+from BluenetTestSuite.utils.rollingfilter import RollingMedian
+from BluenetTestSuite.utils.uartcapture import CaptureRecorder, CaptureReplayer
+
+# (sender, receiver, channel, rssi) of the recorded pings.
+PINGS = [(1, 2, 37, -60), (2, 1, 38, -64), (1, 3, 37, -70), (1, 2, 39, -62), (3, 1, 37, -71), (2, 1, 37, -66)]
+
+
+def emit(update):
+    UartEventBus.emit(SystemTopics.uartNewMessage, UartMessagePacket(UartRxType.FIRMWARESTATE, list(update.encode())))
+
+
+def emitRssi(sender, receiver, channel, rssi):
+    emit("2000aa10@void RssiDataTracker::init()@rssi_{0}_{1}_{2}@{3}".format(sender, receiver, channel, rssi))
+
+
+def recordCapture(filename):
+    with CaptureRecorder(filename):
+        for ping in PINGS:
+            emitRssi(*ping)
+
+
+def test_replayThroughTracker(tmp_path):
+    capturefilename = os.path.join(str(tmp_path), "session.cap")
+    trackerfilename = os.path.join(str(tmp_path), "rssidata.csv")
+    recordCapture(capturefilename)
+
+    with rssidatatracker.Main(headless=True, replayfilename=capturefilename, replayspeed=0,
+                              trackerfilename=trackerfilename) as m:
+        m.run()
+    UartEventBus.unsubscribe(m.fwState.uartSubscription)
+
+    with CaptureReplayer(capturefilename) as reader:
+        recorded = [datetime.datetime.fromtimestamp(reader.startTime + reader.packet(i)[0]) for i in range(len(reader))]
+
+    # every ping is recorded, with the time at which it was captured.
+    lines = [line.strip() for line in open(trackerfilename) if not line.startswith("#")]
+    assert lines == [",".join(str(x) for x in [t, sender, receiver, channel, float(rssi)])
+                     for t, (sender, receiver, channel, rssi) in zip(recorded, PINGS)]
+
+    tracker = m.rssiDataTracker
+    assert tracker.activeCrownstoneIds == {"1", "2", "3"}
+    assert [float(entry.value) for entry in tracker.getLastN(1, 2, n=10)] == [-66, -62, -64, -60]
+    assert [float(entry.value) for entry in tracker.getLastN(3, 1, n=10)] == [-71, -70]
+    assert tracker.avgRssiLastN(2, 1, n=2) == -64
+
+
+def test_rssiStreamFiltersAndPrunes():
+    start = datetime.datetime(2021, 1, 1)
+    rssis = [-60, -70, -65, -80, -62, -61, -75, -68]
+    stream = rssidatatracker.RssiStream(RollingMedian(3))
+    for i, rssi in enumerate(rssis):
+        stream.put(start + datetime.timedelta(seconds=i), rssi)
+
+    expected = [rssis[0]] + [statistics.median(rssis[max(0, i - 3):i]) for i in range(1, len(rssis))]
+    assert stream.filtered == expected
+
+    # the filtered values stay aligned with the samples, and don't change when older samples are pruned.
+    stream.prune(start + datetime.timedelta(seconds=5))
+    assert stream.rssis == rssis[5:]
+    assert stream.filtered == expected[5:]
+    assert stream.times[0] == start + datetime.timedelta(seconds=5)
+
+    stream.prune(start + datetime.timedelta(seconds=100))
+    assert (stream.times, stream.rssis, stream.filtered) == ([], [], [])
+
+
+class Clock:
+    def __init__(self, start):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+def test_pairHistoryLookups():
+    clock = Clock(1000.0)
+    fw = FirmwareState(echo=False, clock=clock)
+    try:
+        tracker = rssidatatracker.RssiDataTracker(fw)
+        # one ping per second, alternating between the pairs (1,2) and (1,3), with other updates in between.
+        for i in range(10):
+            clock.now = 1000.0 + i
+            if i % 2 == 0:
+                emitRssi(1, 2, 37, -50 - i)
+            else:
+                emitRssi(3, 1, 38, -50 - i)
+            emit("2000bb20@void TestAccess::setup()@state@{0}".format(i))
+
+        values = lambda entries: [float(entry.value) for entry in entries]
+        at = lambda seconds: datetime.datetime.fromtimestamp(1000.0 + seconds)
+
+        assert values(tracker.getLastN(1, 2, n=3)) == [-58, -56, -54]
+        assert values(tracker.getLastN(2, 1, n=100)) == [-58, -56, -54, -52, -50]
+        assert values(tracker.getLastN(3, 1, n=1)) == [-59]
+        assert tracker.getLastN(1, 2, n=0) == []
+        assert tracker.getLastN(1, 4) == []
+
+        # the window includes its bounds.
+        assert values(tracker.getInTimeWindow(1, 2, at(2), at(6))) == [-56, -54, -52]
+        assert values(tracker.getInTimeWindow(1, 3, at(2), at(6))) == [-55, -53]
+        assert tracker.getInTimeWindow(1, 2, at(20), at(30)) == []
+        assert tracker.avgRssiInTimeWindow(1, 3, at(0), at(4)) == -52
+        assert [entry.time for entry in tracker.getInTimeWindow(1, 2, at(8), at(8))] == [at(8)]
+
+        # after clearing the history, the old updates are gone and the new ones are found.
+        fw.clear()
+        assert tracker.getLastN(1, 2, n=10) == []
+        assert tracker.getInTimeWindow(1, 2, at(0), at(10)) == []
+
+        clock.now = 1020.0
+        emit("2000bb20@void TestAccess::setup()@state@20")
+        emitRssi(2, 1, 39, -70)
+        assert values(tracker.getLastN(1, 2, n=10)) == [-70]
+        assert values(tracker.getInTimeWindow(1, 2, at(15), at(25))) == [-70]
+        assert tracker.getLastN(1, 3) == []
+    finally:
+        UartEventBus.unsubscribe(fw.uartSubscription)
+
+
+def test_headlessSnapshot(tmp_path):
+    capturefilename = os.path.join(str(tmp_path), "session.cap")
+    snapshotfilename = os.path.join(str(tmp_path), "rssidata.png")
+    recordCapture(capturefilename)
+
+    with rssidatatracker.Main(headless=True, snapshotfilename=snapshotfilename, snapshotinterval_seconds=3600,
+                              replayfilename=capturefilename, replayspeed=0,
+                              trackerfilename=os.path.join(str(tmp_path), "rssidata.csv")) as m:
+        m.run()
+    UartEventBus.unsubscribe(m.fwState.uartSubscription)
+
+    # the snapshotter saves a last snapshot when it's stopped, with all replayed pings in the streams.
+    assert (m.snapshotter.snapshotCount, m.snapshotter.errorCount) == (1, 0)
+    assert not os.path.exists(os.path.join(str(tmp_path), "rssidata.tmp.png"))
+    with open(snapshotfilename, "rb") as snapshot:
+        assert snapshot.read(8) == b"\x89PNG\r\n\x1a\n"
+
+    streams = m.stonePairToChannelStreamsDict
+    assert set(streams) == {frozenset({"1", "2"}), frozenset({"1", "3"})}
+    assert streams[frozenset({"1", "2"})][37].rssis == [-60, -66]
+    assert streams[frozenset({"1", "3"})][37].rssis == [-70, -71]
+
+
+def test_headlessWithoutSnapshotDoesntPlot(tmp_path):
+    capturefilename = os.path.join(str(tmp_path), "session.cap")
+    recordCapture(capturefilename)
+
+    with rssidatatracker.Main(headless=True, replayfilename=capturefilename, replayspeed=0,
+                              trackerfilename=os.path.join(str(tmp_path), "rssidata.csv")) as m:
+        m.run()
+    UartEventBus.unsubscribe(m.fwState.uartSubscription)
+
+    assert m.snapshotter is None
+    assert m.pingQueueForPlotting.empty()
+    assert m.stonePairToChannelStreamsDict == {}
@@ -0,0 +1,57 @@
+"""
+Checks the recorded test durations, the longest-first order and that runParallel runs entry points in worker
+processes on several simulators. The entry points are the fake* functions in this module.
+"""
+from crownstone_core.protocol.BluenetTypes import ControlType
+
+from BluenetTestSuite.firmwarecontrol.datatransport import sendCommandToCrownstone
+from BluenetTestSuite.simulator.crownstonesimulator import CrownstoneSimulator
+# modules rather than classes, pytest would try to collect the Test* classes.
+from BluenetTestSuite.testframework import framework, scheduler, session
+
+
+def fakeSuccess(FW):
+    sendCommandToCrownstone(ControlType.SWITCH, [100])
+    return framework.TestFramework.success()
+
+
+def fakeFailure(FW):
+    return framework.TestFramework.failure("fake failure")
+
+
+def test_durationsRoundTrip(tmp_path):
+    path = str(tmp_path / "cache" / "testdurations.json")
+    durations = scheduler.TestDurations(path)
+    assert durations.durations == {}
+    durations.update([session.TestRecord("a.test_a", [], 12.5), session.TestRecord("b.test_b", [], 3.0)])
+    durations.save()
+
+    assert scheduler.TestDurations(path).durations == {"a.test_a": 12.5, "b.test_b": 3.0}
+
+
+def test_unknownTestsRunEarly():
+    durations = scheduler.TestDurations(None)
+    assert durations.expected("c") == 0.0
+
+    durations.durations = {"a": 10.0, "b": 5.0, "d": 20.0}
+    # never ran: expected to take as long as the longest known one, ahead of the shorter ones.
+    assert durations.expected("c") == 20.0
+    order = scheduler.longestFirst(["b", "c", "a", "d"], durations)
+    assert order.index("c") < order.index("a") < order.index("b")
+    assert order[-2:] == ["a", "b"]
+
+
+def test_runParallel():
+    names = ["test_scheduler.fakeSuccess", "test_scheduler.fakeFailure"]
+    with CrownstoneSimulator() as first, CrownstoneSimulator() as second:
+        ports = [first.port, second.port]
+        records = scheduler.runParallel(names, ports, package="BluenetTestSuite.selftests")
+
+    assert sorted(record.name for record in records) == sorted(names)
+    for record in records:
+        assert record.port in ports
+        assert record.duration > 0
+        assert len(record.results) == 1
+    byname = {record.name: record for record in records}
+    assert not byname["test_scheduler.fakeSuccess"].failures
+    assert byname["test_scheduler.fakeFailure"].failures
@@ -0,0 +1,54 @@
+"""
+Checks that a TestSession runs several entry points over one uart connection with one FirmwareState.
+"""
+import pytest
+
+from BluenetTestSuite.firmwarecontrol.switchaggregator import sendSwitchCommand
+from BluenetTestSuite.simulator.crownstonesimulator import CrownstoneSimulator
+# modules rather than classes, pytest would try to collect the Test* classes.
+from BluenetTestSuite.testframework import framework, session as testsession
+
+
+@pytest.fixture(scope="module")
+def session():
+    with CrownstoneSimulator() as simulator:
+        with testsession.TestSession(port=simulator.port) as session:
+            yield session
+
+
+def switchOn(FW):
+    sendSwitchCommand(100)
+    if FW.waitFor("SwitchAggregator", "_overrideState", 100, timeout=5):
+        return framework.TestFramework.success()
+    return framework.TestFramework.failure("override state didn't become 100")
+
+
+def test_entryPointsShareTheConnectionAndState(session):
+    seen = []
+    def recordState(FW):
+        seen.append((FW, session.framework.uart, FW.getValue("SwitchAggregator", "_overrideState")))
+        return framework.TestFramework.success()
+
+    uart = session.framework.uart
+    first = session.run(testsession.TestEntryPoint("selftest", switchOn))
+    second = session.run(testsession.TestEntryPoint("selftest", recordState))
+
+    assert not first.failures
+    assert not second.failures
+    # the simulator only reports changes, so the override state is unknown after clearing.
+    assert seen == [(session.firmwarestate, uart, None)]
+
+
+def test_exceptionIsReportedAsFailure(session):
+    def raises(FW):
+        raise RuntimeError("test crashed")
+
+    record = session.run(testsession.TestEntryPoint("selftest", raises))
+    assert len(record.failures) == 1
+    assert session.records[-1] is record
+
+
+def test_discoverEntryPoints():
+    names = [entrypoint.name for entrypoint in testsession.discoverEntryPoints()]
+    assert "test_dumbhomemode.run_all_scenarios" in names
+    assert names == sorted(names)
@@ -0,0 +1,91 @@
+"""
+Checks that the Snapshotter writes each snapshot to a temporary file that then replaces the previous one, names the
+snapshots after their time with keep, saves a last snapshot on stop and keeps going when ingest or snapshot fail.
+"""
+import os
+import re
+import time
+
+from BluenetTestSuite.utils.snapshotter import Snapshotter
+
+
+class Recorder:
+    """
+    ingest and snapshot callables that record their calls. snapshot checks that the target file isn't touched
+    while the snapshot is written.
+    """
+    def __init__(self, target=None, failingIngests=0):
+        self.target = target
+        self.failingIngests = failingIngests
+        self.ingestCount = 0
+        self.filenames = []
+
+    def ingest(self):
+        self.ingestCount += 1
+        if self.ingestCount <= self.failingIngests:
+            raise RuntimeError("ingest failed")
+
+    def snapshot(self, fig, axs_flat, filename):
+        if self.target is not None and os.path.exists(self.target):
+            with open(self.target) as file:
+                assert file.read() == "snapshot {0}".format(len(self.filenames))
+        self.filenames.append(filename)
+        with open(filename, "w") as file:
+            file.write("snapshot {0}".format(len(self.filenames)))
+
+
+def test_snapshotReplacesPrevious(tmp_path):
+    target = str(tmp_path / "nearest.png")
+    recorder = Recorder(target)
+    snapshotter = Snapshotter(recorder.ingest, recorder.snapshot, target, rows=2, cols=2,
+                              interval=0.05, ingestInterval=0.01)
+    snapshotter.start()
+    time.sleep(0.3)
+    snapshotter.stop()
+
+    assert snapshotter.snapshotCount >= 2
+    assert set(recorder.filenames) == {str(tmp_path / "nearest.tmp.png")}
+    assert os.listdir(str(tmp_path)) == ["nearest.png"]
+    with open(target) as file:
+        assert file.read() == "snapshot {0}".format(snapshotter.snapshotCount)
+
+
+def test_keepNamesSnapshotsByTime(tmp_path):
+    recorder = Recorder()
+    snapshotter = Snapshotter(recorder.ingest, recorder.snapshot, str(tmp_path / "nearest.svg"), keep=True,
+                              interval=1000)
+    snapshotter.start()
+    snapshotter.stop()
+
+    names = os.listdir(str(tmp_path))
+    assert len(names) == 1
+    assert re.fullmatch(r"nearest-\d{8}-\d{6}\.svg", names[0])
+    assert recorder.filenames == [str(tmp_path / names[0].replace(".svg", ".tmp.svg"))]
+
+
+def test_stopSavesLastSnapshot(tmp_path):
+    recorder = Recorder()
+    snapshotter = Snapshotter(recorder.ingest, recorder.snapshot, str(tmp_path / "nearest.png"),
+                              interval=1000, ingestInterval=1000)
+    snapshotter.start()
+    snapshotter.stop()
+
+    # the queue is ingested once more before the last snapshot.
+    assert recorder.ingestCount == 1
+    assert snapshotter.snapshotCount == 1
+    assert not snapshotter.is_alive()
+
+
+def test_failuresAreCounted(tmp_path):
+    recorder = Recorder(failingIngests=3)
+    snapshotter = Snapshotter(recorder.ingest, recorder.snapshot, str(tmp_path / "missing" / "nearest.png"),
+                              interval=0.05, ingestInterval=0.01)
+    snapshotter.start()
+    time.sleep(0.2)
+    snapshotter.stop()
+
+    # the directory doesn't exist: no snapshot can be saved, but ingesting goes on.
+    assert recorder.ingestCount > 3
+    assert snapshotter.snapshotCount == 0
+    assert snapshotter.errorCount == 3 + len(recorder.filenames)
+    assert "0 snapshots" in snapshotter.status()
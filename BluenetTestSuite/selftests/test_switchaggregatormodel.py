@@ -0,0 +1,72 @@
+"""
+Checks that the SwitchAggregator reference model gives the values that the device tests expect: the twilight
+conflict resolution cases of tests/test_twilightconflictresolution.py and scenarios 0-2 of
+tests/test_singleswitchbehaviour.py.
+"""
+import pytest
+
+from BluenetTestSuite.firmwarecontrol.behaviourstore import buildSwitchBehaviour, buildTwilight
+from BluenetTestSuite.firmwarecontrol.utils import getTime_uint32
+from BluenetTestSuite.referencemodel.switchaggregatormodel import BehaviourStoreModel, SwitchAggregatorModel
+# the module rather than test_case, pytest would try to collect it.
+from BluenetTestSuite.tests import test_twilightconflictresolution as twilightconflicts
+
+
+def test_twilightConflictResolution():
+    cases = twilightconflicts.build_testcases()
+    assert len(cases) == 35
+    for case in cases:
+        model = SwitchAggregatorModel(BehaviourStoreModel([case.t0, case.t1]))
+        for i in range(3):
+            # as in the device test, a day later so that the time isn't 0.
+            model.setTime(case.ex_time(i) + 24 * 3600)
+            assert model.getState()["_twilightState"] == str(case.e[i]), "{0}, expectation {1}".format(case, i)
+
+
+# behaviours and [hours, minutes, event, expected values] of scenarios 0-2 of test_singleswitchbehaviour,
+# event is None or "switchcraft".
+SCENARIOS = {
+    "scenario 0": (
+        [buildTwilight(9, 12, 80), buildTwilight(11, 15, 60),
+         buildSwitchBehaviour(13, 15, 100), buildSwitchBehaviour(14, 15, 30)],
+        [[9, 0, None, {"_overrideState": "-1", "_aggregatedState": "0"}],
+         [10, 0, "switchcraft", {}],
+         [10, 1, None, {"_overrideState": "255", "_aggregatedState": "80"}],
+         [11, 1, None, {"_overrideState": "255", "_aggregatedState": "60"}],
+         [13, 1, None, {"_overrideState": "255", "_aggregatedState": "60"}],
+         [14, 1, None, {"_overrideState": "255", "_aggregatedState": "30"}],
+         [15, 1, None, {"_overrideState": "-1", "_aggregatedState": "0"}]]),
+    "scenario 1": (
+        [buildTwilight(9, 15, 80), buildSwitchBehaviour(12, 15, 70)],
+        [[9, 0, None, {"_overrideState": "-1", "_aggregatedState": "0"}],
+         [10, 0, "switchcraft", {}],
+         [10, 1, None, {"_overrideState": "255", "_aggregatedState": "80"}],
+         [11, 0, "switchcraft", {}],
+         [11, 1, None, {"_overrideState": "0", "_aggregatedState": "0"}],
+         [12, 0, None, {"_overrideState": "-1", "_aggregatedState": "70"}]]),
+    "scenario 2": (
+        [buildTwilight(9, 16, 80), buildSwitchBehaviour(11, 14, 70),
+         buildSwitchBehaviour(13, 14, 30), buildSwitchBehaviour(15, 16, 50)],
+        [[9, 0, None, {"_overrideState": "-1", "_aggregatedState": "0"}],
+         [10, 0, "switchcraft", {"_overrideState": "255", "_aggregatedState": "80"}],
+         [11, 0, None, {"_overrideState": "255", "_aggregatedState": "70"}],
+         [12, 0, "switchcraft", {"_overrideState": "0", "_aggregatedState": "0"}],
+         [13, 0, None, {"_overrideState": "0"}],
+         [13, 0, "switchcraft", {"_overrideState": "255"}],
+         [13, 1, None, {"_behaviourState": "30", "_twilightState": "80", "_aggregatedState": "30"}],
+         [14, 0, None, {"_overrideState": "-1", "_aggregatedState": "0"}],
+         [15, 0, None, {"_overrideState": "-1", "_aggregatedState": "50"}]]),
+}
+
+
+@pytest.mark.parametrize("name", sorted(SCENARIOS))
+def test_singleSwitchBehaviourScenarios(name):
+    behaviours, steps = SCENARIOS[name]
+    model = SwitchAggregatorModel(BehaviourStoreModel(behaviours))
+    for hours, minutes, event, expected in steps:
+        model.setTime(getTime_uint32(hours, minutes, 0))
+        if event == "switchcraft":
+            model.switchCraft()
+        state = model.getState()
+        for valuename, value in expected.items():
+            assert state[valuename] == value, "{0} at {1}:{2:02}: {3}".format(name, hours, minutes, valuename)
@@ -0,0 +1,84 @@
+"""
+Records firmware state updates with a CaptureRecorder and replays them into a FirmwareState, which should end up
+with the same state and with the recorded times in its history.
+"""
+import datetime
+import os
+import time
+
+from crownstone_uart.core.UartEventBus import UartEventBus
+from crownstone_uart.core.uart.UartTypes import UartRxType
+from crownstone_uart.core.uart.uartPackets.UartMessagePacket import UartMessagePacket
+from crownstone_uart.topics.SystemTopics import SystemTopics
+from crownstone_uart.topics.UartTopics import UartTopics
+
+from BluenetTestSuite.firmwarestate.firmwarestate import FirmwareState
+from BluenetTestSuite.utils.uartcapture import CaptureRecorder, CaptureReplayer
+
+UPDATES = [
+    "2000aa10@void RssiDataTracker::init()@rssi_1_2_37@-60",
+    "2000aa10@void RssiDataTracker::init()@rssi_2_1_38@-65",
+    "2000bb20@void TestAccess::setup()@state@1",
+    "2000aa10@void RssiDataTracker::init()@rssi_1_2_37@-62",
+]
+
+
+def emit(opCode, string):
+    UartEventBus.emit(SystemTopics.uartNewMessage, UartMessagePacket(opCode, list(string.encode("ascii"))))
+
+
+def record(filename):
+    with CaptureRecorder(filename):
+        for update in UPDATES:
+            emit(UartRxType.FIRMWARESTATE, update)
+            time.sleep(0.05)
+        emit(UartRxType.UART_MESSAGE, "hello from the replay")
+
+
+def replay(filename, parse=True):
+    """
+    Returns the FirmwareState, the uart messages and the replayer after replaying filename.
+    """
+    uartmessages = []
+    subscription = UartEventBus.subscribe(UartTopics.uartMessage, uartmessages.append)
+    with CaptureReplayer(filename, speed=0, parse=parse) as replayer:
+        fw = FirmwareState(echo=False, clock=replayer.clock)
+        try:
+            replayer.replay()
+        finally:
+            UartEventBus.unsubscribe(fw.uartSubscription)
+            UartEventBus.unsubscribe(subscription)
+    return fw, uartmessages, replayer
+
+
+def test_firmwareStateRoundTrip(tmp_path):
+    filename = os.path.join(str(tmp_path), "session.cap")
+    record(filename)
+
+    fw, uartmessages, replayer = replay(filename)
+
+    assert fw.getValue("RssiDataTracker", "rssi_1_2_37") == "-62"
+    assert fw.getValue("RssiDataTracker", "rssi_2_1_38") == "-65"
+    assert fw.getValue("TestAccess", "state") == "1"
+    assert [entry.valuename for entry in fw.historylist] == [update.split("@")[2] for update in UPDATES]
+
+    # the history has the recorded times, not the times of the replay.
+    with CaptureReplayer(filename) as reader:
+        recorded = [reader.startTime + reader.packet(i)[0] for i in range(len(UPDATES))]
+    for entry, recordedtime in zip(fw.historylist, recorded):
+        assert entry.time == datetime.datetime.fromtimestamp(recordedtime)
+    assert recorded[-1] - recorded[0] >= 0.1
+    assert replayer.replayDuration < 0.1
+
+    # the UartParser of the replayer emits the specific topics.
+    assert [message["string"] for message in uartmessages] == ["hello from the replay"]
+
+
+def test_replayWithoutParser(tmp_path):
+    filename = os.path.join(str(tmp_path), "session.cap")
+    record(filename)
+
+    fw, uartmessages, replayer = replay(filename, parse=False)
+
+    assert len(fw.historylist) == len(UPDATES)
+    assert uartmessages == []
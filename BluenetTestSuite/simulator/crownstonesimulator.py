@@ -0,0 +1,475 @@
+"""
+Software-in-the-loop stand-in for a Crownstone on a uart port. The simulator opens a pseudo-terminal and speaks
+the uart wrapper protocol on it, so that CrownstoneUart, TestFramework and FirmwareState can be used exactly as
+with a device on /dev/ttyACM0:
+
+    with CrownstoneSimulator(clockSpeed=60) as simulator:
+        with TestFramework(run_all_scenarios, port=simulator.port) as frame:
+            frame.test_run()
+
+It answers CONTROL messages with result packets and HELLO messages with a hello, handles MOCK_INTERNAL_EVT
+messages (which the firmware doesn't reply to) and reports FIRMWARESTATE updates for SwitchAggregator,
+BehaviourHandler, TwilightHandler, SafeSwitch, Relay and Dimmer, the classes the tests in BluenetTestSuite/tests
+make expectations about. Asset filters can be uploaded, removed, committed and summarised.
+
+The switch aggregator is simulated by referencemodel.SwitchAggregatorModel, on a clock that runs clockSpeed
+times faster than the wall clock once it has been set. Presence is not simulated: presence conditions of switch
+behaviours are considered to be satisfied.
+
+Run as a script to keep a simulator alive and print its port:
+    python -m BluenetTestSuite.simulator.crownstonesimulator
+"""
+import os
+import random
+import select
+import threading
+import time
+import tty
+
+from crownstone_core.packets.behaviour.BehaviourBase import BehaviourBase
+from crownstone_core.protocol.BluenetTypes import ControlType, ResultValue, StateType
+from crownstone_core.util.CRC import crc16ccitt
+from crownstone_core.util.Conversion import Conversion
+
+from crownstone_uart.core.uart.uartPackets.UartWrapperPacket import UartWrapperPacket, ESCAPE_TOKEN, BIT_FLIP_MASK, START_TOKEN
+from crownstone_uart.core.uart.UartTypes import UartTxType, UartRxType, UartMessageType
+
+from BluenetTestSuite.firmwarecontrol.InternalEventCodes import EventType
+from BluenetTestSuite.firmwarecontrol.switchaggregator import SwitchCommandValue
+from BluenetTestSuite.referencemodel.switchaggregatormodel import BehaviourStoreModel, SwitchAggregatorModel
+from BluenetTestSuite.simulator.filterstore import SimulatedFilterStore
+
+
+class UartFrameDecoder:
+    """
+    Splits the byte stream written by CrownstoneUart into uart wrapper packets.
+    Unescapes the data, checks the crc and returns the [messageType, payload] of complete packets.
+    """
+    def __init__(self):
+        self.buffer = None
+        self.escaping = False
+        self.size = None
+
+    def feed(self, data):
+        """
+        Returns a list of [messageType, payload] for each valid packet completed by data.
+        """
+        packets = []
+        for byte in data:
+            if byte == START_TOKEN:
+                self.buffer = []
+                self.escaping = False
+                self.size = None
+                continue
+            if self.buffer is None:
+                continue
+            if byte == ESCAPE_TOKEN:
+                self.escaping = True
+                continue
+            if self.escaping:
+                byte ^= BIT_FLIP_MASK
+                self.escaping = False
+
+            self.buffer.append(byte)
+            if self.size is None:
+                if len(self.buffer) == 2:
+                    self.size = Conversion.uint8_array_to_uint16(self.buffer)
+                    self.buffer = []
+                continue
+
+            if len(self.buffer) == self.size:
+                packet = self.buffer[:-2]
+                crc = Conversion.uint8_array_to_uint16(self.buffer[-2:])
+                if len(packet) >= 3 and crc16ccitt(packet) == crc:
+                    # skip protocol major and minor
+                    packets += [[packet[2], packet[3:]]]
+                self.buffer = None
+        return packets
+
+
+class SimulatedObject:
+    """
+    An object in the simulated firmware that reports its state values with FIRMWARESTATE messages.
+    Remembers the reported values so that only changes are sent.
+    """
+    def __init__(self, ptr, prettyfunction):
+        self.ptr = ptr
+        self.prettyfunction = prettyfunction
+        self.reported = dict()
+
+    @staticmethod
+    def format(value):
+        """
+        Formats value the way the firmware logs it: empty optionals as -1, booleans as True/False.
+        """
+        if value is None:
+            return "-1"
+        if isinstance(value, bool):
+            return str(value)
+        return str(int(value))
+
+
+class CrownstoneSimulator:
+    """
+    Simulated Crownstone behind a pseudo-terminal. Use in a with-statement, or call start and stop.
+
+    clockSpeed: number of simulated seconds per wall clock second.
+    bootDelay: wall clock seconds between a RESET command and the simulated device being up again.
+    dimmerPowerUpDelay: wall clock seconds between booting and the dimmer being powered.
+    tickInterval: wall clock seconds between two evaluations of the behaviours.
+    uploadFailureRate: fraction of asset filter chunks that is answered with BUSY instead of being stored,
+    to exercise retransmission.
+    """
+    def __init__(self, clockSpeed=1.0, bootDelay=0.5, dimmerPowerUpDelay=1.0, tickInterval=0.1, uploadFailureRate=0.0):
+        self.clockSpeed = clockSpeed
+        self.bootDelay = bootDelay
+        self.dimmerPowerUpDelay = dimmerPowerUpDelay
+        self.tickInterval = tickInterval
+
+        # sun times used for behaviours relative to sunrise/sunset, in minutes since midnight.
+        self.sunrise = 7 * 60
+        self.sunset = 20 * 60
+
+        self.masterFd = None
+        self.slaveFd = None
+        self.port = None
+
+        self.lock = threading.RLock()
+        self.writeLock = threading.Lock()
+        self.running = False
+        self.booted = False
+        self.bootedAt = None
+        self.threads = []
+
+        # persisted state, survives a reset
+        # behaviours: dict (index -> BehaviourBase)
+        self.behaviours = dict()
+        self.allowDimming = False
+        self.storedRelay = False
+        self.storedDimmer = 0
+        self.filterStore = SimulatedFilterStore()
+
+        self.uploadFailureRate = uploadFailureRate
+        self.random = random.Random(0)
+
+        self.switchAggregator = SimulatedObject(0x20003a10, "void SwitchAggregator::pushState()")
+        self.behaviourHandler = SimulatedObject(0x20003b40, "bool BehaviourHandler::update()")
+        self.twilightHandler = SimulatedObject(0x20003b80, "bool TwilightHandler::update()")
+        self.safeSwitch = SimulatedObject(0x20003c00, "void SafeSwitch::setState(switch_state_t)")
+        self.relay = SimulatedObject(0x20003c40, "void Relay::set(bool)")
+        self.dimmer = SimulatedObject(0x20003c60, "void Dimmer::set(uint8_t, bool)")
+
+        self.resetVolatileState()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # lifetime
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def start(self):
+        """
+        Opens the pseudo-terminal, boots the simulated device and starts the reader and clock threads.
+        self.port contains the path that CrownstoneUart should connect to.
+        """
+        self.masterFd, self.slaveFd = os.openpty()
+        tty.setraw(self.slaveFd)
+        self.port = os.ttyname(self.slaveFd)
+        self.running = True
+
+        self.boot()
+
+        self.threads = [
+            threading.Thread(target=self.readLoop, daemon=True),
+            threading.Thread(target=self.clockLoop, daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        os.close(self.masterFd)
+        os.close(self.slaveFd)
+
+    def resetVolatileState(self):
+        """
+        Puts everything that doesn't survive a reboot in its power on state.
+        """
+        # simulated posix time, None until the time is set.
+        self.timeBase = None
+        self.timeBaseSetAt = None
+
+        self.switchAggregatorModel = SwitchAggregatorModel(
+            BehaviourStoreModel(self.behaviours, self.sunrise, self.sunset), allowDimming=self.allowDimming)
+
+        self.relayOn = False
+        self.dimmerIntensity = 0
+
+    def boot(self):
+        """
+        Simulates the firmware starting up: sends BOOTED, loads the stored switch state into the override
+        and reports the initial values of all objects.
+        """
+        with self.lock:
+            self.resetVolatileState()
+            for obj in self.allObjects():
+                obj.reported.clear()
+
+            self.writeMessage(UartRxType.BOOTED, [])
+            self.switchAggregatorModel.overrideState = 100 if self.storedRelay else self.storedDimmer
+            self.booted = True
+            self.bootedAt = time.monotonic()
+            self.update()
+
+    def reboot(self):
+        with self.lock:
+            self.booted = False
+        time.sleep(self.bootDelay)
+        if self.running:
+            self.boot()
+
+    def allObjects(self):
+        return [self.switchAggregator, self.behaviourHandler, self.twilightHandler,
+                self.safeSwitch, self.relay, self.dimmer]
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # uart
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def readLoop(self):
+        decoder = UartFrameDecoder()
+        while self.running:
+            readable, _, _ = select.select([self.masterFd], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                data = os.read(self.masterFd, 1024)
+            except OSError:
+                # no side is connected to the slave end.
+                time.sleep(0.1)
+                continue
+            for messageType, payload in decoder.feed(data):
+                if messageType == UartMessageType.UART_MESSAGE and len(payload) >= 2:
+                    self.handleMessage(Conversion.uint8_array_to_uint16(payload[0:2]), payload[2:])
+
+    def writeMessage(self, opcode, payload):
+        """
+        Sends a uart message to the test suite.
+        """
+        packet = UartWrapperPacket(UartMessageType.UART_MESSAGE,
+                                   Conversion.uint16_to_uint8_array(opcode) + list(payload)).serialize()
+        with self.writeLock:
+            os.write(self.masterFd, bytes(packet))
+
+    def writeResult(self, commandtype, resultcode, payload=None):
+        payload = [] if payload is None else payload
+        resultpacket = [0]
+        resultpacket += Conversion.uint16_to_uint8_array(commandtype)
+        resultpacket += Conversion.uint16_to_uint8_array(resultcode)
+        resultpacket += Conversion.uint16_to_uint8_array(len(payload))
+        resultpacket += payload
+        self.writeMessage(UartRxType.RESULT_PACKET, resultpacket)
+
+    def report(self, obj, valuename, value):
+        """
+        Sends a FIRMWARESTATE message for obj.valuename if it changed since the last report.
+        """
+        formatted = SimulatedObject.format(value)
+        if obj.reported.get(valuename) == formatted:
+            return
+        obj.reported[valuename] = formatted
+        line = "{0:x}@{1}@{2}@{3}".format(obj.ptr, obj.prettyfunction, valuename, formatted)
+        self.writeMessage(UartRxType.FIRMWARESTATE, line.encode("ascii"))
+
+    def handleMessage(self, opcode, data):
+        with self.lock:
+            if not self.booted:
+                return
+            if opcode == UartTxType.CONTROL:
+                self.handleControl(data)
+            elif opcode == UartTxType.MOCK_INTERNAL_EVT and len(data) >= 2:
+                self.handleEvent(Conversion.uint8_array_to_uint16(data[0:2]), data[2:])
+            elif opcode == UartTxType.HELLO:
+                # sphere id, status flags
+                self.writeMessage(UartRxType.HELLO, [0, 0])
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # commands and events
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def handleControl(self, data):
+        """
+        data: [protocol, commandtype (uint16), length (uint16), payload]
+        """
+        if len(data) < 5:
+            return
+        commandtype = Conversion.uint8_array_to_uint16(data[1:3])
+        payload = data[5:]
+
+        if commandtype == ControlType.SWITCH and len(payload) >= 1:
+            self.handleSwitchCommand(payload[0])
+            self.writeResult(commandtype, ResultValue.SUCCESS)
+        elif commandtype == ControlType.ALLOW_DIMMING and len(payload) >= 1:
+            self.allowDimming = payload[0] != 0
+            self.switchAggregatorModel.setAllowDimming(self.allowDimming)
+            self.update()
+            self.writeResult(commandtype, ResultValue.SUCCESS)
+        elif commandtype == ControlType.RESET:
+            self.writeResult(commandtype, ResultValue.SUCCESS)
+            threading.Thread(target=self.reboot, daemon=True).start()
+        elif commandtype == ControlType.SET_TIME and len(payload) >= 4:
+            self.setTime(Conversion.uint8_array_to_uint32(payload[0:4]))
+            self.writeResult(commandtype, ResultValue.SUCCESS)
+        elif commandtype == ControlType.REPLACE_BEHAVIOUR and len(payload) >= 1:
+            behaviour = BehaviourBase()
+            behaviour.fromData(payload[1:])
+            if not behaviour.valid:
+                self.writeResult(commandtype, ResultValue.INVALID_MESSAGE)
+                return
+            self.behaviours[payload[0]] = behaviour
+            self.reloadBehaviourStore()
+            self.writeResult(commandtype, ResultValue.SUCCESS, [payload[0]])
+        elif commandtype == ControlType.REMOVE_BEHAVIOUR and len(payload) >= 1:
+            self.behaviours.pop(payload[0], None)
+            self.reloadBehaviourStore()
+            self.writeResult(commandtype, ResultValue.SUCCESS, [payload[0]])
+        elif commandtype == ControlType.SET_STATE and len(payload) >= 10 \
+                and Conversion.uint8_array_to_uint16(payload[0:2]) == StateType.BEHAVIOUR_SETTINGS:
+            self.switchAggregatorModel.smartHome = bool(Conversion.uint8_array_to_uint32(payload[6:10]) & 0x01)
+            self.update()
+            self.writeResult(commandtype, ResultValue.SUCCESS)
+        elif commandtype == ControlType.ASSET_FILTER_UPLOAD:
+            if self.random.random() < self.uploadFailureRate:
+                self.writeResult(commandtype, ResultValue.BUSY)
+            else:
+                self.writeResult(commandtype, self.filterStore.upload(payload))
+        elif commandtype == ControlType.ASSET_FILTER_REMOVE:
+            self.writeResult(commandtype, self.filterStore.remove(payload))
+        elif commandtype == ControlType.ASSET_FILTER_COMMIT_CHANGES:
+            self.writeResult(commandtype, self.filterStore.commit(payload))
+        elif commandtype == ControlType.ASSET_FILTER_GET_SUMMARIES:
+            self.writeResult(commandtype, ResultValue.SUCCESS, self.filterStore.summaries())
+        else:
+            self.writeResult(commandtype, ResultValue.NOT_IMPLEMENTED)
+
+    def handleEvent(self, eventtype, data):
+        if eventtype == EventType.CMD_SWITCH_TOGGLE:
+            self.switchAggregatorModel.switchCraft()
+            self.update()
+        elif eventtype in [EventType.CMD_TEST_SET_TIME, EventType.CMD_SET_TIME] and len(data) >= 4:
+            self.setTime(Conversion.uint8_array_to_uint32(data[0:4]))
+        elif eventtype == EventType.CMD_CLEAR_ALL_BEHAVIOUR:
+            self.behaviours.clear()
+            self.reloadBehaviourStore()
+
+    def handleSwitchCommand(self, value):
+        self.switchAggregatorModel.switchCommand(value)
+        # the firmware stores, and logs, the switch state on every switch command, also when it doesn't change.
+        self.safeSwitch.reported.clear()
+        if value < SwitchCommandValue.CS_SWITCH_CMD_VAL_DEBUG_RESET_ALL \
+                or value > SwitchCommandValue.CS_SWITCH_CMD_VAL_DEBUG_RESET_AGG_OVERRIDE:
+            self.update()
+        else:
+            # debug resets clear the state, it is recomputed on the next tick.
+            self.pushState()
+
+    def reloadBehaviourStore(self):
+        self.switchAggregatorModel.store = BehaviourStoreModel(self.behaviours, self.sunrise, self.sunset)
+        self.update()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # clock and behaviours
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def setTime(self, posixtime):
+        if posixtime == 0:
+            # the firmware refuses to set the time to 0.
+            return
+        self.timeBase = posixtime
+        self.timeBaseSetAt = time.monotonic()
+        self.update(reportAll=True)
+
+    def getTime(self):
+        """
+        Returns the simulated posix time in seconds, or None if the time hasn't been set.
+        """
+        if self.timeBase is None:
+            return None
+        return int(self.timeBase + (time.monotonic() - self.timeBaseSetAt) * self.clockSpeed)
+
+    def clockLoop(self):
+        while self.running:
+            time.sleep(self.tickInterval)
+            with self.lock:
+                if self.booted:
+                    self.update()
+
+    def update(self, reportAll=False):
+        """
+        Evaluates the switch aggregator at the current simulated time and drives the relay and dimmer.
+        reportAll: report all values, not only those that changed. (The firmware logs its state
+        when the time is set.)
+        """
+        if not self.booted:
+            return
+        self.switchAggregatorModel.time = self.getTime()
+        self.switchAggregatorModel.update()
+        if reportAll:
+            for obj in self.allObjects():
+                obj.reported.clear()
+        self.pushState()
+
+    def pushState(self):
+        """
+        Drives the relay and dimmer with the aggregated state and reports all changed values.
+        Until the dimmer has powered up the relay is switched instead, as the firmware does.
+        """
+        model = self.switchAggregatorModel
+        if model.aggregatedState is not None:
+            if self.allowDimming and time.monotonic() - self.bootedAt >= self.dimmerPowerUpDelay:
+                self.relayOn = False
+                self.dimmerIntensity = model.aggregatedState
+            else:
+                self.relayOn = model.aggregatedState > 0
+                self.dimmerIntensity = 0
+            self.storedRelay = self.relayOn
+            self.storedDimmer = self.dimmerIntensity
+
+        self.report(self.behaviourHandler, "_isActive", model.smartHome)
+        self.report(self.behaviourHandler, "_currentIntendedState", model.behaviourState)
+        self.report(self.twilightHandler, "_isActive", model.smartHome)
+        self.report(self.twilightHandler, "_currentIntendedState", model.twilightState)
+
+        self.report(self.switchAggregator, "_overrideState", model.overrideState)
+        self.report(self.switchAggregator, "_behaviourState", model.behaviourState)
+        self.report(self.switchAggregator, "_twilightState", model.twilightState)
+        self.report(self.switchAggregator, "_aggregatedState", model.aggregatedState)
+
+        self.report(self.safeSwitch, "storedState.state.relay", self.storedRelay)
+        self.report(self.safeSwitch, "storedState.state.dimmer", self.storedDimmer)
+        self.report(self.relay, "on", self.relayOn)
+        self.report(self.dimmer, "intensity", self.dimmerIntensity)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulated Crownstone on a pseudo-terminal")
+    parser.add_argument("--clockspeed", type=float, default=1.0, help="simulated seconds per wall clock second")
+    args = parser.parse_args()
+
+    with CrownstoneSimulator(clockSpeed=args.clockspeed) as simulator:
+        print("simulated crownstone listening on {0}, press ctrl+c to quit".format(simulator.port))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
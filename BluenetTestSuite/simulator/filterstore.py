@@ -0,0 +1,110 @@
+"""
+Asset filter store of the CrownstoneSimulator: handles the ASSET_FILTER_* control commands.
+"""
+from crownstone_core.packets.assetFilter.FilterCommandPackets import ASSET_FILTER_PROTOCOL
+from crownstone_core.packets.assetFilter.util.AssetFilterMasterCrc import get_master_crc_from_filter_crcs
+from crownstone_core.protocol.BluenetTypes import ResultValue
+from crownstone_core.util.CRC import crc32
+from crownstone_core.util.Conversion import Conversion
+
+
+class SimulatedFilter:
+    def __init__(self, totalSize):
+        self.data = bytearray(totalSize)
+        self.received = bytearray(totalSize)
+
+    def complete(self):
+        return all(self.received)
+
+    def crc(self):
+        return crc32(list(self.data))
+
+
+class SimulatedFilterStore:
+    """
+    Filters are uploaded in chunks, can only be (re)uploaded after they have been removed and are committed
+    together with the master crc over all filters, as in the firmware.
+
+    capacity: total number of bytes available for filters.
+    """
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        # filters: dict (filterId -> SimulatedFilter)
+        self.filters = dict()
+        # ids of filters that were committed and can't be uploaded to.
+        self.committed = set()
+        self.masterVersion = 0
+        self.masterCrc = 0
+
+    def freeSpace(self):
+        return self.capacity - sum(len(f.data) for f in self.filters.values())
+
+    def upload(self, payload):
+        """
+        payload: [protocol, filterId, chunkStartIndex (uint16), totalSize (uint16), chunkSize (uint16), chunk]
+        """
+        if len(payload) < 8:
+            return ResultValue.WRONG_PAYLOAD_LENGTH
+        if payload[0] != ASSET_FILTER_PROTOCOL:
+            return ResultValue.ERR_PROTOCOL_UNSUPPORTED
+        filterId = payload[1]
+        start = Conversion.uint8_array_to_uint16(payload[2:4])
+        totalSize = Conversion.uint8_array_to_uint16(payload[4:6])
+        chunkSize = Conversion.uint8_array_to_uint16(payload[6:8])
+        chunk = payload[8:]
+        if len(chunk) != chunkSize or start + chunkSize > totalSize:
+            return ResultValue.WRONG_PARAMETER
+        if filterId in self.committed:
+            return ResultValue.ERR_WRONG_STATE
+
+        uploading = self.filters.get(filterId)
+        if uploading is None:
+            if totalSize > self.freeSpace():
+                return ResultValue.NO_SPACE
+            uploading = self.filters[filterId] = SimulatedFilter(totalSize)
+        elif len(uploading.data) != totalSize:
+            return ResultValue.WRONG_PARAMETER
+
+        uploading.data[start:start + chunkSize] = bytes(chunk)
+        uploading.received[start:start + chunkSize] = b"\x01" * chunkSize
+        return ResultValue.SUCCESS
+
+    def remove(self, payload):
+        """
+        payload: [protocol, filterId]
+        """
+        if len(payload) < 2:
+            return ResultValue.WRONG_PAYLOAD_LENGTH
+        self.committed.discard(payload[1])
+        if self.filters.pop(payload[1], None) is None:
+            return ResultValue.SUCCESS_NO_CHANGE
+        return ResultValue.SUCCESS
+
+    def commit(self, payload):
+        """
+        payload: [protocol, masterVersion (uint16), masterCrc (uint32)]
+        """
+        if len(payload) < 7:
+            return ResultValue.WRONG_PAYLOAD_LENGTH
+        if not all(f.complete() for f in self.filters.values()):
+            return ResultValue.ERR_WRONG_STATE
+        masterCrc = Conversion.uint8_array_to_uint32(payload[3:7])
+        if masterCrc != get_master_crc_from_filter_crcs([[i, f.crc()] for i, f in self.filters.items()]):
+            return ResultValue.MISMATCH
+        self.masterVersion = Conversion.uint8_array_to_uint16(payload[1:3])
+        self.masterCrc = masterCrc
+        self.committed = set(self.filters)
+        return ResultValue.SUCCESS
+
+    def summaries(self):
+        """
+        Returns the payload of the ASSET_FILTER_GET_SUMMARIES result, see FilterSummariesPacket.
+        """
+        summaries = [ASSET_FILTER_PROTOCOL]
+        summaries += Conversion.uint16_to_uint8_array(self.masterVersion)
+        summaries += Conversion.uint32_to_uint8_array(self.masterCrc)
+        summaries += Conversion.uint16_to_uint8_array(self.freeSpace())
+        for filterId in sorted(self.filters):
+            summaries += [filterId]
+            summaries += Conversion.uint32_to_uint8_array(self.filters[filterId].crc())
+        return summaries
@@ -20,24 +20,31 @@ class TestFramework:
 
     """
     # construction
-    def __init__(self, testfunction):
+    def __init__(self, testfunction, port='/dev/ttyACM0',
+                 logStringsFile="/home/arend/Documents/crownstone/crownstone-bluenet/bluenet/build/dev3306/extracted_logs.json"):
         """
         parameter [testfunction] implements the actual test.
         It must accept a single parameter of type FirmwareState and return a
         human readable string that represents the result.
+
+        parameter [port] is the uart port of the test subject, e.g. the port of a CrownstoneSimulator.
+        parameter [logStringsFile] is the extracted_logs.json of the firmware build, or None when
+        binary logs don't need to be decoded.
         """
         self.test_impl = testfunction
+        self.port = port
 
         # Create the uart connection
         self.bluenetLogs = BluenetLogs()
         # self.bluenetLogs.setSourceFilesDir("/home/arend/Documents/crownstone-bluenet/bluenet/source")
-        self.bluenetLogs.setLogStringsFile("/home/arend/Documents/crownstone/crownstone-bluenet/bluenet/build/dev3306/extracted_logs.json")
+        if logStringsFile is not None:
+            self.bluenetLogs.setLogStringsFile(logStringsFile)
         self.uart = CrownstoneUart()
         self.firmwarestate = FirmwareState()
 
     # __enter__ is part of the 'with' interface. It is used to setup the testframework
     def __enter__(self):
-        self.uart.initialize_usb_sync(port='/dev/ttyACM0')
+        self.uart.initialize_usb_sync(port=self.port)
         return self
 
     # __exit__ is part of the 'with' interface. It will be used to tear down the test environment.
@@ -68,6 +75,13 @@ class TestFramework:
         print (failstr)
         return failstr
 
+    @classmethod
+    def isSuccess(cls, result):
+        """
+        Returns True if result is a string returned by TestFramework.success.
+        """
+        return isinstance(result, str) and "Result: Success" in result
+
     def test_run(self):
         """
         Runs the testfunction which this instance was constructed with and returns its result.
@@ -0,0 +1,129 @@
+"""
+Runs test entry points on several devices at the same time: one worker process per uart port, each with its own
+TestSession. Entry points are handed out longest-first, based on the durations recorded in earlier runs, so that
+the total wall time is close to the minimum.
+"""
+import glob
+import json
+import multiprocessing
+import os
+import queue
+
+from BluenetTestSuite.testframework.session import TestSession, TestRecord, loadEntryPoint, printReport, \
+    TESTS_PACKAGE
+
+# the usb serial ports of attached crownstones.
+DEVICE_PATTERN = "/dev/ttyACM*"
+
+# durations recorded on this machine, kept out of the working directory.
+DEFAULT_DURATIONS_FILE = os.path.join(os.path.expanduser("~"), ".cache", "bluenet-test-suite", "testdurations.json")
+
+
+def discoverPorts(pattern=DEVICE_PATTERN):
+    return sorted(glob.glob(pattern))
+
+
+class TestDurations:
+    """
+    Recorded durations of entry points in seconds, stored as json: dict (entry point name -> duration).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.durations = dict()
+        if path is not None and os.path.exists(path):
+            with open(path) as file:
+                self.durations = json.load(file)
+
+    def expected(self, name):
+        """
+        Returns the recorded duration of name. Entry points that have never run are expected to take
+        as long as the longest known one, so that they are started early.
+        """
+        if name in self.durations:
+            return self.durations[name]
+        return max(self.durations.values(), default=0.0)
+
+    def update(self, records):
+        for record in records:
+            self.durations[record.name] = record.duration
+
+    def save(self):
+        if self.path is not None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "w") as file:
+                json.dump(self.durations, file, indent=4, sort_keys=True)
+
+
+def longestFirst(names, durations):
+    return sorted(names, key=lambda name: durations.expected(name), reverse=True)
+
+
+def worker(port, logStringsFile, tasks, results, package=TESTS_PACKAGE):
+    """
+    Worker process: runs entry points of package from the tasks queue on port until it gets None and puts a
+    (name, results, duration, port) tuple for each of them on the results queue.
+    """
+    with TestSession(port=port, logStringsFile=logStringsFile) as session:
+        while True:
+            name = tasks.get()
+            if name is None:
+                break
+            record = session.run(loadEntryPoint(name, package))
+            results.put((record.name, [str(result) for result in record.results], record.duration, record.port))
+
+
+def runParallel(names, ports, logStringsFile=None, durations=None, package=TESTS_PACKAGE):
+    """
+    Runs the entry points of package with the given names on the given ports, one worker process per port.
+    The queue is ordered longest-first, workers take the next entry point as soon as they are done.
+
+    Returns a list of TestRecord, in the order they finished.
+    """
+    durations = TestDurations(None) if durations is None else durations
+
+    # spawn: the workers shouldn't inherit uart threads or event bus subscriptions.
+    context = multiprocessing.get_context("spawn")
+    tasks = context.Queue()
+    results = context.Queue()
+    for name in longestFirst(names, durations):
+        tasks.put(name)
+    for port in ports:
+        tasks.put(None)
+
+    processes = [context.Process(target=worker, args=(port, logStringsFile, tasks, results, package), daemon=True)
+                 for port in ports]
+    for process in processes:
+        process.start()
+
+    records = []
+    while len(records) < len(names):
+        try:
+            name, testresults, duration, port = results.get(timeout=1.0)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+            continue
+        records.append(TestRecord(name, testresults, duration, port))
+
+    for process in processes:
+        process.join()
+
+    finished = set(record.name for record in records)
+    for name in names:
+        if name not in finished:
+            records.append(TestRecord(name, ["worker stopped before {0} finished".format(name)], 0.0))
+    return records
+
+
+def runScheduled(names, ports, logStringsFile=None, durationsFile=None):
+    """
+    Runs the entry points on the given ports, prints a merged report and records the durations.
+    Returns the number of failed results.
+    """
+    durations = TestDurations(durationsFile)
+    records = runParallel(names, ports, logStringsFile, durations)
+    durations.update(record for record in records if record.port is not None)
+    durations.save()
+    return printReport(sorted(records, key=lambda record: record.name))
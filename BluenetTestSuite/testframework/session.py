@@ -0,0 +1,159 @@
+"""
+Runs the entry points of several test modules over a single uart connection.
+"""
+import glob
+import importlib
+import inspect
+import os
+import time
+import traceback
+
+from BluenetTestSuite.testframework.framework import *
+
+TESTS_PACKAGE = "BluenetTestSuite.tests"
+TESTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests")
+
+
+class TestEntryPoint:
+    """
+    A function in a test module that accepts a FirmwareState and returns a result string or a list of them.
+    """
+    def __init__(self, modulename, function):
+        self.modulename = modulename
+        self.function = function
+
+    @property
+    def name(self):
+        return "{0}.{1}".format(self.modulename, self.function.__name__)
+
+    def __repr__(self):
+        return self.name
+
+
+def isEntryPoint(name, function):
+    """
+    Entry points are the functions that the test modules pass to TestFramework in their __main__:
+    run_all_scenarios and test_* functions that take FW as their only parameter.
+    """
+    if not inspect.isfunction(function):
+        return False
+    if name != "run_all_scenarios" and not name.startswith("test_"):
+        return False
+    return len(inspect.signature(function).parameters) == 1
+
+
+def discoverEntryPoints(testsdir=TESTS_DIR, package=TESTS_PACKAGE):
+    """
+    Imports all test_*.py modules in testsdir and returns a list of TestEntryPoint, sorted by name.
+    A module with a run_all_scenarios function only contributes that function.
+    """
+    entrypoints = []
+    for path in sorted(glob.glob(os.path.join(testsdir, "test_*.py"))):
+        modulename = os.path.splitext(os.path.basename(path))[0]
+        module = importlib.import_module("{0}.{1}".format(package, modulename))
+        functions = [function for name, function in inspect.getmembers(module)
+                     if isEntryPoint(name, function) and function.__module__ == module.__name__]
+        runall = [function for function in functions if function.__name__ == "run_all_scenarios"]
+        for function in runall or functions:
+            entrypoints.append(TestEntryPoint(modulename, function))
+    return entrypoints
+
+
+def loadEntryPoint(name, package=TESTS_PACKAGE):
+    """
+    Returns the TestEntryPoint with the given name, as in TestEntryPoint.name.
+    """
+    modulename, functionname = name.rsplit(".", 1)
+    module = importlib.import_module("{0}.{1}".format(package, modulename))
+    return TestEntryPoint(modulename, getattr(module, functionname))
+
+
+class TestRecord:
+    """
+    The outcome of running one entry point in a TestSession.
+    """
+    def __init__(self, name, results, duration, port=None):
+        self.name = name
+        self.results = results
+        self.duration = duration
+        self.port = port
+
+    @property
+    def failures(self):
+        return [result for result in self.results if not TestFramework.isSuccess(result)]
+
+
+def printReport(records):
+    """
+    Prints one line per TestRecord and a total. Returns the number of failed results.
+    """
+    print("========================================================================")
+    failurecount = 0
+    resultcount = 0
+    for record in records:
+        failures = record.failures
+        failurecount += len(failures)
+        resultcount += len(record.results)
+        color = Fore.RED if failures else Fore.GREEN
+        print("{0}{1:<70}{2} {3:>3}/{4:<3} passed {5:>8.1f}s {6}".format(
+            color, record.name, Style.RESET_ALL,
+            len(record.results) - len(failures), len(record.results), record.duration, record.port or ""))
+        for failure in failures:
+            print("    " + str(failure))
+    print("------------------------------------------------------------------------")
+    print("{0}/{1} results passed in {2:.1f}s".format(
+        resultcount - failurecount, resultcount, sum(record.duration for record in records)))
+    print("========================================================================")
+    return failurecount
+
+
+class TestSession:
+    """
+    Opens the uart connection and loads the log strings once, then runs any number of entry points
+    with the same FirmwareState. The state is cleared before each entry point. Use in a with-statement:
+
+        with TestSession(port) as session:
+            for entrypoint in discoverEntryPoints():
+                session.run(entrypoint)
+            session.printReport()
+    """
+    def __init__(self, port='/dev/ttyACM0', logStringsFile=None):
+        self.framework = TestFramework(None, port=port, logStringsFile=logStringsFile)
+        self.firmwarestate = self.framework.firmwarestate
+        self.records = []
+
+    def __enter__(self):
+        self.framework.__enter__()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.framework.__exit__(type, value, traceback)
+
+    def run(self, entrypoint):
+        """
+        Runs entrypoint and returns its TestRecord. An exception raised by the test is reported as
+        a failure so that the session continues with the next entry point.
+        """
+        print("{0}##### {1} #####{2}".format(Style.BRIGHT, entrypoint.name, Style.RESET_ALL))
+        self.firmwarestate.clear()
+        self.framework.test_impl = entrypoint.function
+
+        t1 = time.time()
+        try:
+            results = self.framework.test_run()
+        except Exception:
+            traceback.print_exc()
+            results = TestFramework.failure("{0} raised an exception".format(entrypoint.name))
+        t2 = time.time()
+
+        if not isinstance(results, list):
+            results = [results]
+        record = TestRecord(entrypoint.name, results, t2 - t1, self.framework.port)
+        self.records.append(record)
+        return record
+
+    def printReport(self):
+        """
+        Prints one line per entry point and a total. Returns the number of failed results.
+        """
+        return printReport(self.records)
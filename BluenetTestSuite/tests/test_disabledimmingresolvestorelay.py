@@ -3,6 +3,8 @@ import uuid
 
 from BluenetTestSuite.testframework.framework import *
 from BluenetTestSuite.firmwarecontrol.datatransport import *
+from BluenetTestSuite.firmwarecontrol.utils import fullReset
+from BluenetTestSuite.firmwarecontrol.bootdetector import DIMMER_POWER_UP_DELAY
 from crownstone_core.protocol.BluenetTypes import ControlType
 
 import datetime
@@ -30,17 +32,16 @@ def test_disabledimmingresolvestorelay_loopbody(FW, intensity):
     # print("reset firmwarestate recorder")
     FW.clear()
 
-    # print("restart test subject and wait for dimmer to have started")
-    sendCommandToCrownstone(ControlType.RESET, [])
-    for t in reversed(range(7)):
-        time.sleep(10)
-        # print("sleeping for {0} more seconds".format(t*10))
+    # print("restart test subject")
+    fullReset()
 
     # print("set dimming allowed true and put a value in there.")
     sendCommandToCrownstone(ControlType.ALLOW_DIMMING, [1])
-    time.sleep(0.5)
     sendCommandToCrownstone(ControlType.SWITCH, [intensity])
-    time.sleep(0.5)
+
+    # print("wait for the dimmer to have started and the switch to settle")
+    FW.waitFor("Dimmer", 'intensity', intensity, timeout=DIMMER_POWER_UP_DELAY)
+    FW.waitFor("SwitchAggregator", '_overrideState', intensity, timeout=5)
 
     # print("check override state")
     failures = FW.assertFindFailures("SwitchAggregator", '_overrideState', intensity)
@@ -69,7 +70,11 @@ def test_disabledimmingresolvestorelay_loopbody(FW, intensity):
 
     # print("set dimming allowed false")
     sendCommandToCrownstone(ControlType.ALLOW_DIMMING, [0])
-    time.sleep(0.5)
+
+    # print("wait for the switch to settle")
+    FW.waitFor("SwitchAggregator", '_overrideState', 0 if intensity == 0 else 100, timeout=5)
+    FW.waitFor("Dimmer", 'intensity', 0, timeout=5)
+    FW.waitFor("Relay", 'on', intensity > 0, timeout=5)
 
     # print("check override hasn't changed")
     failures = FW.assertFindFailures("SwitchAggregator", '_overrideState', 0 if intensity == 0 else 100)
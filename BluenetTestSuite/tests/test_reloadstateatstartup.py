@@ -17,19 +17,28 @@ import time
 from BluenetTestSuite.testframework.framework import *
 from BluenetTestSuite.firmwarecontrol.datatransport import *
 from BluenetTestSuite.firmwarecontrol.behaviourstore import *
-from BluenetTestSuite.testframework.events import expect
+from BluenetTestSuite.firmwarecontrol.bootdetector import DIMMER_POWER_UP_DELAY
 
 
 
 def test_bootloadsflashintooverride_loopbody(FW, intensity):
     print("##### setup test_bootloadsflashintooverride_loopbody (intensity: {0}) #####".format(intensity))
-    sendCommandToCrownstone(ControlType.RESET, [])
-    time.sleep(70)  # wait for dimmer to power up...
+    fullReset()
+
+    # forget the state from before the switch, so that waitFor doesn't match a stale relay value.
+    FW.clear()
 
     # override switch state
     print("sending switch command to crownstone {0}".format(intensity))
     sendCommandToCrownstone(ControlType.SWITCH, [intensity])
     print("sending switch command to crownstone done")
+    # Relay.on. As dimming is turned on, this should only be true when the 8-th bit of the state is set explicitly.
+    expected_relay_state = bool((intensity >> 7) & 1)
+    # until the dimmer has powered up the firmware switches the relay instead of dimming.
+    if not FW.waitFor("SafeSwitch", 'storedState.state.relay', expected_relay_state, timeout=DIMMER_POWER_UP_DELAY):
+        FW.print()
+        return TestFramework.failure("relaystate should've been {0} after switch command".format(
+            expected_relay_state))
     # need time for persistence of switch state to be pushed.
     time.sleep(15)
 
@@ -37,29 +46,19 @@ def test_bootloadsflashintooverride_loopbody(FW, intensity):
     FW.clear()
     # print("restart test subject")
     sendCommandToCrownstone(ControlType.RESET, [])
-    # print("allow device to reset and startup")
-    time.sleep(3)
-
     # Test SwitchAggregator._overrideState
     expected_override_state = min(max(0, intensity), 100)
 
-    response = expect(FW, "SwitchAggregator", '_overrideState', expected_override_state,
-                      "_overrideState should've been {0} after reset".format(
-                          expected_override_state))
-
-    if response is not None:
-        return response
-
-    # Test Relay.on. As dimming is turned on, this should only be true when the 8-th bit of the state is set explicitly.
-    expected_relay_state = bool((intensity >> 7) & 1)
-
-    response = expect(FW,"SafeSwitch", 'storedState.state.relay', expected_relay_state,
-                      "relaystate should've been {0} after reset".format(
-                            expected_relay_state))
+    # print("allow device to reset and startup")
+    if not FW.waitFor("SwitchAggregator", '_overrideState', expected_override_state, timeout=10):
+        FW.print()
+        return TestFramework.failure("_overrideState should've been {0} after reset".format(
+            expected_override_state))
 
-    if response is not None:
+    if not FW.waitFor("SafeSwitch", 'storedState.state.relay', expected_relay_state, timeout=5):
         FW.print()
-        return response
+        return TestFramework.failure("relaystate should've been {0} after reset".format(
+            expected_relay_state))
 
     return TestFramework.success()
 
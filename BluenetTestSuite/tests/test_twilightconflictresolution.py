@@ -118,7 +118,10 @@ def test_twilightconflictresolution_loopbody(FW, testcase):
     return TestFramework.success()
 
 
-def test_twilightconflictresolution(FW):
+def build_testcases():
+    """
+    Returns the test_cases, also checked against the reference model in selftests/test_switchaggregatormodel.py.
+    """
     cases = []
     # span of testcases: 0--3 for partially and fully overlapping, 0--2 same start time, 0--2 same start/end.
     for hr_offset in [0, 12, 21, 22, 23]:
@@ -139,6 +142,11 @@ def test_twilightconflictresolution(FW):
                            [50, 50, 100]),  # same starttime and endtime
         # last case ex_time[2] will
         # falls at 02:00+offset.
+    return cases
+
+
+def test_twilightconflictresolution(FW):
+    cases = build_testcases()
 
     fullReset()
     setAllowDimming(True)
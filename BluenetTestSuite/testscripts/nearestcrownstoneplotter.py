@@ -18,6 +18,9 @@ At each incoming event, the status can be validated:
   according to the Asset Rssi Data events?
   (Possibly allowing accomodation time and rssi margin)
 - If a Nearest Crownstone TimeOut is received, how long ago was the last Asset Rssi Data event?
+The Nearest Crownstone Updates are validated online by the NearestCrownstoneValidator in utils/nearestvalidator.py,
+which prints its mismatches as they occur and a status line every reportInterval seconds. The TimeOuts aren't:
+crownstone_uart has no packet type for them.
 
 
 All of this can be displayed in a rolling graph by simply plotting per asset the time series of each crownstones
@@ -26,154 +29,65 @@ rssi values received through the Asset Rssi Data events and annotating the winne
 - timed out: dotted/dashed
 - other: normal line
 
+Run it headless, record a session or replay one with the options of utils/assetplotter.py, e.g.:
+
+    python -m BluenetTestSuite.testscripts.nearestcrownstoneplotter --replay session.cap --speed 10
+
 """
 from functools import singledispatch
 import datetime
-from queue import Queue
-from sys import stdout
-from threading import Thread
-
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import matplotlib.animation as animation
-import matplotlib
-matplotlib.use('TkAgg')
 
-from crownstone_uart import UartEventBus
-from crownstone_uart.topics.SystemTopics import SystemTopics
+import numpy as np
 
 from crownstone_uart.core.uart.UartTypes import UartRxType
-from crownstone_uart.core.uart.uartPackets.UartMessagePacket import UartMessagePacket
 
 from crownstone_uart.core.uart.uartPackets.AssetIdReport import AssetIdReport
 from crownstone_uart.core.uart.uartPackets.AssetMacReport import AssetMacReport
 
 from BluenetTestSuite.utils.setup import *
 from BluenetTestSuite.utils.rssistream import *
+from BluenetTestSuite.utils.nearestvalidator import NearestCrownstoneValidator
+from BluenetTestSuite.utils.assetplotter import AssetPlotter, AssetPlotterMain, FilterManager, \
+    addArguments, mainArguments
 
 from BluenetTestSuite.utils.filterexamples import *
-from BluenetTestSuite.utils.filtercommands import *
-
-
+from BluenetTestSuite.utils.filtercache import FilterCache
 
-class PlotterQueueObject:
-    """
-    Used in the plotter queue
-    """
-    def __init__(self, msg):
-        self.msg = msg
-        self.timestamp = datetime.datetime.now()
 
-class NearestCrownstoneAlgorithmPlotter:
+class NearestCrownstoneAlgorithmPlotter(AssetPlotter):
     """
-    This class is responsible for decoupling the Uart thread from the plotting thread by means of a queue.
-    Further it passively keeps track of the plotting information. How to visualize the data is left to the user
-    of the class.
+    Plots per asset the rssi of each crownstone that hears it and the nearest crownstone updates.
     """
+    title = "Nearest Crownstone Algorithm Plot"
 
-    def __init__(self, plottingtimewindow_seconds, refreshRateMs):
-        self.nearestCrownstoneRssiStreams = [] # a list of RssiStream objects based on handleNearestCrowntoneUpdate messages.
+    def __init__(self, plottingtimewindow_seconds, refreshRateMs, rows=1, cols=1, order="id"):
+        super(NearestCrownstoneAlgorithmPlotter, self).__init__(plottingtimewindow_seconds, refreshRateMs,
+                                                                rows, cols, order)
+        self.nearestCrownstoneRssiStreams = {} # sender -> NearestStream, based on handleNearestCrowntoneUpdate messages.
         # self.assetRssiStreamsMax = [] # a list of NearestStream objects that administrates the current maximum per asset based on AssetMacReport messages.
-        self.assetRssiStreams = []             # a list of NearestStream objects based on incoming AssetMacReport messages.
-        self.plottingQueue = Queue()
-        self.loggingQueue = Queue()
-
-        self.plotwindow_width = datetime.timedelta(seconds=plottingtimewindow_seconds)
-        self.refreshRateMs = refreshRateMs
-
-    def putMessageOnQueue(self, msg):
-        self.plottingQueue.put(PlotterQueueObject(msg))
-
-    def updatePlotData(self, i, fig, axs_flat):
-        """
-        Processes queue for plotting.
-        Remove old messages.
-        Plot.
-        """
-        try:
-            self.processPlottingQueue()
-            self.removeOldEntriesFromStreams()
-            self.plot(i, fig, axs_flat)
-        except Exception as e:
-            print(e)
-            raise e
-
-
-    def plot(self, i, fig, axs_flat):
-        # title and format
-        fig.suptitle(self.getTitle(), fontsize=12)
-
-        myFmt = mdates.DateFormatter('%H:%M:%S')
-
-        past, now = self.getTimeWindow()
-
-        for ax in axs_flat:
-            # each ax is a subplot that presents one asset.
-            # TODO: filter streams per asset.
-
-            ax.clear()
-            ax.set_title(F"AssetId # todo ")
-
-            # x axis
-            ax.set_xlabel("time (H:M:S)")
-            ax.xaxis.set_major_formatter(myFmt)  # formats the x-axis ticks
-            ax.format_xdata = myFmt  # formats the on-hover message box
-            ax.xaxis.set_major_locator(plt.MaxNLocator(8))  # reduce number of ticks on x-axis
-            ax.set_xlim(past, now)
+        self.assetRssiStreams = {}             # (sender, receiver) -> RssiStream, based on incoming AssetMacReport messages.
+        self.nearestCrownstones = {}  # assetId -> last reported nearest crownstone
 
-            # y axis
-            ax.set_ylabel("rssi(dB)")
-            ax.set_ylim(-80, -10)
+    def handleMessage(self, msg, timestamp):
+        handlePlottingQueueObject(msg, timestamp, self)
 
+    def plotStream(self, liveplot, key, stream):
+        if key[0] == "nearest":
+            # plot markers for nearest
+            times, rssis, receivers = liveplot.setStream(key, stream,
+                    marker='o', markersize=8,
+                    label=f"nearest", color='red', fillstyle='none', linestyle='none')
 
             ### plot vertical lines for nearest
-            for stream in self.nearestCrownstoneRssiStreams:
-                for i in range(len(stream.times)):
-                    if i == 0 or stream.receivers[i] != stream.receivers[i-1]:
-                        ax.vlines(stream.times[i], -80, -10, color='gray', linestyles='--')
-                        ax.text(stream.times[i], -80, f"#{stream.receivers[i]}", size=10, color='gray') # (stream.times[i]-past)/(now-past)
+            transitions = np.flatnonzero(np.r_[True, receivers[1:] != receivers[:-1]]) if len(receivers) else []
+            liveplot.setTransitions(key, times[transitions], receivers[transitions])
+        else:
+            liveplot.setStream(key, stream,
+                    marker='o', markersize=2, label=f"cs #{stream.receiver}",linestyle='-')
 
-                # plot markers for nearest
-                ax.plot(stream.times, stream.rssis,
-                        marker='o', markersize=8,
-                        label=f"nearest", color='red', fillstyle='none', linestyle='none')
-
-            for stream in self.assetRssiStreams:
-                ax.plot(stream.times, stream.rssis, marker='o', markersize=2, label=f"cs #{stream.receiver}",linestyle='-')
-
-            # ### plot maximum:
-            # for stream in self.assetRssiStreamsMax:
-            #     ax.plot(stream.times, stream.rssis, marker='o', markersize=2, label=f"max rssi",linestyle='-', color='black')
-
-            ax.legend()
-
-
-
-    def processPlottingQueue(self):
-        """
-        Updates the rssi stream according to the new events.
-        Should be called before each frame update.
-
-        Terminates when the plotting queue is empty
-        """
-        while not self.plottingQueue.empty():
-            plottingQueueObject = self.plottingQueue.get()
-            handlePlottingQueueObject(plottingQueueObject.msg, plottingQueueObject.timestamp, self)
-
-    def getTimeWindow(self):
-        now = datetime.datetime.now()
-        return now - self.plotwindow_width, now
-
-    def removeOldEntriesFromStreams(self):
-        past, now = self.getTimeWindow()
-
-        for stream in self.nearestCrownstoneRssiStreams:
-            stream.removeOldEntries(past)
-        for stream in self.assetRssiStreams:
-            stream.removeOldEntries(past)
-
-    def getTitle(self):
-        return "Nearest Crownstone Algorithm Plot"
+        # ### plot maximum:
+        # for stream in self.assetRssiStreamsMax:
+        #     ax.plot(stream.times, stream.rssis, marker='o', markersize=2, label=f"max rssi",linestyle='-', color='black')
 
 
 @singledispatch
@@ -189,13 +103,18 @@ def handleNearestCrowntoneUpdate(msg : AssetIdReport, timestamp: datetime.dateti
         channel = msg.channel
 
         # find the nearest stream for this sender (asset)
-        stream = next(filter(lambda s: s.sender == sender, plotter.nearestCrownstoneRssiStreams), None)
+        stream = plotter.nearestCrownstoneRssiStreams.get(sender)
 
         if stream is None:
             stream = NearestStream(sender)
-            plotter.nearestCrownstoneRssiStreams.append(stream)
+            plotter.nearestCrownstoneRssiStreams[sender] = stream
+            plotter.pages.addStream(sender, ("nearest", sender), stream)
 
         stream.addNewEntry(timestamp, rssi, receiver)
+        plotter.pages.touch(sender, timestamp)
+        if plotter.nearestCrownstones.get(sender, receiver) != receiver:
+            plotter.pages.switched(sender, timestamp)
+        plotter.nearestCrownstones[sender] = receiver
     except Exception as e:
         print(e)
         raise e
@@ -210,14 +129,16 @@ def handleAssetMacRssiReport(msg : AssetMacReport, timestamp: datetime.datetime,
 
         ### update the asset rssi stream for this (asset,crownstone) pair
         # find the nearest stream for this sender->receiver
-        stream = next(filter(lambda s: s.sender == sender and s.receiver == receiver, plotter.assetRssiStreams), None)
+        stream = plotter.assetRssiStreams.get((sender, receiver))
 
         # create one if necessary
         if stream is None:
             stream = RssiStream(sender, receiver)
-            plotter.assetRssiStreams.append(stream)
+            plotter.assetRssiStreams[(sender, receiver)] = stream
+            plotter.pages.addStream(plotter.assetIdOf(sender), ("asset", sender, receiver), stream)
 
         stream.addNewEntry(timestamp, rssi)
+        plotter.pages.touch(plotter.assetIdOf(sender), timestamp)
     except Exception as e:
         print(e)
         raise e
@@ -248,163 +169,55 @@ def handleAssetMacRssiReport(msg : AssetMacReport, timestamp: datetime.datetime,
 
 
 
-class NearestCrownstoneLogger(Thread):
-    """
-    Thread to decouple logging incoming messages by means of a queue.
-
-    See putMessageOnQueue.
-    """
-    def __init__(self, outputfilename=None):
-        super(NearestCrownstoneLogger, self).__init__()
-        self.loggingQueue = Queue()
-
-        self.trackerfilename = outputfilename
-        self.trackerfile = None
-        self.isRunning = True
-
-    def putMessageOnQueue(self, msg):
-        self.loggingQueue.put(msg)
-
-    def processLoggingQueue(self):
-        """
-        logs the queued items to the trackerfile.
-        terminates when the queue is empty.
-        """
-        self.open_logging_file()
-
-        while not self.loggingQueue.empty():
-            evt = self.loggingQueue.get()
-            print("processed evt: ", evt, file=self.trackerfile)
-
-        self.close_logging_file()
-
-    def run(self):
-        self.open_logging_file()
-        print("# ", "Tracker file created on: ", datetime.datetime.now(), file=self.trackerfile)
-        self.close_logging_file()
-        time.sleep(0.2)
-
-        while self.isRunning:
-            self.processLoggingQueue()
-            time.sleep(0.2)
-
-    def open_logging_file(self):
-        # default to stdout if no filename is given.
-        self.trackerfile = open(self.trackerfilename, "w+", ) if self.trackerfilename else stdout
-
-    def close_logging_file(self):
-        self.trackerfile.flush()
-
-        if self.trackerfilename is not None:
-            self.trackerfile.close()
-
-
-
-
-class FilterManager:
-    def __init__(self, macaddresslist, shouldloadfilters):
-        self.macadresses = macaddresslist
-        self.trackingfilters = []
-        self.trackingfilters.append(filterExactMacInForwarderMacOut(self.macadresses))
-        self.trackingfilters.append(filterExactMacInForwarderMacOut(self.macadresses))
-        # self.trackingfilters.append(filterExactMacInNearestShortIdOut(self.macadresses))
-        # self.trackingfilters.append(filterExactMacInNearestShortIdOut(self.macadresses))
-        # self.trackingfilters.append(filterExactMacInForwarderOutputNone(self.macadresses))
-        # self.trackingfilters.append(filterExactMacInForwarderOutputNone(self.macadresses))
-
-
-        self.shouldloadfilters = shouldloadfilters
-
-    def loadfilters(self):
-        if not self.shouldloadfilters:
-            return
-
-        masterCrc = removeAllFilters()
-
-        for fid, fltr in enumerate(self.trackingfilters):
-            fltr.setFilterId(fid)
+def nearestFilters(macaddresslist):
+    filtercache = FilterCache()
+    trackingfilters = []
+    trackingfilters.append(filterExactMacInForwarderMacOut(macaddresslist, cache=filtercache))
+    trackingfilters.append(filterExactMacInForwarderMacOut(macaddresslist, cache=filtercache))
+    # trackingfilters.append(filterExactMacInNearestShortIdOut(macaddresslist, cache=filtercache))
+    # trackingfilters.append(filterExactMacInNearestShortIdOut(macaddresslist, cache=filtercache))
+    # trackingfilters.append(filterExactMacInForwarderOutputNone(macaddresslist, cache=filtercache))
+    # trackingfilters.append(filterExactMacInForwarderOutputNone(macaddresslist, cache=filtercache))
+    return trackingfilters
 
-        masterCrc = uploadFilters(self.trackingfilters)
-        finalizeFilterUpload(masterCrc,version=18)
-        getStatus()
 
-
-
-class Main:
-    def __init__(self, outputfilename = None, plottingtimewindow_seconds=60, refreshRateMs=250, macaddresslist=[], loadfilters=False):
+class Main(AssetPlotterMain):
+    def __init__(self, outputfilename = None, plottingtimewindow_seconds=60, refreshRateMs=250, macaddresslist=[], loadfilters=False,
+                 rows=2, cols=2, order="active", **options):
         """
         Setup filters Logger and plotter to visualise various nearest crownstone algorithm statistics.
+        rows, cols: the grid of subplots, one per asset. order: which assets are shown, see utils/assetpages.py.
+        options: headless, snapshots, capture and replay, see AssetPlotterMain in utils/assetplotter.py.
         """
-        # initialize uart
-        self.crownstoneUart = setupCrownstoneUart()
-        self.crownstoneLogs = setupCrownstoneLogs()
-
-        self.uartMsgSubscription = UartEventBus.subscribe(SystemTopics.uartNewMessage, lambda msg: self.uartmsghandler(msg))
-
-        # general plotting parameters
-        self.logger = NearestCrownstoneLogger(outputfilename)
-        self.plotter = NearestCrownstoneAlgorithmPlotter(plottingtimewindow_seconds, refreshRateMs)
-        self.filtermanager = FilterManager(macaddresslist, loadfilters)
-
-    def __enter__(self):
-        self.logger.start()
-        self.filtermanager.loadfilters()
+        self.validator = NearestCrownstoneValidator(margin=3.0, accommodationTime=2.0)
+        self.validator.onEvent.append(self.printValidationEvent)
 
-        return self
-
-    def __exit__(self, type, value, traceback):
-        self.logger.isRunning = False
-        self.crownstoneUart.stop()
-
-    ### incoming Uart messages
-
-    def uartmsghandler(self, msg: UartMessagePacket):
-        """
-        Construct object from uart message and put it on the logger/plotter queues.
-        """
-        try:
-            typemap = {
+        super(Main, self).__init__(
+            NearestCrownstoneAlgorithmPlotter(plottingtimewindow_seconds, refreshRateMs, rows, cols, order),
+            FilterManager(nearestFilters(macaddresslist), loadfilters, version=18),
+            typemap={
                 UartRxType.ASSET_ID_RSSI_REPORT : AssetIdReport,
-                UartRxType.ASSET_MAC_RSSI_REPORT: AssetMacReport
-            }
-
-            packettype = typemap.get(msg.opCode, None)
-
-            if packettype is not None:
-                # print(f"Received {packettype} {str(msg.opCode)}: {msg.payload}")
-                packet = packettype()
-                packet.deserialize(msg.payload)
-                self.logger.putMessageOnQueue(packet)
-                self.plotter.putMessageOnQueue(packet)
-        except Exception as e:
-            print(e)
+                UartRxType.ASSET_MAC_RSSI_REPORT: AssetMacReport,
+            },
+            outputfilename=outputfilename,
+            consumers=[self.validator.putMessage],
+            **options)
 
+    def printStatus(self):
+        super(Main, self).printStatus()
+        print(self.validator.status())
 
-    def run(self):
-        """
-        Method will set up an animation and run it.
-        In parallel it will record the data to file.
-        """
-        fig, axs = plt.subplots(1, 1, sharex=True)
+    def printValidationEvent(self, event):
+        if event.kind == "mismatch":
+            print(event)
 
-        # axs is a 2d list. 1d lists are easier to iterate, so thats axs_flat.
-        axs_flat = [axs] # 1,1  results in axs not being wrapped in a list...
-        # axs_flat = list(chain.from_iterable(axs))
-
-        ani = animation.FuncAnimation(fig,
-                                      lambda i: self.plotter.updatePlotData(i, fig, axs_flat),
-                                      interval=self.plotter.refreshRateMs)
-        # plt.ion()
-        plt.show()
+if __name__ == "__main__":
+    import argparse
 
-        try:
-            while True:
-                self.logger.processLoggingQueue()
-                time.sleep(0.1)
-        except Exception as e:
-            print(e)
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    addArguments(parser)
+    args = parser.parse_args()
 
-if __name__ == "__main__":
-    with Main(outputfilename=None, plottingtimewindow_seconds=3*60, macaddresslist = getMacList(), loadfilters=False) as m:
+    with Main(outputfilename=None, plottingtimewindow_seconds=3*60, macaddresslist = getMacList(), loadfilters=False,
+              **mainArguments(args)) as m:
         m.run()
-
@@ -1,16 +1,30 @@
 """
 This is a utility wrapper for the firmware RssiDataTracker class, which pushes its information
 to the FirmwareState tracker.
+
+Without a display, run it headless: it only records, and saves a snapshot of the plots every 30 seconds
+if --snapshot is given:
+
+    python -m BluenetTestSuite.testscripts.rssidatatracker --headless --snapshot rssidata.png
+
+A session recorded with utils/uartcapture.py can be replayed instead of connecting to the crownstones:
+
+    python -m BluenetTestSuite.testscripts.rssidatatracker --replay session.cap --speed 10
 """
-from statistics import mean, median
+from array import array
+from statistics import fmean
 from itertools import combinations, chain
+import bisect
 import time
 import datetime
 import queue
 
-from BluenetLib import Bluenet
-from BluenetTestSuite.firmwarecontrol.datatransport import initializeUSB
 from BluenetTestSuite.firmwarestate.firmwarestate import FirmwareState
+from BluenetTestSuite.utils.rollingfilter import RollingMedian, slidingMedian
+from BluenetTestSuite.utils.rssistream import toSeconds
+from BluenetTestSuite.utils.snapshotter import Snapshotter
+from BluenetTestSuite.utils.uartcapture import CaptureReplayer
+from BluenetTestSuite.utils.setup import setupCrownstoneUart
 
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
@@ -29,22 +43,85 @@ class PingMessage:
         return ",".join([str(x) for x in [self.timestamp, self.sender, self.recipient, self.channel, self.rssi]])
 
 class RssiStream:
-    def __init__(self):
+    """
+    rssifilter: optional streaming filter (see utils/rollingfilter.py), which fills self.filtered
+    as the samples come in.
+    """
+    def __init__(self, rssifilter=None):
         self.times = []
         self.rssis = []
+        self.filtered = []
+        self.rssifilter = rssifilter
 
     def prune(self, time_minimum):
-        indx = next(idx for idx, t in enumerate(self.times) if t >= time_minimum)
+        indx = bisect.bisect_left(self.times, time_minimum)
         self.times = self.times[indx:]
         self.rssis = self.rssis[indx:]
+        self.filtered = self.filtered[indx:]
 
     def put(self, t, r):
         self.times.append(t)
         self.rssis.append(r)
+        if self.rssifilter is not None:
+            self.filtered.append(self.rssifilter.push(r))
 
     def printStatus(self):
         print("RssiStream: {0}-{1}, #{2} samples".format(self.times[0], self.times[-1], len(self.rssis)))
 
+class PairHistory:
+    """
+    The rssi updates of one pair of crownstones (both directions), in the order they were recorded: their times
+    (as in utils/rssistream.toSeconds) for bisection and their indices in the FirmwareState history, which holds
+    the entries themselves.
+    """
+    def __init__(self, history):
+        self.history = history
+        self.times = array('d')
+        self.indices = array('q')
+
+    def append(self, t, index):
+        # indices first: an index found in times is always valid in indices.
+        self.indices.append(index)
+        self.times.append(toSeconds(t))
+
+    def entries(self, begin, end):
+        """
+        Returns the FirmwareStateHistoryEntry-s of updates begin..end, most recent first.
+        """
+        return [self.history.entry(i) for i in reversed(self.indices[begin:end])]
+
+    def rssis(self, begin, end):
+        """
+        Returns the rssi values of updates begin..end, most recent first, without constructing the entries.
+        """
+        return [float(self.history.value(i)) for i in reversed(self.indices[begin:end])]
+
+    def lastNRange(self, n):
+        """
+        Returns begin, end of the last n updates.
+        """
+        end = len(self.indices)
+        return max(end - max(n, 0), 0), end
+
+    def timeWindowRange(self, t_begin, t_end):
+        """
+        Returns begin, end of the updates recorded in [t_begin, t_end].
+        """
+        return bisect.bisect_left(self.times, toSeconds(t_begin)), bisect.bisect_right(self.times, toSeconds(t_end))
+
+    def lastN(self, n):
+        """
+        Returns the last n entries, most recent first.
+        """
+        return self.entries(*self.lastNRange(n))
+
+    def inTimeWindow(self, t_begin, t_end):
+        """
+        Returns the entries recorded in [t_begin, t_end], most recent first.
+        """
+        return self.entries(*self.timeWindowRange(t_begin, t_end))
+
+
 class RssiDataTracker:
     def __init__(self, FW):
         self.fw = FW
@@ -52,6 +129,8 @@ class RssiDataTracker:
 
         # receive updates from firmwarestate into self.record
         self.fw.onNewEntryParsed += [lambda e: self.record(e)]
+        # the pair histories refer to the firmwarestate history by index.
+        self.fw.onCleared += [lambda: self.pairhistories.clear()]
 
         # if interested in the recorder updates, add a queue to this list.
         # they will all receive the updates.
@@ -62,6 +141,10 @@ class RssiDataTracker:
         # the rssi/time data stream
         self.rssitimeseries = dict()
 
+        # keys: frozenset pairs of crownstone ids (as strings)
+        # values: PairHistory, the history indices of that pair, filled by record and cleared with FW.
+        self.pairhistories = dict()
+
     def addPingListenerQueue(self, q):
         self.pingListenerQueues.append(q)
 
@@ -83,10 +166,26 @@ class RssiDataTracker:
         self.activeCrownstoneIds.add(expr[1])  # sender
         self.activeCrownstoneIds.add(expr[2])  # receiver
 
+        with self.fw.lock:
+            # record runs right after the entry was appended, unless the history was cleared in between.
+            index = len(self.fw.historylist) - 1
+            if index >= 0:
+                self.pairHistory(expr[1], expr[2]).append(e.time, index)
+
         ping = PingMessage(e.time, expr[1], expr[2], int(expr[3]), float(e.value))
 
         self.pushPingListenerQueues(ping)
 
+    def pairHistory(self, i, j):
+        """
+        Returns the PairHistory of the pairs (i,j) and (j,i), creating it if necessary.
+        """
+        i_j = frozenset({str(i), str(j)})
+        history = self.pairhistories.get(i_j)
+        if history is None:
+            history = self.pairhistories[i_j] = PairHistory(self.fw.historylist)
+        return history
+
     def updateDictsListener(self, ping):
         i_j = frozenset({ping.sender, ping.recipient})
 
@@ -105,35 +204,19 @@ class RssiDataTracker:
 
     def getLastN(self, i, j, n=1):
         """
-        Retrieve the last n Retrieve the FimrwareStateHistoryEntry-s
-        for pairs (i,j) and (j,i).
+        Retrieve the last n FirmwareStateHistoryEntry-s
+        for pairs (i,j) and (j,i), most recent first.
         """
-        # reversed iteration is likely faster since look up of recent
-        # data will be executed more often
-        returnlist = []
-        for entry in reversed(self.fw.historylist):
-            if self.isRelevant(entry, i, j, True):
-                returnlist.add(entry)
-            if len(returnlist) >= n:
-                return returnlist
-        return returnlist
+        history = self.pairhistories.get(frozenset({str(i), str(j)}))
+        return [] if history is None else history.lastN(n)
 
     def getInTimeWindow(self, i, j, t_begin, t_end):
         """
         Retrieve the FimrwareStateHistoryEntry-s for the pairs (i,j) and (j,i)
-        which were recorded in the time interval [t_begin, t_end].
-        """
-        # reversed iteration is likely faster since look up of recent
-        # data will be executed more often
-        returnlist = []
-        for entry in reversed(self.fw.historylist):
-            if (entry.time < t_begin
-                    and entry.time < t_end
-                    and self.isRelevant(entry, i, j, True)):
-                returnlist.add(entry)
-            if entry.time < t_begin:
-                return returnlist
-        return returnlist
+        which were recorded in the time interval [t_begin, t_end], most recent first.
+        """
+        history = self.pairhistories.get(frozenset({str(i), str(j)}))
+        return [] if history is None else history.inTimeWindow(t_begin, t_end)
 
     def isRelevant(self, fwhistoryentry, i, j, allowSymmetry=False):
         """
@@ -147,11 +230,13 @@ class RssiDataTracker:
 
 
     def avgRssiLastN(self, i, j, n=1):
-        return mean(RssiValuesFromListOfEntries(getLastN(i, j, n)))
+        history = self.pairhistories.get(frozenset({str(i), str(j)}))
+        return fmean([] if history is None else history.rssis(*history.lastNRange(n)))
 
 
     def avgRssiInTimeWindow(self, i, j, t_begin, t_end):
-        return mean(RssiValuesFromListOfEntries(getInTimeWindow(i, j, t_begin, t_end)))
+        history = self.pairhistories.get(frozenset({str(i), str(j)}))
+        return fmean([] if history is None else history.rssis(*history.timeWindowRange(t_begin, t_end)))
 
 
     def RssiValuesFromListOfEntries(self, listofentries):
@@ -159,14 +244,30 @@ class RssiDataTracker:
 
 
 class Main:
-    def __init__(self):
-        # initialize components and USB
-        self.bluenet = Bluenet()
-        self.fwState = FirmwareState()
-        initializeUSB(self.bluenet, "ttyACM", range(4))
+    def __init__(self, headless=False, snapshotfilename=None, snapshotinterval_seconds=30, replayfilename=None,
+                 replayspeed=1.0, trackerfilename="rssidata.csv"):
+        """
+        trackerfilename: file to record the pings to.
+        headless: don't open a window, only record the pings and save a snapshot of the plots to snapshotfilename
+            every snapshotinterval_seconds. Without snapshotfilename, nothing is plotted at all.
+        replayfilename: replay the uart messages of this capture at replayspeed (0 for maximum) instead of
+            connecting to the crownstones. The pings keep the time at which they were recorded and the plots
+            follow that time. Headless, the script ends when the replay is done.
+        """
+        # initialize components and uart, or the replay of a capture
+        self.crownstoneUart = None
+        self.replayer = None
+        self.clock = time.time
+        if replayfilename is None:
+            self.fwState = FirmwareState()
+            self.crownstoneUart = setupCrownstoneUart()
+        else:
+            self.replayer = CaptureReplayer(replayfilename, speed=replayspeed)
+            self.clock = self.replayer.clock
+            self.fwState = FirmwareState(echoInterval=1.0, clock=self.clock)
 
         # general plotting parameters
-        self.trackerfilename = "rssidata.csv"
+        self.trackerfilename = trackerfilename
         self.num_samples_for_median_filter = 5
         self.plotwindow_width = datetime.timedelta(seconds=60)
 
@@ -184,7 +285,14 @@ class Main:
         # set up the tracker
         self.rssiDataTracker = RssiDataTracker(self.fwState)
         self.rssiDataTracker.addPingListenerQueue(self.pingQueueForLogging)
-        self.rssiDataTracker.addPingListenerQueue(self.pingQueueForPlotting)
+
+        self.headless = headless
+        self.snapshotter = None
+        if headless and snapshotfilename is not None:
+            self.snapshotter = Snapshotter(self.processPingQueueForPlotting, self.saveSnapshot,
+                                           snapshotfilename, 2, 3, interval=snapshotinterval_seconds)
+        if not headless or self.snapshotter is not None:
+            self.rssiDataTracker.addPingListenerQueue(self.pingQueueForPlotting)
 
     def __enter__(self):
         self.trackerfile = open(self.trackerfilename, "w+", )
@@ -199,13 +307,27 @@ class Main:
         ]), file=self.trackerfile)
         self.trackerfile.flush()
 
+        if self.replayer is not None:
+            self.replayer.open()
+        if self.snapshotter is not None:
+            self.snapshotter.start()
+        if self.replayer is not None:
+            self.replayer.start()
         return self
 
     def __exit__(self, type, value, traceback):
         # seems to not be called on SIGINT
         print("exiting main")
+        if self.replayer is not None:
+            self.replayer.close()
+            print(self.replayer.status())
+        if self.snapshotter is not None:
+            self.snapshotter.stop()
+            print(self.snapshotter.status())
+        self.processPingQueueForLogging()
         self.trackerfile.close()
-        self.bluenet.stop()
+        if self.crownstoneUart is not None:
+            self.crownstoneUart.stop()
 
     def processPingQueueForLogging(self):
         # non blocking processor method
@@ -233,19 +355,20 @@ class Main:
             if ij not in self.stonePairToChannelStreamsDict:
                 self.stonePairToChannelStreamsDict[ij] = dict()
             if ping.channel not in self.stonePairToChannelStreamsDict[ij]:
-                self.stonePairToChannelStreamsDict[ij][ping.channel] = RssiStream()
+                self.stonePairToChannelStreamsDict[ij][ping.channel] = RssiStream(
+                    RollingMedian(self.num_samples_for_median_filter))
 
             self.stonePairToChannelStreamsDict[ij][ping.channel].put(ping.timestamp, ping.rssi)
 
     def medianFilter(self, list_of_floats, samples_per_median):
-        l = list_of_floats
-        M = len(l)
-        return [
-            median(l[max(k-samples_per_median, 0): k] or [l[0]]) for k in range(M)
-        ]
+        """
+        Recomputes the median filter of a whole series. The RssiStreams filter their samples as they come in,
+        this is only needed for series that weren't.
+        """
+        return list(slidingMedian(list_of_floats, samples_per_median))
 
     def updatePlotData(self, i, fig, axs_flat):
-        now = datetime.datetime.now()
+        now = datetime.datetime.fromtimestamp(self.clock())
         time_minimum = now - self.plotwindow_width
         self.processPingQueueForPlotting()
         self.pruneStonePairToChannelStreamsDict(time_minimum)
@@ -285,26 +408,60 @@ class Main:
 
             # loop over all channels on this pair of crownstones and plot each as a separate line.
             for channel, rssiStream in channelToStreamDict.items():
-                ax.plot(rssiStream.times, self.medianFilter(rssiStream.rssis, self.num_samples_for_median_filter),
+                ax.plot(rssiStream.times, rssiStream.filtered,
                         marker='o', markersize=3,
                         label="ch: {0}".format(channel))
 
 
+    def saveSnapshot(self, fig, axs_flat, filename):
+        """
+        Snapshot callback of the headless Snapshotter.
+        """
+        self.updatePlotData(0, fig, axs_flat)
+        fig.savefig(filename)
+
     def run(self):
         """
         Method will set up an animation and run it.
         In parallel it will record the data to file.
         """
+        if self.headless:
+            self.runHeadless()
+            return
+
         fig, axs = plt.subplots(2, 3, sharex=True)
         axs_flat = list(chain.from_iterable(axs))  # for practical reasons have a flattened version of the axs
         ani = animation.FuncAnimation(fig, lambda i: self.updatePlotData(i, fig, axs_flat), interval=250)
         plt.show()
 
-        while True:
+        while not self.isReplayDone():
             self.processPingQueueForLogging()
             # time.sleep(0.5)
 
+    def runHeadless(self):
+        """
+        Records (and saves snapshots, if enabled) until interrupted, or until the replay is done.
+        """
+        print("running headless, press ctrl+c to quit")
+        while not self.isReplayDone():
+            self.processPingQueueForLogging()
+            time.sleep(0.5)
+
+    def isReplayDone(self):
+        return self.replayer is not None and self.replayer.isDone()
+
 if __name__ == "__main__":
-    with Main() as m:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Plots and records the rssi between crownstones")
+    parser.add_argument("--headless", action="store_true", help="don't open a window, only record (and save snapshots)")
+    parser.add_argument("--snapshot", default=None, help="headless: file to save the plots to, e.g. plot.png or plot.svg")
+    parser.add_argument("--snapshotinterval", type=float, default=30, help="headless: seconds between snapshots")
+    parser.add_argument("--replay", default=None, help="replay this capture file instead of connecting to the crownstones")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay: multiple of the recorded pace, 0 for maximum")
+    args = parser.parse_args()
+
+    with Main(headless=args.headless, snapshotfilename=args.snapshot, snapshotinterval_seconds=args.snapshotinterval,
+              replayfilename=args.replay, replayspeed=args.speed) as m:
         m.run()
 
@@ -0,0 +1,175 @@
+"""
+Selection of the assets that the plotters show, one asset per subplot in a grid of rows x cols.
+
+The plotters register each stream under the asset it belongs to, and report activity and nearest crownstone
+switches as messages come in. Each frame they ask which assets are visible and only prune and draw the streams
+of those assets, so the cost of a frame depends on the grid size rather than on the number of assets:
+
+    pages = AssetPages(rows=2, cols=3, order="active")
+    fig.canvas.mpl_connect("key_press_event", pages.onKey)
+
+    # for each message:
+    pages.addStream(assetId, key, stream)  # when the stream is created
+    pages.touch(assetId, timestamp)
+
+    # each frame:
+    for ax, assetId in zip(axs_flat, pages.visible(now)):
+        for key, stream in pages.streams(assetId).items():
+            ...
+
+Orders:
+- "id": all assets sorted by id, in pages. Keys right/pagedown and left/pageup go to the next/previous page.
+- "active": the assets with the most messages in the last activityWindow seconds.
+- "switched": the assets that most recently switched nearest crownstone.
+The key m cycles through the orders. The top-K orders are recomputed at most every reselectInterval seconds,
+so that subplots don't swap assets each frame.
+"""
+import math
+
+from BluenetTestSuite.utils.rssistream import toSeconds
+
+
+def idKey(assetId):
+    """
+    Sort key of asset ids: numbers by value, other ids (mac addresses) as strings after them.
+    """
+    if isinstance(assetId, int):
+        return 0, assetId, ""
+    return 1, 0, str(assetId)
+
+
+class AssetEntry:
+    def __init__(self, assetId):
+        self.assetId = assetId
+        # streams: dict (key -> stream) of this asset.
+        self.streams = dict()
+        # message count that decays with activityWindow, as of lastSeen.
+        self.activity = 0.0
+        self.lastSeen = None
+        self.lastSwitch = None
+
+
+class AssetPages:
+    orders = ["id", "active", "switched"]
+
+    def __init__(self, rows=2, cols=2, order="id", reselectInterval=5.0, activityWindow=10.0):
+        if order not in self.orders:
+            raise ValueError("order should be one of {0}".format(self.orders))
+        self.rows = rows
+        self.cols = cols
+        self.order = order
+        self.page = 0
+        self.reselectInterval = reselectInterval
+        self.activityWindow = activityWindow
+
+        # assets: dict (assetId -> AssetEntry)
+        self.assets = dict()
+
+        # the current selection, and when it was made.
+        self.selection = []
+        self.selectionTime = None
+        self.selectionAssetCount = 0
+        self.pageCount = 1
+
+    @property
+    def size(self):
+        return self.rows * self.cols
+
+    def entry(self, assetId):
+        entry = self.assets.get(assetId)
+        if entry is None:
+            entry = self.assets[assetId] = AssetEntry(assetId)
+        return entry
+
+    def addStream(self, assetId, key, stream):
+        self.entry(assetId).streams[key] = stream
+
+    def streams(self, assetId):
+        entry = self.assets.get(assetId)
+        return entry.streams if entry is not None else dict()
+
+    def allStreams(self):
+        for entry in self.assets.values():
+            yield from entry.streams.values()
+
+    def touch(self, assetId, timestamp):
+        """
+        Counts a message of the asset. timestamp: datetime or posix seconds.
+        """
+        entry = self.entry(assetId)
+        seconds = toSeconds(timestamp)
+        entry.activity = self.activityAt(entry, seconds) + 1
+        entry.lastSeen = seconds
+
+    def switched(self, assetId, timestamp):
+        """
+        Records that the nearest crownstone of the asset changed.
+        """
+        self.entry(assetId).lastSwitch = toSeconds(timestamp)
+
+    def activityAt(self, entry, seconds):
+        if entry.lastSeen is None:
+            return 0.0
+        return entry.activity * math.exp(-max(seconds - entry.lastSeen, 0) / self.activityWindow)
+
+    def visible(self, now):
+        """
+        Returns the ids of the assets to show, at most rows x cols. An id is None for a subplot that stays empty.
+        """
+        seconds = toSeconds(now)
+        if self.order == "id":
+            # pages only change when assets are added or the page is changed.
+            if self.selectionTime is None or self.selectionAssetCount != len(self.assets):
+                self.select(seconds)
+        elif self.selectionTime is None or seconds - self.selectionTime >= self.reselectInterval:
+            self.select(seconds)
+        return self.selection
+
+    def select(self, seconds):
+        self.selectionTime = seconds
+        self.selectionAssetCount = len(self.assets)
+        if self.order == "id":
+            ids = sorted(self.assets.keys(), key=idKey)
+            self.pageCount = max(math.ceil(len(ids) / self.size), 1)
+            self.page = min(self.page, self.pageCount - 1)
+            self.selection = ids[self.page * self.size:(self.page + 1) * self.size]
+            return
+
+        self.pageCount = 1
+        self.page = 0
+        if self.order == "active":
+            score = lambda entry: self.activityAt(entry, seconds)
+        else:
+            score = lambda entry: -math.inf if entry.lastSwitch is None else entry.lastSwitch
+        top = sorted(self.assets.values(), key=score, reverse=True)[:self.size]
+        # assets that stay selected keep their subplot.
+        topIds = set(entry.assetId for entry in top)
+        slots = [assetId if assetId in topIds else None for assetId in self.selection]
+        slots += [None] * (len(topIds) - len(slots))
+        new = iter(sorted(topIds.difference(slots), key=idKey))
+        self.selection = [next(new, None) if assetId is None else assetId for assetId in slots]
+        while self.selection and self.selection[-1] is None:
+            self.selection.pop()
+
+    def nextPage(self, step=1):
+        self.page = (self.page + step) % self.pageCount
+        self.selectionTime = None
+
+    def nextOrder(self):
+        self.order = self.orders[(self.orders.index(self.order) + 1) % len(self.orders)]
+        self.page = 0
+        self.selection = []
+        self.selectionTime = None
+
+    def onKey(self, event):
+        if event.key in ("right", "pagedown"):
+            self.nextPage(1)
+        elif event.key in ("left", "pageup"):
+            self.nextPage(-1)
+        elif event.key == "m":
+            self.nextOrder()
+
+    def describe(self):
+        if self.order == "id":
+            return "page {0}/{1} of {2} assets".format(self.page + 1, self.pageCount, len(self.assets))
+        return "{0} most {1} of {2} assets".format(len(self.selection), self.order, len(self.assets))
@@ -0,0 +1,452 @@
+"""
+What the asset plotting scripts (testscripts/nearestcrownstoneplotter.py and testscripts/assetforwarderplotter.py)
+share: a plotter that shows one asset per subplot in a paged grid (utils/assetpages.py) with blitted live plots
+(utils/liveplot.py), a logger thread, the filter upload, and a Main that passes the uart messages, or those of a
+replayed capture, through a DecodePool to them.
+
+A script subclasses AssetPlotter to turn the decoded packets into streams (handleMessage) and to draw the streams
+of an asset (plotStream), and gives its packet types and filters to AssetPlotterMain:
+
+    class MyPlotter(AssetPlotter):
+        def handleMessage(self, msg, timestamp): ...
+        def plotStream(self, liveplot, key, stream): ...
+
+    with AssetPlotterMain(MyPlotter(60, 250, rows=2, cols=2), FilterManager(trackingfilters, True, version=1),
+                          typemap={UartRxType.ASSET_MAC_RSSI_REPORT: AssetMacReport}) as m:
+        m.run()
+
+Without a display, Main runs headless: it only logs, and if a snapshot file is given saves the plots every
+snapshotinterval_seconds, see utils/snapshotter.py. A session can be recorded to a capture file and replayed from
+one instead of connecting to a crownstone, see utils/uartcapture.py. addArguments adds the command line options
+for these to a script's parser, and mainArguments turns them into keyword arguments of Main:
+
+    python -m BluenetTestSuite.testscripts.nearestcrownstoneplotter --headless --snapshot nearest.png
+    python -m BluenetTestSuite.testscripts.nearestcrownstoneplotter --capture session.cap
+    python -m BluenetTestSuite.testscripts.nearestcrownstoneplotter --replay session.cap --speed 10
+"""
+import datetime
+import time
+from queue import Queue, Empty
+from threading import Thread
+
+import matplotlib
+import matplotlib.pyplot as plt
+
+from crownstone_uart import UartEventBus
+from crownstone_uart.topics.SystemTopics import SystemTopics
+from crownstone_uart.core.uart.uartPackets.UartMessagePacket import UartMessagePacket
+
+from BluenetTestSuite.utils.setup import setupCrownstoneUart, setupCrownstoneLogs
+from BluenetTestSuite.utils.liveplot import LivePlot, BlitRenderer
+from BluenetTestSuite.utils.reportwriter import ReportWriter
+from BluenetTestSuite.utils.decodepool import DecodePool
+from BluenetTestSuite.utils.snapshotter import Snapshotter
+from BluenetTestSuite.utils.uartcapture import CaptureRecorder, CaptureReplayer
+from BluenetTestSuite.utils.nearestvalidator import assetIdFromMac
+from BluenetTestSuite.utils.assetpages import AssetPages
+from BluenetTestSuite.utils.filtercommands import syncFilters
+
+
+class PlotterQueueObject:
+    """
+    Used in the plotter queue
+    """
+    def __init__(self, msg, timestamp=None):
+        self.msg = msg
+        self.timestamp = datetime.datetime.now() if timestamp is None else datetime.datetime.fromtimestamp(timestamp)
+
+
+class AssetPlotter:
+    """
+    This class is responsible for decoupling the Uart thread from the plotting thread by means of a queue.
+    Further it passively keeps track of the plotting information per asset. Subclasses turn the messages into
+    streams, see handleMessage, and draw them, see plotStream.
+
+    title: the start of the figure title.
+    liveplotOptions: keyword arguments for the LivePlot of each subplot.
+    clock: returns the posix time at the end of the time window, see getTimeWindow.
+    """
+    title = "Asset Plot"
+    liveplotOptions = dict()
+
+    def __init__(self, plottingtimewindow_seconds, refreshRateMs, rows=1, cols=1, order="id", clock=time.time):
+        self.plottingQueue = Queue()
+
+        self.plotwindow_width = datetime.timedelta(seconds=plottingtimewindow_seconds)
+        self.refreshRateMs = refreshRateMs
+        self.clock = clock
+
+        # one subplot per asset, see utils/assetpages.py. Streams are registered per asset id.
+        self.pages = AssetPages(rows, cols, order)
+        self.assetIds = {}         # mac -> assetId
+        self.assetMacs = {}        # assetId -> mac
+
+        # the streams of visible assets are pruned each frame, the others every pruneInterval.
+        self.pruneInterval = datetime.timedelta(seconds=10)
+        self.lastPrune = None
+
+        # created on the first frame, see plot.
+        self.liveplots = []
+        self.renderer = None
+        self.shownAssets = []
+        self.suptitle = None
+
+    def putMessageOnQueue(self, msg, timestamp=None):
+        """
+        timestamp: posix time at which msg was received, now if None.
+        """
+        self.plottingQueue.put(PlotterQueueObject(msg, timestamp))
+
+    def handleMessage(self, msg, timestamp):
+        """
+        Adds a decoded packet to the streams. timestamp: datetime at which it was received.
+        """
+        raise NotImplementedError()
+
+    def plotStream(self, liveplot, key, stream):
+        """
+        Draws stream, registered under key (see AssetPages.addStream), in liveplot.
+        """
+        raise NotImplementedError()
+
+    def updatePlotData(self, i, fig, axs_flat):
+        """
+        Processes queue for plotting.
+        Remove old messages.
+        Plot.
+        """
+        try:
+            self.processPlottingQueue()
+            self.removeOldEntriesFromStreams()
+            self.plot(i, fig, axs_flat)
+        except Exception as e:
+            print(e)
+            raise e
+
+    def plot(self, i, fig, axs_flat):
+        past, now = self.getTimeWindow()
+
+        if self.renderer is None:
+            # format, the axes are only set up once.
+            self.liveplots = [LivePlot(ax, self.plotwindow_width, **self.liveplotOptions) for ax in axs_flat]
+            self.renderer = BlitRenderer(fig, self.liveplots)
+            self.shownAssets = [None] * len(self.liveplots)
+
+        title = self.getTitle()
+        if title != self.suptitle:
+            self.suptitle = title
+            fig.suptitle(title, fontsize=12)
+            self.renderer.invalidate()
+
+        visible = self.pages.visible(now)
+        for index, liveplot in enumerate(self.liveplots):
+            # each liveplot is a subplot that presents one asset, only the visible assets are processed.
+            assetId = visible[index] if index < len(visible) else None
+            if assetId != self.shownAssets[index]:
+                self.shownAssets[index] = assetId
+                liveplot.clear()
+                liveplot.setTitle(self.getAssetTitle(assetId))
+            if assetId is None:
+                continue
+            liveplot.setTimeWindow(now)
+
+            for key, stream in self.pages.streams(assetId).items():
+                stream.removeOldEntries(past)
+                self.plotStream(liveplot, key, stream)
+
+        self.renderer.render()
+
+    def saveSnapshot(self, fig, axs_flat, filename):
+        """
+        Draws the current time window in fig and saves it to filename.
+        """
+        self.updatePlotData(0, fig, axs_flat)
+        self.renderer.save(filename)
+
+    def processPlottingQueue(self):
+        """
+        Updates the rssi stream according to the new events.
+        Should be called before each frame update.
+
+        Terminates when the plotting queue is empty
+        """
+        while not self.plottingQueue.empty():
+            plottingQueueObject = self.plottingQueue.get()
+            self.handleMessage(plottingQueueObject.msg, plottingQueueObject.timestamp)
+
+    def getTimeWindow(self):
+        now = datetime.datetime.fromtimestamp(self.clock())
+        return now - self.plotwindow_width, now
+
+    def removeOldEntriesFromStreams(self):
+        """
+        Prunes the streams of all assets every pruneInterval, plot prunes the visible ones each frame.
+        """
+        past, now = self.getTimeWindow()
+        if self.lastPrune is not None and now - self.lastPrune < self.pruneInterval:
+            return
+        self.lastPrune = now
+
+        for stream in self.pages.allStreams():
+            stream.removeOldEntries(past)
+
+    def assetIdOf(self, mac):
+        assetId = self.assetIds.get(mac)
+        if assetId is None:
+            assetId = self.assetIds[mac] = assetIdFromMac(mac)
+            self.assetMacs[assetId] = mac
+        return assetId
+
+    def getTitle(self):
+        return F"{self.title} - {self.pages.describe()}"
+
+    def getAssetTitle(self, assetId):
+        if assetId is None:
+            return ""
+        if assetId in self.assetMacs:
+            return F"AssetId {assetId:06x} ({self.assetMacs[assetId]})"
+        return F"AssetId {assetId:06x}"
+
+
+class AssetReportLogger(Thread):
+    """
+    Thread to decouple logging incoming messages by means of a queue.
+    The messages are written as csv lines by a ReportWriter, see utils/reportwriter.py.
+
+    See putMessageOnQueue.
+    """
+    def __init__(self, outputfilename=None, maxBytes=64 * 1024 * 1024, flushInterval=1.0, batchSize=1000):
+        super(AssetReportLogger, self).__init__()
+        self.loggingQueue = Queue()
+        self.batchSize = batchSize
+
+        self.trackerfilename = outputfilename
+        self.writer = ReportWriter(outputfilename, maxBytes=maxBytes, flushInterval=flushInterval)
+        self.isRunning = True
+
+    def putMessageOnQueue(self, msg, timestamp=None):
+        """
+        timestamp: posix time at which msg was received, now if None.
+        """
+        self.loggingQueue.put([time.time() if timestamp is None else timestamp, msg])
+
+    def processLoggingQueue(self, timeout=0.2):
+        """
+        Waits at most timeout seconds for a message, then logs it together with the other queued messages
+        (at most batchSize) to the trackerfile.
+        """
+        try:
+            batch = [self.loggingQueue.get(timeout=timeout)]
+        except Empty:
+            batch = []
+
+        while len(batch) < self.batchSize:
+            try:
+                batch.append(self.loggingQueue.get_nowait())
+            except Empty:
+                break
+
+        self.writer.write(batch)
+
+    def run(self):
+        self.writer.open()
+
+        while self.isRunning:
+            self.processLoggingQueue()
+
+        # log what is left and close the file.
+        while not self.loggingQueue.empty():
+            self.processLoggingQueue(timeout=0)
+        self.writer.close()
+
+
+class FilterManager:
+    """
+    Uploads trackingfilters, as filters 0, 1, ..., and commits them with the given master version.
+    """
+    def __init__(self, trackingfilters, shouldloadfilters, version):
+        self.trackingfilters = trackingfilters
+        self.shouldloadfilters = shouldloadfilters
+        self.version = version
+
+    def loadfilters(self):
+        if not self.shouldloadfilters:
+            return
+
+        for fid, fltr in enumerate(self.trackingfilters):
+            fltr.setFilterId(fid)
+
+        syncFilters(self.trackingfilters, version=self.version)
+
+
+class AssetPlotterMain:
+    """
+    Sets up the uart, or the replay of a capture, the logger, the plotter and the filters.
+
+    plotter: an AssetPlotter, whose grid is also used for the snapshots.
+    filtermanager: a FilterManager, its filters are loaded unless replaying.
+    typemap: the packets to decode, see utils/decodepool.py.
+    outputfilename: csv file to log the packets to, see AssetReportLogger.
+    headless: don't open a window, only log the messages and save a snapshot of the plots to snapshotfilename
+        every snapshotinterval_seconds. Without snapshotfilename, nothing is plotted at all.
+    capturefilename: record the uart messages to this file, see utils/uartcapture.py.
+    replayfilename: replay the uart messages of this capture at replayspeed (0 for maximum) instead of
+        connecting to a crownstone. The packets keep the time at which they were recorded and the plots follow
+        that time. Headless, the script ends when the replay is done.
+    consumers: additional consumers of the decoded packets, see utils/decodepool.py.
+    """
+    def __init__(self, plotter, filtermanager, typemap, outputfilename=None, headless=False, snapshotfilename=None,
+                 snapshotinterval_seconds=30, capturefilename=None, replayfilename=None, replayspeed=1.0,
+                 consumers=()):
+        # initialize uart, or the replay of a capture
+        self.crownstoneUart = None
+        self.replayer = None
+        if replayfilename is None:
+            self.crownstoneUart = setupCrownstoneUart()
+            self.crownstoneLogs = setupCrownstoneLogs()
+        else:
+            self.replayer = CaptureReplayer(replayfilename, speed=replayspeed)
+        self.recorder = CaptureRecorder(capturefilename) if capturefilename is not None else None
+
+        self.uartMsgSubscription = UartEventBus.subscribe(SystemTopics.uartNewMessage, lambda msg: self.uartmsghandler(msg))
+
+        # general plotting parameters
+        self.logger = AssetReportLogger(outputfilename)
+        self.plotter = plotter
+        if self.replayer is not None:
+            self.plotter.clock = self.replayer.clock
+        self.filtermanager = filtermanager
+
+        self.headless = headless
+        self.snapshotter = None
+        if headless and snapshotfilename is not None:
+            self.snapshotter = Snapshotter(self.plotter.processPlottingQueue, self.plotter.saveSnapshot,
+                                           snapshotfilename, plotter.pages.rows, plotter.pages.cols,
+                                           interval=snapshotinterval_seconds)
+        allconsumers = [self.logger.putMessageOnQueue]
+        if not headless or self.snapshotter is not None:
+            allconsumers.append(self.plotter.putMessageOnQueue)
+
+        # decodes the uart messages of these types off the uart thread.
+        self.decodepool = DecodePool(
+            typemap=typemap,
+            consumers=allconsumers + list(consumers),
+            # a replay waits for the workers instead of losing packets.
+            blockWhenFull=self.replayer is not None)
+
+    def __enter__(self):
+        if self.replayer is not None:
+            # before the plotter can ask for the time of the replay.
+            self.replayer.open()
+        self.logger.start()
+        self.decodepool.start()
+        if self.snapshotter is not None:
+            self.snapshotter.start()
+        if self.recorder is not None:
+            self.recorder.start()
+
+        if self.replayer is None:
+            self.filtermanager.loadfilters()
+        else:
+            self.replayer.start()
+
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if self.replayer is not None:
+            self.replayer.close()
+        if self.recorder is not None:
+            self.recorder.stop()
+        self.decodepool.stop()
+        if self.snapshotter is not None:
+            self.snapshotter.stop()
+        self.printStatus()
+        UartEventBus.unsubscribe(self.uartMsgSubscription)
+        self.logger.isRunning = False
+        self.logger.join()
+        if self.crownstoneUart is not None:
+            self.crownstoneUart.stop()
+
+    def printStatus(self):
+        """
+        Prints the statistics of the components, when Main exits.
+        """
+        if self.replayer is not None:
+            print(self.replayer.status())
+        if self.recorder is not None:
+            print(self.recorder.status())
+        print("uart packets:", self.decodepool.status())
+        if self.snapshotter is not None:
+            print(self.snapshotter.status())
+
+    ### incoming Uart messages
+
+    def uartmsghandler(self, msg: UartMessagePacket):
+        """
+        Runs on the uart thread: only queues the payload, the decodepool constructs the packet
+        and puts it on the logger/plotter queues.
+        """
+        timestamp = None if self.replayer is None else self.replayer.clock()
+        self.decodepool.submit(msg.opCode, msg.payload, timestamp)
+
+    def run(self):
+        """
+        Method will set up an animation and run it.
+        In parallel it will record the data to file.
+        """
+        if self.headless:
+            self.runHeadless()
+            return
+
+        matplotlib.use('TkAgg')
+        fig, axs = plt.subplots(self.plotter.pages.rows, self.plotter.pages.cols, sharex=True, squeeze=False)
+
+        # axs is a 2d array. 1d lists are easier to iterate, so thats axs_flat.
+        axs_flat = list(axs.flat)
+
+        # arrow keys page through the assets, m changes the order.
+        fig.canvas.mpl_connect("key_press_event", self.plotter.pages.onKey)
+
+        # the plotter redraws only what changed, see utils/liveplot.py.
+        timer = fig.canvas.new_timer(interval=self.plotter.refreshRateMs)
+        timer.add_callback(lambda: self.plotter.updatePlotData(0, fig, axs_flat))
+        timer.start()
+        # plt.ion()
+        plt.show()
+
+        try:
+            # the logger thread keeps logging until Main exits.
+            while self.logger.is_alive():
+                self.logger.join(timeout=0.5)
+        except Exception as e:
+            print(e)
+
+    def runHeadless(self):
+        """
+        Logs (and saves snapshots, if enabled) until interrupted, or until the replay is done.
+        """
+        print("running headless, press ctrl+c to quit")
+        while self.logger.is_alive():
+            if self.replayer is not None and self.replayer.isDone():
+                break
+            self.logger.join(timeout=0.5)
+
+
+def addArguments(parser):
+    """
+    Adds the options of AssetPlotterMain to an argparse parser.
+    """
+    parser.add_argument("--headless", action="store_true", help="don't open a window, only log (and save snapshots)")
+    parser.add_argument("--snapshot", default=None, help="headless: file to save the plots to, e.g. plot.png or plot.svg")
+    parser.add_argument("--snapshotinterval", type=float, default=30, help="headless: seconds between snapshots")
+    parser.add_argument("--capture", default=None, help="record the uart messages to this capture file")
+    parser.add_argument("--replay", default=None, help="replay this capture file instead of connecting to a crownstone")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay: multiple of the recorded pace, 0 for maximum")
+
+
+def mainArguments(args):
+    """
+    Returns the keyword arguments of AssetPlotterMain for the options added by addArguments.
+    """
+    return dict(headless=args.headless, snapshotfilename=args.snapshot, snapshotinterval_seconds=args.snapshotinterval,
+                capturefilename=args.capture, replayfilename=args.replay, replayspeed=args.speed)
@@ -0,0 +1,174 @@
+"""
+Decodes uart packets off the uart thread.
+
+The UartEventBus handlers run on the thread that reads the serial port, so anything slow in them stalls the reader
+and lets the serial buffer overflow during bursts of reports. The DecodePool handler only copies the payload and
+its receive time into a bounded queue. Worker threads take batches from that queue, deserialize them and pass each
+packet to the consumers, in the order in which the packets were received:
+
+    pool = DecodePool({UartRxType.ASSET_MAC_RSSI_REPORT: AssetMacReport},
+                      [logger.putMessageOnQueue, plotter.putMessageOnQueue])
+    pool.start()
+    UartEventBus.subscribe(SystemTopics.uartNewMessage, lambda msg: pool.submit(msg.opCode, msg.payload))
+    ...
+    pool.stop()
+
+When the queue is full, new packets are dropped and counted instead of blocking the uart thread. When replaying a
+capture (see utils/uartcapture.py) nothing should be lost, so there blockWhenFull makes submit wait for room instead,
+and the packets should keep the time at which they were recorded, which is passed to submit as timestamp.
+"""
+import threading
+import time
+from collections import deque
+
+
+class DecodePool:
+    """
+    typemap: dict (opCode -> packet class), other opCodes are ignored.
+    consumers: list of callables taking (packet, timestamp), timestamp being the posix receive time.
+    """
+    def __init__(self, typemap, consumers, workers=2, maxQueueSize=10000, batchSize=256, blockWhenFull=False):
+        self.typemap = typemap
+        self.consumers = consumers
+        self.workercount = workers
+        self.batchSize = batchSize
+        self.maxQueueSize = maxQueueSize
+        self.blockWhenFull = blockWhenFull
+        # a deque rather than a queue.Queue: appending doesn't take a lock, which keeps submit cheap.
+        self.rawqueue = deque()
+        # set when a packet is queued while the workers may be waiting for one.
+        self.queued = threading.Event()
+
+        self.workers = []
+        self.isRunning = False
+
+        # batches are numbered when they are taken from the queue and delivered in that order.
+        self.takeLock = threading.Lock()
+        self.delivered = threading.Condition()
+        self.nextBatch = 0
+        self.nextDelivery = 0
+
+        # statistics
+        self.receivedCount = 0
+        self.droppedCount = 0
+        self.decodedCount = 0
+        self.decodeErrorCount = 0
+        self.consumerErrorCount = 0
+        self.maxQueueDepth = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def start(self):
+        self.isRunning = True
+        self.workers = [threading.Thread(target=self.work, name="DecodePool-{0}".format(i), daemon=True)
+                        for i in range(self.workercount)]
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self):
+        """
+        Decodes what is queued and stops the workers.
+        """
+        self.isRunning = False
+        self.queued.set()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    def submit(self, opCode, payload, timestamp=None):
+        """
+        Called on the uart thread: queues the payload if its opCode is in the typemap.
+        timestamp: posix receive time, now if None.
+        """
+        if opCode not in self.typemap:
+            return
+        self.receivedCount += 1
+        depth = len(self.rawqueue)
+        while depth >= self.maxQueueSize and self.blockWhenFull and self.isRunning:
+            time.sleep(0.001)
+            depth = len(self.rawqueue)
+        if depth >= self.maxQueueSize:
+            self.droppedCount += 1
+            return
+        self.rawqueue.append([time.time() if timestamp is None else timestamp, opCode, list(payload)])
+        if depth == 0:
+            self.queued.set()
+        if depth >= self.maxQueueDepth:
+            self.maxQueueDepth = depth + 1
+
+    @property
+    def queueDepth(self):
+        return len(self.rawqueue)
+
+    def takeBatch(self, timeout):
+        """
+        Returns [batch number, list of raw packets], the list is empty if nothing arrived within timeout.
+        """
+        with self.takeLock:
+            if not self.rawqueue:
+                self.queued.clear()
+                # a packet queued between the check and the clear would not wake us up.
+                if not self.rawqueue:
+                    self.queued.wait(timeout)
+            batch = []
+            while self.rawqueue and len(batch) < self.batchSize:
+                batch.append(self.rawqueue.popleft())
+            if not batch:
+                return None, []
+            number = self.nextBatch
+            self.nextBatch += 1
+            return number, batch
+
+    def decode(self, batch):
+        packets = []
+        for timestamp, opCode, payload in batch:
+            try:
+                packet = self.typemap[opCode]()
+                packet.deserialize(payload)
+                packets.append([packet, timestamp])
+            except Exception as e:
+                self.decodeErrorCount += 1
+                if self.decodeErrorCount == 1:
+                    # only the first one, the others are counted in status()
+                    print("couldn't decode packet with opCode {0}: {1}".format(opCode, e))
+        return packets
+
+    def work(self):
+        while self.isRunning or self.rawqueue:
+            number, batch = self.takeBatch(timeout=0.1)
+            if not batch:
+                continue
+            packets = self.decode(batch)
+
+            with self.delivered:
+                while self.nextDelivery != number:
+                    self.delivered.wait()
+                for packet, timestamp in packets:
+                    for consumer in self.consumers:
+                        self.consume(consumer, packet, timestamp)
+                self.decodedCount += len(packets)
+                self.nextDelivery += 1
+                self.delivered.notify_all()
+
+    def consume(self, consumer, packet, timestamp):
+        """
+        Passes the packet to the consumer. A consumer that raises doesn't stop the worker, the error is counted.
+        """
+        try:
+            consumer(packet, timestamp)
+        except Exception as e:
+            self.consumerErrorCount += 1
+            if self.consumerErrorCount == 1:
+                # only the first one, the others are counted in status()
+                print("consumer {0} failed on packet {1}: {2}".format(consumer, packet, e))
+
+    def status(self):
+        return "received {0}, decoded {1}, dropped {2}, decode errors {3}, consumer errors {4}, " \
+               "queue depth {5} (max {6})".format(
+            self.receivedCount, self.decodedCount, self.droppedCount, self.decodeErrorCount,
+            self.consumerErrorCount, self.queueDepth, self.maxQueueDepth)
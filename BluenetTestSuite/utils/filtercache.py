@@ -0,0 +1,175 @@
+"""
+On disk cache of serialized asset filters. Building an AssetFilter takes time quadratic in the number of assets
+(crownstone_core deduplicates them with a list scan), while its serialization only depends on the MAC list and
+the filter configuration: the filter type, what the assets are filtered by, the output type, what asset ids are
+based on and the profile id. The cache is keyed by a hash of those and returns the serialized bytes and crc
+without building:
+
+    cache = FilterCache()
+    trackingfilter = filterExactMacInForwarderMacOut(maclist, cache=cache)
+    trackingfilter.setFilterId(0)
+
+The returned CachedAssetFilter can be passed to filtercommands and FilterUploader like an AssetFilter.
+The least recently used entries are removed when the cache exceeds maxEntries. The key includes the cache format
+and the crownstone_core version, so a library upgrade that changes the serialization doesn't return stale filters.
+A file that can't be read or whose crc doesn't match its contents is treated as a miss and rebuilt.
+"""
+import hashlib
+import os
+import tempfile
+
+import crownstone_core
+from crownstone_core.util.CRC import crc32
+from crownstone_core.util.Conversion import Conversion
+
+# version of the cache file layout and of the key, part of the key.
+CACHE_FORMAT = 2
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bluenet-test-suite", "filters")
+
+
+class CachedAssetFilter:
+    """
+    A serialized asset filter. Implements the parts of AssetFilter that are needed to upload it.
+    """
+    def __init__(self, filterbytes, crc, filterId=None):
+        self.filterbytes = filterbytes
+        self.crc = crc
+        self.filterId = filterId
+
+    def getFilterId(self):
+        return self.filterId
+
+    def setFilterId(self, filterId):
+        self.filterId = filterId
+        return self
+
+    def getCrc(self):
+        return self.crc
+
+    def serialize(self):
+        return list(self.filterbytes)
+
+    def __str__(self):
+        return "CachedAssetFilter(filterId={0} size={1} crc={2})".format(self.filterId, len(self.filterbytes), self.crc)
+
+
+class FilterCache:
+    """
+    cachedir: directory that holds one file per filter: the crc (uint32) followed by the serialized filter.
+    maxEntries: number of filters to keep. The default is the number of filter ids.
+    """
+    def __init__(self, cachedir=DEFAULT_CACHE_DIR, maxEntries=256):
+        self.cachedir = cachedir
+        self.maxEntries = maxEntries
+        os.makedirs(self.cachedir, exist_ok=True)
+
+        # statistics
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def describe(inputdescription):
+        """
+        Returns an InputDescriptionPacket, or None, as a string: the hex of its serialization.
+        """
+        if inputdescription is None:
+            return "none"
+        return bytes(int(value) for value in inputdescription.serialize()).hex()
+
+    @staticmethod
+    def key(maclist, filtertype, inputdescription, outputtype, idsource, profileid):
+        """
+        Returns the hash of the filter contents and configuration, used as file name.
+
+        inputdescription: InputDescriptionPacket of what the assets are filtered by.
+        idsource: InputDescriptionPacket of what asset ids are based on, None if the output has no asset id.
+        """
+        digest = hashlib.sha256()
+        digest.update("{0}|{1}|".format(CACHE_FORMAT, crownstone_core.__version__).encode("ascii"))
+        digest.update("{0}|{1}|{2}|{3}|{4}|".format(
+            filtertype, FilterCache.describe(inputdescription), outputtype, FilterCache.describe(idsource),
+            profileid).encode("ascii"))
+        for mac in maclist:
+            digest.update(mac.lower().encode("ascii"))
+            digest.update(b",")
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cachedir, key + ".bin")
+
+    def get(self, maclist, filtertype, inputdescription, outputtype, idsource, profileid, build):
+        """
+        Returns a CachedAssetFilter for the given configuration, see key. On a miss, build() is called to construct
+        the AssetFilter and its serialization is stored.
+        """
+        path = self.path(FilterCache.key(maclist, filtertype, inputdescription, outputtype, idsource, profileid))
+        cached = self.read(path)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        assetfilter = build()
+        if assetfilter.getFilterId() is None:
+            # the serialization doesn't contain the filter id, but AssetFilter refuses to build without one.
+            assetfilter.setFilterId(0)
+        filterbytes = bytes(assetfilter.serialize())
+        crc = assetfilter.getCrc()
+
+        self.write(path, filterbytes, crc)
+        self.evict()
+
+        return CachedAssetFilter(filterbytes, crc)
+
+    def read(self, path):
+        """
+        Returns the CachedAssetFilter stored at path, or None if it is missing, can't be read or is corrupt.
+        """
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            # mark as recently used
+            os.utime(path)
+        except OSError:
+            return None
+        if len(data) < 4:
+            return None
+        crc = Conversion.uint8_array_to_uint32(list(data[0:4]))
+        filterbytes = data[4:]
+        if crc32(list(filterbytes)) != crc:
+            return None
+        return CachedAssetFilter(filterbytes, crc)
+
+    def write(self, path, filterbytes, crc):
+        """
+        Writes to a temporary file first which then replaces path, so that concurrent readers never see half
+        a filter. A failed write only means the filter isn't cached.
+        """
+        try:
+            descriptor, temppath = tempfile.mkstemp(dir=self.cachedir, suffix=".tmp")
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(bytes(Conversion.uint32_to_uint8_array(crc)))
+                file.write(filterbytes)
+            os.replace(temppath, path)
+        except OSError as e:
+            print("couldn't cache filter {0}: {1}".format(path, e))
+
+    def evict(self):
+        """
+        Removes the least recently used filters until there are at most maxEntries.
+        """
+        entries = [os.path.join(self.cachedir, name) for name in os.listdir(self.cachedir) if name.endswith(".bin")]
+        if len(entries) <= self.maxEntries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.maxEntries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.cachedir):
+            if name.endswith(".bin"):
+                os.remove(os.path.join(self.cachedir, name))
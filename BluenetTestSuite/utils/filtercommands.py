@@ -1,4 +1,5 @@
-import time
+import asyncio
+import threading
 
 from crownstone_core.packets.assetFilter.FilterCommandPackets import *
 from crownstone_core.packets.assetFilter.util.AssetFilterMasterCrc import get_master_crc_from_filters
@@ -7,20 +8,60 @@ from crownstone_core.util.CRC import crc32
 from crownstone_core.packets.assetFilter.util import *
 
 from BluenetTestSuite.firmwarecontrol.datatransport import sendCommandToCrownstone
+from BluenetTestSuite.utils.filterupload import FilterUploader, buildChunks
+
+
+def runBlocking(coroutine):
+    """
+    Runs coroutine to completion and returns its result. The commands below are blocking functions. When they are
+    called from a coroutine, asyncio.run can't be used in the running loop, so the coroutine then runs in a loop on
+    a separate thread while the calling loop waits. In a coroutine, prefer awaiting the FilterUploader directly.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    outcome = dict()
+    def run():
+        try:
+            outcome["result"] = asyncio.run(coroutine)
+        except BaseException as e:
+            outcome["exception"] = e
+    thread = threading.Thread(target=run, name="filtercommands")
+    thread.start()
+    thread.join()
+    if "exception" in outcome:
+        raise outcome["exception"]
+    return outcome["result"]
 
 
 def getStatus():
-    sendCommandToCrownstone(ControlType.ASSET_FILTER_GET_SUMMARIES, [])
+    """
+    Returns the FilterSummariesPacket of the firmware, or None if it didn't reply.
+    """
+    summaries = runBlocking(FilterUploader().getSummaries())
+    print(summaries)
+    return summaries
 
 
 def removeAllFilters():
-    for i in range(5):
-        remove(i)
-        time.sleep(0.5)
+    """
+    Removes the filters listed in the summaries of the firmware, or filters 0-4 if it didn't reply.
+    """
+    uploader = FilterUploader()
+
+    async def removeAll():
+        summaries = await uploader.getSummaries()
+        filterIds = range(5) if summaries is None else [summary.id for summary in summaries.summaries]
+        return await uploader.removeFilters(filterIds)
+
+    if not runBlocking(removeAll()):
+        print("failed to remove all filters")
 
     return 0x00000000
 
-def uploadFilters(trackingfilters):
+def uploadFilters(trackingfilters, window=4):
     """
     trackingFilter: List[AssetFilter]
 
@@ -33,51 +74,73 @@ def uploadFilters(trackingfilters):
     trackingfilters.append(filterExactMacOut())
     trackingfilters.append(filterExactMacInShortIdOut())
     trackingfilters.append(filterExactExclude())
+
+    window: number of chunks in flight, see FilterUploader.
+
+    As before, the filter at index i is uploaded as filter id i. The master crc is computed from the filter ids of
+    the filters, so those should equal their index (the plotters set them so).
     """
     # generate filterIds
     masterCrc = get_master_crc_from_filters(trackingfilters)
 
-    for i, f in enumerate(trackingfilters):
-        print(F"------------- upload filter {i} ---------------");
-        upload(f, filterId=i, max_chunk_size=100)
-        time.sleep(2)
-
-    print("------------- get summaries ---------------");
-    getStatus()
-    time.sleep(2)
+    print(F"------------- upload {len(trackingfilters)} filters ---------------");
+    uploader = FilterUploader(window=window, max_chunk_size=100)
+    if not runBlocking(uploader.uploadFilters(trackingfilters, filterIds=range(len(trackingfilters)))):
+        print("upload failed: {0} of {1} chunks weren't accepted".format(uploader.failedChunkCount, uploader.chunkCount))
+    print("uploaded {0} chunks, {1} retransmissions".format(uploader.chunkCount, uploader.retransmissionCount))
 
     return masterCrc
 
-def finalizeFilterUpload(masterCrc, version=1):
+def finalizeFilterUpload(masterCrc, version=1, trackingfilters=None):
+    """
+    Commits the uploaded filters and verifies the result with the filter summaries: the master crc and,
+    if trackingfilters is given, the crc of each filter.
+    Returns True if the firmware state matches.
+    """
     print("------------- commit upload ---------------");
-    commit(crc=masterCrc, version=version)
-    time.sleep(2)
-    print("------------- get summaries ---------------");
-    getStatus()
+    uploader = FilterUploader()
+
+    async def commitAndVerify():
+        if not await uploader.commit(masterCrc, version):
+            print("commit failed")
+            return False
+        summaries = await uploader.getSummaries()
+        print(summaries)
+        if summaries is None or summaries.masterCrc != masterCrc or summaries.masterVersion != version:
+            print("filter summaries don't match the commit")
+            return False
+        mismatches = [] if trackingfilters is None else await uploader.verify(trackingfilters, summaries)
+        if mismatches:
+            print("filter crc mismatch for filter ids: {0}".format(mismatches))
+            return False
+        return True
+
+    return runBlocking(commitAndVerify())
+
+def syncFilters(trackingfilters, version=None, window=4):
+    """
+    Only uploads, removes and commits the filters that differ from those on the firmware, see FilterUploader.sync.
+    version: the master version to commit, the version on the firmware + 1 if None.
+    Returns True if the firmware has trackingfilters afterwards.
+    """
+    print("------------- sync filters ---------------");
+    uploader = FilterUploader(window=window, max_chunk_size=100)
+    synced = runBlocking(uploader.sync(trackingfilters, version))
+    print("uploaded filters: {0}, removed filters: {1}, {2}".format(
+        uploader.uploadedIds, uploader.removedIds, "in sync" if synced else "sync failed"))
+    return synced
 
 
 # ----------------------- lower level commands -----------------------
 
-def upload(trackingfilter, filterId, max_chunk_size):
+def upload(trackingfilter, filterId, max_chunk_size, window=4):
     print(" ** starting upload **")
     filter_bytes = trackingfilter.serialize()
     print("filter bytes: ", filter_bytes)
     data_len = len(filter_bytes)
     print("total filter bytes:", data_len, " filter crc: ", hex(crc32(filter_bytes)), " fitlerid: " , filterId)
-    for start_index in range(0, data_len, max_chunk_size):
-        end_index = min(start_index + max_chunk_size, data_len)
-        print(" -------- Send packet chunk (EVENT) -------- ", start_index,"-", end_index)
-
-        upload_packet = UploadFilterChunkPacket(
-            filterId=filterId,
-            totalSize=data_len,
-            chunkSize=end_index-start_index,
-            chunkStartIndex=start_index,
-            chunk=filter_bytes[start_index : end_index]
-        )
-
-        sendCommandToCrownstone(ControlType.ASSET_FILTER_UPLOAD, upload_packet.serialize())
-        time.sleep(0.5)
+    uploader = FilterUploader(window=window, max_chunk_size=max_chunk_size)
+    return runBlocking(uploader.uploadChunks(buildChunks(filter_bytes, filterId, max_chunk_size)))
 
 
 def remove(filterId):
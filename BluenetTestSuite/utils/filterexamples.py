@@ -8,6 +8,7 @@ from crownstone_core.util.Cuckoofilter import CuckooFilter
 from crownstone_core.packets.assetFilter.builders.AssetFilter import AssetFilter, OptimizeOutputStrategy
 from crownstone_core.packets.assetFilter.FilterMetaDataPackets import FilterMetaData, FilterType
 from crownstone_core.packets.assetFilter.builders.AssetIdSourceBuilder import AssetIdSourceBuilder
+from crownstone_core.packets.assetFilter.FilterOutputPackets import FilterOutputDescriptionType
 
 
 #
@@ -131,7 +132,7 @@ def cuckooAlex():
 
 # ----------------- exact match filter ----------------------
 
-def filterExactMacInForwarderMacOut(maclist):
+def filterExactMacInForwarderMacOut(maclist, cache=None):
     """
     Returns an AssetFilter for exact matching of the given list of mac addresses.
 
@@ -139,17 +140,26 @@ def filterExactMacInForwarderMacOut(maclist):
 
     maclist: a list of strings ['60:c0:bf:28:0d:ae'] in human read mac addres.
     Items will be reversed.
+
+    cache: if not None, a FilterCache (utils/filtercache.py) to take the serialized filter from. A CachedAssetFilter
+    is returned in that case.
     """
-    af = AssetFilter()
-    af.setProfileId(0)
-    af.setFilterType(FilterType.EXACT_MATCH)
-    af.filterByMacAddress(maclist)
+    def build():
+        af = AssetFilter()
+        af.setProfileId(0)
+        af.setFilterType(FilterType.EXACT_MATCH)
+        af.filterByMacAddress(maclist)
+
+        af.outputMacRssiReport()
 
-    af.outputMacRssiReport()
+        return af
 
-    return af
+    if cache is None:
+        return build()
+    return cache.get(maclist, FilterType.EXACT_MATCH, InputDescriptionMacAddress(),
+                     FilterOutputDescriptionType.MAC_ADDRESS, None, 0, build)
 
-def filterExactMacInNearestShortIdOut(maclist):
+def filterExactMacInNearestShortIdOut(maclist, cache=None):
     """
     Returns an AssetFilter for exact matching of the given list of mac addresses.
 
@@ -157,16 +167,25 @@ def filterExactMacInNearestShortIdOut(maclist):
 
     maclist: a list of strings ['60:c0:bf:28:0d:ae'] in human read mac addres.
     Items will be reversed.
+
+    cache: if not None, a FilterCache (utils/filtercache.py) to take the serialized filter from. A CachedAssetFilter
+    is returned in that case.
     """
-    af = AssetFilter()
-    af.setProfileId(0)
-    af.setFilterType(FilterType.EXACT_MATCH)
-    af.filterByMacAddress(maclist)
-    af.outputAssetId(optimizeStrategy=OptimizeOutputStrategy.NEAREST).basedOnMac() # is this configured correctly now?
+    def build():
+        af = AssetFilter()
+        af.setProfileId(0)
+        af.setFilterType(FilterType.EXACT_MATCH)
+        af.filterByMacAddress(maclist)
+        af.outputAssetId(optimizeStrategy=OptimizeOutputStrategy.NEAREST).basedOnMac() # is this configured correctly now?
+
+        return af
 
-    return af
+    if cache is None:
+        return build()
+    return cache.get(maclist, FilterType.EXACT_MATCH, InputDescriptionMacAddress(),
+                     FilterOutputDescriptionType.ASSET_ID_NEAREST_CROWNSTONE, InputDescriptionMacAddress(), 0, build)
 
-def filterExactMacInForwarderOutputNone(maclist):
+def filterExactMacInForwarderOutputNone(maclist, cache=None):
     """
     Returns an AssetFilter for exact matching of the given list of mac addresses.
 
@@ -174,18 +193,27 @@ def filterExactMacInForwarderOutputNone(maclist):
 
     maclist: a list of strings ['60:c0:bf:28:0d:ae'] in human read mac addres.
     Items will be reversed.
+
+    cache: if not None, a FilterCache (utils/filtercache.py) to take the serialized filter from. A CachedAssetFilter
+    is returned in that case.
     """
-    af = AssetFilter()
-    af.setProfileId(0)
-    af.setFilterType(FilterType.EXACT_MATCH)
-    af.filterByMacAddress(maclist)
+    def build():
+        af = AssetFilter()
+        af.setProfileId(0)
+        af.setFilterType(FilterType.EXACT_MATCH)
+        af.filterByMacAddress(maclist)
+
+        af.outputNone()
 
-    af.outputNone()
+        return af
 
-    return af
+    if cache is None:
+        return build()
+    return cache.get(maclist, FilterType.EXACT_MATCH, InputDescriptionMacAddress(),
+                     FilterOutputDescriptionType.NONE, None, 0, build)
 
 
-def filterExactMacInForwarderShortIdOut(maclist):
+def filterExactMacInForwarderShortIdOut(maclist, cache=None):
     """
     Returns an AssetFilter for exact matching of the given list of mac addresses.
 
@@ -193,14 +221,23 @@ def filterExactMacInForwarderShortIdOut(maclist):
 
     maclist: a list of strings ['60:c0:bf:28:0d:ae'] in human read mac addres.
     Items will be reversed.
-    """
-    af = AssetFilter()
-    af.setProfileId(0)
-    af.setFilterType(FilterType.EXACT_MATCH)
-    af.filterByMacAddress(maclist)
-    af.outputAssetId().basedOnMac()
 
-    return af
+    cache: if not None, a FilterCache (utils/filtercache.py) to take the serialized filter from. A CachedAssetFilter
+    is returned in that case.
+    """
+    def build():
+        af = AssetFilter()
+        af.setProfileId(0)
+        af.setFilterType(FilterType.EXACT_MATCH)
+        af.filterByMacAddress(maclist)
+        af.outputAssetId().basedOnMac()
+
+        return af
+
+    if cache is None:
+        return build()
+    return cache.get(maclist, FilterType.EXACT_MATCH, InputDescriptionMacAddress(),
+                     FilterOutputDescriptionType.ASSET_ID, InputDescriptionMacAddress(), 0, build)
 
 
 # def filterBlyott():
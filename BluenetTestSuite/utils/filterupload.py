@@ -0,0 +1,226 @@
+"""
+Pipelined asset filter upload: keeps a window of chunks in flight instead of waiting for each chunk, and
+retransmits the chunks that the firmware didn't accept. The result is verified with the filter summaries.
+
+    uploader = FilterUploader(window=4)
+    ok = await uploader.uploadFilters(trackingfilters)
+    await uploader.commit(get_master_crc_from_filters(trackingfilters), version=1)
+    mismatches = await uploader.verify(trackingfilters)
+
+Or let the uploader work out what differs from the filters on the firmware, and only upload, remove and commit that:
+
+    ok = await uploader.sync(trackingfilters)
+
+The ASSET_FILTER_UPLOAD result packets don't identify the chunk they belong to. They are matched to the chunks
+in the order they were sent (see asynctransport). A chunk that times out stays queued on the transport as
+expired, so that its reply is dropped if it still arrives, and it is removed lateReplyTimeout seconds later.
+When a chunk times out, the uploader therefore drains before retrying: it sends no new chunks until the chunks in
+flight have their result (or timed out too) and the expired ones are removed, so that the chunks sent afterwards
+are matched to their own replies again. The results of the chunks that were in flight when a reply got lost
+may still belong to their neighbours, which is why the final state is verified by crc rather than trusted from
+the individual replies.
+"""
+import asyncio
+
+from crownstone_core.packets.assetFilter.FilterCommandPackets import UploadFilterChunkPacket, RemoveFilterPacket, \
+    CommitFilterChangesPacket, FilterSummariesPacket
+from crownstone_core.packets.assetFilter.util.AssetFilterMasterCrc import get_master_crc_from_filters
+from crownstone_core.packets.assetFilter.util.AssetFilterSyncer import AssetFilterSyncer
+from crownstone_core.protocol.BluenetTypes import ControlType, ResultValue
+
+from BluenetTestSuite.firmwarecontrol.asynctransport import getAsyncDataTransport
+
+
+def buildChunks(filterbytes, filterId, max_chunk_size):
+    """
+    Returns the serialized UploadFilterChunkPackets of a serialized filter.
+    """
+    data_len = len(filterbytes)
+    chunks = []
+    for start_index in range(0, data_len, max_chunk_size):
+        end_index = min(start_index + max_chunk_size, data_len)
+        chunks.append(UploadFilterChunkPacket(
+            filterId=filterId,
+            totalSize=data_len,
+            chunkSize=end_index - start_index,
+            chunkStartIndex=start_index,
+            chunk=filterbytes[start_index:end_index]
+        ).serialize())
+    return chunks
+
+
+class FilterUploader:
+    """
+    window: maximum number of chunks awaiting a result packet.
+    max_chunk_size: maximum number of filter bytes per chunk.
+    retries: number of times a chunk is retransmitted after a failure result or a timeout.
+    timeout: seconds to wait for a result packet, datatransport.uartCommandTimeout if None.
+    """
+    def __init__(self, window=4, max_chunk_size=100, retries=5, timeout=None, transport=None):
+        self.window = window
+        self.max_chunk_size = max_chunk_size
+        self.retries = retries
+        self.timeout = timeout
+        self.transport = getAsyncDataTransport() if transport is None else transport
+
+        # statistics of the last uploadFilters call
+        self.chunkCount = 0
+        self.retransmissionCount = 0
+        self.failedChunkCount = 0
+        self.drainCount = 0
+
+        # chunks awaiting their result, and the number of timed out chunks waiting for those, see drain.
+        self.inFlight = 0
+        self.draining = 0
+        self.condition = None
+
+        # filter ids uploaded and removed by the last sync call
+        self.uploadedIds = []
+        self.removedIds = []
+
+    async def send(self, chunk):
+        """
+        Sends chunk once, when no timed out chunk is draining. Returns the result packet, or None on timeout.
+        """
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.draining == 0)
+            self.inFlight += 1
+        try:
+            return await self.transport.send_command(ControlType.ASSET_FILTER_UPLOAD, chunk, self.timeout)
+        finally:
+            async with self.condition:
+                self.inFlight -= 1
+                self.condition.notify_all()
+
+    async def drain(self):
+        """
+        Stops sending chunks until all chunks in flight have their result or timed out, and the transport has
+        removed those that timed out.
+        """
+        self.drainCount += 1
+        async with self.condition:
+            self.draining += 1
+            await self.condition.wait_for(lambda: self.inFlight == 0)
+        try:
+            await self.transport.drain(ControlType.ASSET_FILTER_UPLOAD)
+        finally:
+            async with self.condition:
+                self.draining -= 1
+                self.condition.notify_all()
+
+    async def sendChunk(self, chunk):
+        """
+        Sends chunk until the firmware accepts it, at most retries + 1 times. Returns True on success.
+        """
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                self.retransmissionCount += 1
+            result = await self.send(chunk)
+            if result is None:
+                await self.drain()
+            elif result.resultCode == ResultValue.SUCCESS:
+                return True
+        self.failedChunkCount += 1
+        return False
+
+    async def uploadChunks(self, chunks):
+        window = asyncio.Semaphore(self.window)
+        self.condition = asyncio.Condition()
+
+        async def send(chunk):
+            async with window:
+                return await self.sendChunk(chunk)
+
+        self.chunkCount += len(chunks)
+        return all(await asyncio.gather(*[send(chunk) for chunk in chunks]))
+
+    async def uploadFilters(self, trackingfilters, filterIds=None):
+        """
+        Uploads the filters, using their filter ids or, if given, filterIds. The chunks of all filters share
+        the window. Returns True if all chunks were accepted.
+        """
+        self.chunkCount = 0
+        self.retransmissionCount = 0
+        self.failedChunkCount = 0
+        self.drainCount = 0
+        if filterIds is None:
+            filterIds = [trackingfilter.getFilterId() for trackingfilter in trackingfilters]
+        chunks = []
+        for trackingfilter, filterId in zip(trackingfilters, filterIds):
+            chunks += buildChunks(trackingfilter.serialize(), filterId, self.max_chunk_size)
+        return await self.uploadChunks(chunks)
+
+    async def removeFilters(self, filterIds):
+        """
+        Returns True if all filters were removed (or didn't exist).
+        """
+        results = await asyncio.gather(*[
+            self.transport.send_command(ControlType.ASSET_FILTER_REMOVE, RemoveFilterPacket(filterId).serialize(),
+                                        self.timeout)
+            for filterId in filterIds])
+        return all(result is not None and result.resultCode in [ResultValue.SUCCESS, ResultValue.SUCCESS_NO_CHANGE]
+                   for result in results)
+
+    async def commit(self, masterCrc, version):
+        """
+        Returns True if the firmware accepted the commit.
+        """
+        commitCommand = CommitFilterChangesPacket(masterCrc=masterCrc, masterVersion=version)
+        result = await self.transport.send_command(ControlType.ASSET_FILTER_COMMIT_CHANGES, commitCommand.serialize(),
+                                                   self.timeout)
+        return result is not None and result.resultCode == ResultValue.SUCCESS
+
+    async def getSummaries(self):
+        """
+        Returns the FilterSummariesPacket of the firmware, or None if it didn't reply.
+        """
+        result = await self.transport.send_command(ControlType.ASSET_FILTER_GET_SUMMARIES, [], self.timeout)
+        if result is None or result.resultCode != ResultValue.SUCCESS:
+            return None
+        return FilterSummariesPacket(result.payload)
+
+    async def verify(self, trackingfilters, summaries=None):
+        """
+        Compares the filter crcs in the summaries of the firmware with those of trackingfilters.
+        Returns the ids of the filters that are missing or differ, or None if there are no summaries.
+        """
+        summaries = await self.getSummaries() if summaries is None else summaries
+        if summaries is None:
+            return None
+        crcs = {summary.id: summary.crc for summary in summaries.summaries}
+        return [f.getFilterId() for f in trackingfilters if crcs.get(f.getFilterId()) != f.getCrc()]
+
+    async def sync(self, trackingfilters, masterVersion=None):
+        """
+        Makes the filters on the firmware equal to trackingfilters: compares their crcs with the filter summaries,
+        then removes the filters that aren't in trackingfilters, uploads those that are missing or differ and
+        commits. Nothing is sent when the filters and master crc already match.
+
+        masterVersion: version to commit, the version on the firmware + 1 if None.
+        Returns True if the firmware has the filters afterwards.
+        """
+        self.uploadedIds = []
+        self.removedIds = []
+        summaries = await self.getSummaries()
+        if summaries is None:
+            return False
+
+        syncer = AssetFilterSyncer(summaries, trackingfilters, masterVersion)
+        if not syncer.commitRequired:
+            return True
+
+        # filters that differ are replaced: the firmware doesn't accept uploads to an existing filter.
+        onfirmware = set(summary.id for summary in summaries.summaries)
+        self.removedIds = syncer.removeIds + [filterId for filterId in syncer.uploadIds if filterId in onfirmware]
+        self.uploadedIds = syncer.uploadIds
+        if not await self.removeFilters(self.removedIds):
+            return False
+        if not await self.uploadFilters([f for f in trackingfilters if f.getFilterId() in self.uploadedIds]):
+            return False
+
+        masterCrc = get_master_crc_from_filters(trackingfilters)
+        if not await self.commit(masterCrc, syncer.masterVersion):
+            return False
+        summaries = await self.getSummaries()
+        return summaries is not None and summaries.masterCrc == masterCrc \
+               and not await self.verify(trackingfilters, summaries)
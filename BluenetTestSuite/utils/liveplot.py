@@ -0,0 +1,306 @@
+"""
+Incremental rendering of the rolling rssi plots.
+
+A LivePlot formats its axes once and creates one line artist per stream, which is updated with set_data on each
+frame. The lines are downsampled to the pixel width of the axes, and further when the lines of an axes together
+would have more than maxPoints points, so that the cost of a frame doesn't grow with the number of lines. Markers
+are only drawn while the axes has at most maxMarkers of them, above that the lines are drawn without. The
+BlitRenderer only redraws the full figure (axes, ticks, legend) when it changes: when a LivePlot gets a new line or
+its time axis moves. Otherwise it restores the cached background and draws only the lines on top of it.
+
+The time axis moves in steps: it shows the time window plus a margin, and jumps forward when the current time
+passes its right edge.
+
+    liveplots = [LivePlot(ax, datetime.timedelta(minutes=3)) for ax in axs_flat]
+    renderer = BlitRenderer(fig, liveplots)
+
+    # each frame:
+    liveplot.setTimeWindow(datetime.datetime.now())
+    liveplot.setStream(key, stream, label="cs #1")
+    renderer.render()
+
+setStream only expands the samples of an RssiStream or NearestStream that are in the time window, and takes their
+times as seconds rather than as datetimes that are converted back to numbers.
+"""
+import datetime
+
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.collections import LineCollection
+
+from BluenetTestSuite.utils.rssistream import EPOCH
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def toDateNums(times):
+    """
+    Converts datetimes or datetime64s to matplotlib date numbers. Float arrays are taken to be date numbers already.
+    """
+    times = np.asarray(times)
+    if np.issubdtype(times.dtype, np.floating):
+        return times
+    return mdates.date2num(times)
+
+
+def secondsToDateNums(seconds):
+    """
+    Converts seconds as stored by the rssi streams (see rssistream.toSeconds) to matplotlib date numbers.
+    """
+    return seconds / SECONDS_PER_DAY + mdates.date2num(EPOCH)
+
+
+def downsample(x, y, xlim, width):
+    """
+    Returns the points of the (x-sorted) line x, y that lie between xlim, plus one on each side. If there are more
+    than 2 points per pixel column, each column is reduced to its minimum and maximum, which covers the same pixels
+    in that column.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if xlim is None or len(x) == 0:
+        return x, y
+
+    start = max(np.searchsorted(x, xlim[0], side="left") - 1, 0)
+    end = np.searchsorted(x, xlim[1], side="right") + 1
+    x = x[start:end]
+    y = y[start:end]
+
+    columns = max(int(width), 1)
+    if len(x) <= 2 * columns:
+        return x, y
+
+    column = ((x - xlim[0]) * (columns / (xlim[1] - xlim[0]))).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, column[1:] != column[:-1]])
+    ends = np.r_[starts[1:], len(x)] - 1
+    xs = np.stack([x[starts], x[ends]], axis=1).ravel()
+    ys = np.stack([np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)], axis=1).ravel()
+    return xs, ys
+
+
+class LivePlot:
+    """
+    ax: the subplot to draw in.
+    timewindow: datetime.timedelta, the amount of time that is shown.
+    margin: part of the time window that is added to the right of the current time, the axis jumps when it's used up.
+    maxPoints: number of points drawn for all lines together, which each get an equal share.
+    maxMarkers: number of markers drawn for all lines together. A line only gets its markers if all lines with as
+        many points would stay within it.
+    """
+    def __init__(self, ax, timewindow, ylim=(-80, -10), title="", xticks=8, margin=0.1, maxLabels=50,
+                 maxPoints=5000, maxMarkers=1000):
+        self.ax = ax
+        self.timewindow = timewindow
+        self.ylim = ylim
+        self.margin = margin
+        self.maxLabels = maxLabels
+        self.maxPoints = maxPoints
+        self.maxMarkers = maxMarkers
+
+        # key -> Line2D
+        self.lines = dict()
+        # key -> marker of the line style, drawn while the line is sparse enough.
+        self.markers = dict()
+        # key -> [LineCollection, list of Text]
+        self.transitions = dict()
+        # (left, right) of the time axis, as matplotlib date numbers.
+        self.xlim = None
+        # True when the axes need a full redraw.
+        self.dirty = True
+
+        myFmt = mdates.DateFormatter('%H:%M:%S')
+        ax.set_title(title)
+        ax.set_xlabel("time (H:M:S)")
+        ax.xaxis.set_major_formatter(myFmt)  # formats the x-axis ticks
+        ax.format_xdata = myFmt  # formats the on-hover message box
+        ax.xaxis.set_major_locator(plt.MaxNLocator(xticks))  # reduce number of ticks on x-axis
+        ax.set_ylabel("rssi(dB)")
+        ax.set_ylim(*ylim)
+
+    def setTitle(self, title):
+        if self.ax.get_title() != title:
+            self.ax.set_title(title)
+            self.dirty = True
+
+    def visibleSeconds(self):
+        """
+        Returns (left, right) of the time axis in seconds, see rssistream.toSeconds. None until setTimeWindow.
+        """
+        if self.xlim is None:
+            return None
+        epoch = mdates.date2num(EPOCH)
+        return tuple((x - epoch) * SECONDS_PER_DAY for x in self.xlim)
+
+    def setTimeWindow(self, now):
+        """
+        Moves the time axis forward if now is past its right edge.
+        """
+        right = mdates.date2num(now)
+        if self.xlim is None or right > self.xlim[1]:
+            width = self.timewindow / datetime.timedelta(days=1)
+            self.xlim = (right - width, right + width * self.margin)
+            self.ax.set_xlim(*self.xlim)
+            self.dirty = True
+
+    def line(self, key, **style):
+        """
+        Returns the line artist for key, creating it with the given style if it doesn't exist yet.
+        """
+        line = self.lines.get(key)
+        if line is None:
+            line, = self.ax.plot([], [], animated=True, **style)
+            self.lines[key] = line
+            self.markers[key] = line.get_marker()
+            self.dirty = True
+        return line
+
+    def setStream(self, key, stream, **style):
+        """
+        Sets the data of the line for key to the visible part of stream, an RssiStream or NearestStream.
+        Returns what stream.render returns, with the times as date numbers: (times, rssis) or
+        (times, rssis, receivers).
+        """
+        rendered = stream.render(self.visibleSeconds())
+        times = secondsToDateNums(rendered[0])
+        self.setLine(key, times, rendered[1], **style)
+        return (times,) + tuple(rendered[1:])
+
+    def setLine(self, key, times, values, **style):
+        """
+        Sets the data of the line for key. times: datetimes, datetime64s or date numbers.
+        """
+        line = self.line(key, **style)
+        # downsample returns at most 2 points per column.
+        columns = min(self.ax.bbox.width, self.maxPoints / (2 * len(self.lines)))
+        x, y = downsample(toDateNums(times), values, self.xlim, columns)
+        line.set_data(x, y)
+
+        marker = self.markers[key] if len(x) * len(self.lines) <= self.maxMarkers else 'None'
+        if line.get_marker() != marker:
+            line.set_marker(marker)
+
+    def setTransitions(self, key, times, labels, color='gray'):
+        """
+        Draws dashed vertical lines at times with the given text labels at the bottom. Only the labels of the
+        last maxLabels visible transitions are drawn. times: datetimes, datetime64s or date numbers.
+        """
+        if key not in self.transitions:
+            collection = LineCollection([], colors=color, linestyles='--', animated=True)
+            self.ax.add_collection(collection)
+            self.transitions[key] = [collection, []]
+        collection, texts = self.transitions[key]
+
+        x = np.asarray(toDateNums(times), dtype=np.float64)
+        labels = np.asarray(labels, dtype=object)
+        if self.xlim is not None:
+            visible = (x >= self.xlim[0]) & (x <= self.xlim[1])
+            x = x[visible]
+            labels = labels[visible]
+        bottom, top = self.ylim
+        collection.set_segments([[(t, bottom), (t, top)] for t in x])
+
+        x = x[-self.maxLabels:]
+        labels = labels[-self.maxLabels:]
+        while len(texts) < len(x):
+            texts.append(self.ax.text(0, bottom, "", size=10, color=color, animated=True))
+        for i, text in enumerate(texts):
+            text.set_visible(i < len(x))
+            if i < len(x):
+                text.set_position((x[i], bottom))
+                text.set_text(F"#{labels[i]}")
+
+    def clear(self):
+        """
+        Removes all lines and transitions, e.g. when the subplot starts to show another asset.
+        """
+        for line in self.lines.values():
+            line.remove()
+        for collection, texts in self.transitions.values():
+            collection.remove()
+            for text in texts:
+                text.remove()
+        self.lines = dict()
+        self.markers = dict()
+        self.transitions = dict()
+        if self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+        # new lines start at the first color again.
+        self.ax.set_prop_cycle(None)
+        self.dirty = True
+
+    def updateLegend(self):
+        if self.lines:
+            self.ax.legend(handles=list(self.lines.values()))
+
+    def artists(self):
+        artists = list(self.lines.values())
+        for collection, texts in self.transitions.values():
+            artists.append(collection)
+            artists += [text for text in texts if text.get_visible()]
+        return artists
+
+
+class BlitRenderer:
+    """
+    Draws the LivePlots of a figure. Call render after updating them.
+    """
+    def __init__(self, fig, liveplots):
+        self.fig = fig
+        self.liveplots = liveplots
+        self.background = None
+        # the figure is also redrawn by matplotlib itself, e.g. when the window is resized.
+        self.drawSubscription = fig.canvas.mpl_connect("draw_event", self.onDraw)
+
+        # statistics
+        self.fullDrawCount = 0
+        self.blitCount = 0
+
+    def onDraw(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.drawArtists()
+
+    def invalidate(self):
+        """
+        Makes the next render draw the full figure, e.g. after changing something outside of the LivePlots.
+        """
+        self.background = None
+
+    def drawArtists(self):
+        for liveplot in self.liveplots:
+            for artist in liveplot.artists():
+                liveplot.ax.draw_artist(artist)
+
+    def render(self):
+        canvas = self.fig.canvas
+        if self.background is None or any(liveplot.dirty for liveplot in self.liveplots):
+            for liveplot in self.liveplots:
+                if liveplot.dirty:
+                    liveplot.updateLegend()
+                    liveplot.dirty = False
+            # draws the background and calls onDraw.
+            canvas.draw()
+            self.fullDrawCount += 1
+        else:
+            canvas.restore_region(self.background)
+            self.drawArtists()
+            canvas.blit(self.fig.bbox)
+            self.blitCount += 1
+        canvas.flush_events()
+
+    def save(self, filename, **kwargs):
+        """
+        Saves the figure with the lines, which savefig leaves out because they are animated.
+        """
+        artists = [artist for liveplot in self.liveplots for artist in liveplot.artists()]
+        for artist in artists:
+            artist.set_animated(False)
+        # the draw of savefig must not become the background, and may be on a canvas that can't be blitted (svg).
+        self.fig.canvas.mpl_disconnect(self.drawSubscription)
+        try:
+            self.fig.savefig(filename, **kwargs)
+        finally:
+            for artist in artists:
+                artist.set_animated(True)
+            self.drawSubscription = self.fig.canvas.mpl_connect("draw_event", self.onDraw)
+            self.invalidate()
@@ -0,0 +1,283 @@
+"""
+Online validation of the nearest crownstone algorithm, as described in testscripts/nearestcrownstoneplotter.py.
+
+The validator keeps, per asset, the latest rssi of each Crownstone that hears it (AssetMacReport) and which of them
+is the nearest according to that data. Each Nearest Crownstone Update (AssetIdReport) is checked against it:
+
+- match: the reported Crownstone is the expected one, or its rssi is within margin of the expected one.
+- accommodating: it isn't, but the expected Crownstone changed less than accommodationTime ago.
+- mismatch: otherwise.
+
+When the expected Crownstone changes, the switch latency is the time until an update reports the new one.
+Nearest Crownstone TimeOut messages have no packet type in crownstone_uart, so they aren't validated.
+
+The AssetMacReports identify assets by MAC and the AssetIdReports by short asset id, see assetIdFromMac. If none
+of the first idCheckUpdates updates (after rssi data arrived) maps to an asset that has rssi data, the ids are likely derived differently
+by the firmware, and a warning is printed.
+
+Each report updates only the state of its own asset: the expected Crownstone is a running argmax that is only
+recomputed over the Crownstones of that asset when the current maximum drops or goes stale.
+"""
+import datetime
+from collections import deque
+from functools import singledispatchmethod
+
+from crownstone_core.util.CRC import crc32
+from crownstone_core.util.Conversion import Conversion
+from crownstone_uart.core.uart.uartPackets.AssetIdReport import AssetIdReport
+from crownstone_uart.core.uart.uartPackets.AssetMacReport import AssetMacReport
+
+from BluenetTestSuite.utils.rollingfilter import ExponentialMovingAverage
+
+
+def assetIdFromMac(mac):
+    """
+    Returns the short asset id of a MAC address, as in the AssetIdReports of a filter that outputs an asset id
+    based on the MAC: the lower 3 bytes of the crc32 of the MAC as it is advertised (reversed byte order).
+    """
+    return crc32(list(Conversion.address_to_uint8_array(mac))) & 0xFFFFFF
+
+
+class RunningStatistic:
+    """
+    Count, mean and maximum of all values, median and 95th percentile of the last `recent` values.
+    """
+    def __init__(self, recent=1000):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = None
+        self.recent = deque(maxlen=recent)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        self.recent.append(value)
+
+    def percentile(self, fraction):
+        ordered = sorted(self.recent)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def __str__(self):
+        if self.count == 0:
+            return "n=0"
+        return "n={0} mean={1:.3f} p50={2:.3f} p95={3:.3f} max={4:.3f}".format(
+            self.count, self.total / self.count, self.percentile(0.5), self.percentile(0.95), self.maximum)
+
+
+class AssetState:
+    def __init__(self):
+        # rssis: dict (crownstoneId -> [rssi, posix time])
+        self.rssis = dict()
+        # filters: dict (crownstoneId -> ExponentialMovingAverage), if smoothing is enabled.
+        self.filters = dict()
+        self.lastRssiTime = None
+
+        # the nearest crownstone according to the rssi data, and since when.
+        self.expected = None
+        self.expectedSince = None
+        # True when expected changed and hasn't been reported yet.
+        self.switchPending = False
+
+        self.reported = None
+
+
+class ValidationEvent:
+    """
+    kind: "mismatch" or "switch".
+    """
+    def __init__(self, kind, assetId, timestamp, expected, reported=None, value=None):
+        self.kind = kind
+        self.assetId = assetId
+        self.timestamp = timestamp
+        self.expected = expected
+        self.reported = reported
+        self.value = value
+
+    def __str__(self):
+        return "{0} {1} asset {2:06x}: expected #{3} reported #{4} {5}".format(
+            datetime.datetime.fromtimestamp(self.timestamp).strftime("%H:%M:%S.%f"), self.kind, self.assetId,
+            self.expected, self.reported, "" if self.value is None else "({0:.3f})".format(self.value))
+
+
+class NearestCrownstoneValidator:
+    """
+    margin: dB within which a Crownstone is as near as the expected one. Also the hysteresis with which
+        the expected Crownstone changes.
+    accommodationTime: seconds the firmware may take to follow a change of the expected Crownstone.
+    staleAfter: seconds after which the rssi of a Crownstone isn't taken into account anymore.
+    smoothing: weight of a new rssi in the exponential moving average per Crownstone, None to use the raw rssi.
+    reportInterval: seconds between printed status lines, 0 to not print them.
+    idCheckUpdates: number of updates after which the asset id mapping is checked, see the module docstring.
+    """
+    def __init__(self, margin=3.0, accommodationTime=2.0, staleAfter=5.0, smoothing=None, reportInterval=10.0,
+                 idCheckUpdates=100):
+        self.margin = margin
+        self.accommodationTime = accommodationTime
+        self.staleAfter = staleAfter
+        self.smoothing = smoothing
+        self.reportInterval = reportInterval
+        self.lastReport = None
+        self.idCheckUpdates = idCheckUpdates
+        # None until checked, then whether the asset ids of the updates match those of the rssi data.
+        self.assetIdsMatch = None
+
+        # assets: dict (assetId -> AssetState)
+        self.assets = dict()
+        self.assetIdCache = dict()
+
+        # list of callbacks taking one ValidationEvent as parameter
+        self.onEvent = []
+
+        # statistics
+        self.rssiCount = 0
+        self.updateCount = 0
+        self.matchCount = 0
+        self.accommodatingCount = 0
+        self.mismatchCount = 0
+        self.unknownAssetCount = 0
+        self.switchCount = 0
+        self.switchLatency = RunningStatistic()
+
+    def asset(self, assetId):
+        state = self.assets.get(assetId)
+        if state is None:
+            state = self.assets[assetId] = AssetState()
+        return state
+
+    def assetIdOf(self, mac):
+        assetId = self.assetIdCache.get(mac)
+        if assetId is None:
+            assetId = self.assetIdCache[mac] = assetIdFromMac(mac)
+        return assetId
+
+    @singledispatchmethod
+    def putMessage(self, msg, timestamp):
+        """
+        Consumer for the DecodePool: timestamp is the posix receive time. Other packets are ignored.
+        """
+        pass
+
+    @putMessage.register
+    def _(self, msg: AssetMacReport, timestamp):
+        self.rssi(self.assetIdOf(msg.assetMacAddress), msg.crownstoneId, msg.rssi, timestamp)
+        self.printStatusIfDue(timestamp)
+
+    @putMessage.register
+    def _(self, msg: AssetIdReport, timestamp):
+        self.nearest(msg.assetId, msg.crownstoneId, timestamp)
+        self.printStatusIfDue(timestamp)
+
+    def fresh(self, state, crownstoneId, timestamp):
+        entry = state.rssis.get(crownstoneId)
+        return entry is not None and timestamp - entry[1] <= self.staleAfter
+
+    def rssi(self, assetId, crownstoneId, rssi, timestamp):
+        """
+        Processes an rssi measurement of an asset by a Crownstone.
+        """
+        self.rssiCount += 1
+        state = self.asset(assetId)
+        if self.smoothing is not None:
+            rssifilter = state.filters.get(crownstoneId)
+            if rssifilter is None:
+                rssifilter = state.filters[crownstoneId] = ExponentialMovingAverage(self.smoothing)
+            rssi = rssifilter.push(rssi)
+
+        previous = state.rssis.get(crownstoneId)
+        state.rssis[crownstoneId] = [rssi, timestamp]
+        state.lastRssiTime = timestamp
+
+        expected = state.expected
+        if expected is None or not self.fresh(state, expected, timestamp):
+            self.setExpected(assetId, state, self.argmax(state, timestamp), timestamp)
+        elif crownstoneId == expected:
+            if previous is not None and rssi < previous[0]:
+                self.setExpected(assetId, state, self.argmax(state, timestamp), timestamp)
+        elif rssi > state.rssis[expected][0] + self.margin:
+            self.setExpected(assetId, state, crownstoneId, timestamp)
+
+    def argmax(self, state, timestamp):
+        """
+        Returns the Crownstone with the highest fresh rssi. The current expected Crownstone is kept
+        if it's within margin of it.
+        """
+        best = None
+        bestRssi = None
+        for crownstoneId, [rssi, time] in state.rssis.items():
+            if timestamp - time <= self.staleAfter and (bestRssi is None or rssi > bestRssi):
+                best = crownstoneId
+                bestRssi = rssi
+        if best is not None and self.fresh(state, state.expected, timestamp) \
+                and state.rssis[state.expected][0] >= bestRssi - self.margin:
+            return state.expected
+        return best
+
+    def setExpected(self, assetId, state, crownstoneId, timestamp):
+        if crownstoneId == state.expected:
+            return
+        previous = state.expected
+        state.expected = crownstoneId
+        state.expectedSince = timestamp
+        state.switchPending = crownstoneId is not None and crownstoneId != state.reported
+        if previous is not None and crownstoneId is not None:
+            self.switchCount += 1
+            self.emit(ValidationEvent("switch", assetId, timestamp, crownstoneId, previous))
+
+    def nearest(self, assetId, crownstoneId, timestamp):
+        """
+        Processes a Nearest Crownstone Update of an asset.
+        """
+        self.updateCount += 1
+        state = self.assets.get(assetId)
+        if state is None or state.expected is None:
+            self.unknownAssetCount += 1
+            if self.assetIdsMatch is None and self.rssiCount and self.unknownAssetCount >= self.idCheckUpdates:
+                self.warnAssetIds()
+            return
+        self.assetIdsMatch = True
+
+        expected = state.expected
+        state.reported = crownstoneId
+        if crownstoneId == expected:
+            self.matchCount += 1
+            if state.switchPending:
+                state.switchPending = False
+                self.switchLatency.add(timestamp - state.expectedSince)
+        elif self.fresh(state, crownstoneId, timestamp) \
+                and state.rssis[crownstoneId][0] >= state.rssis[expected][0] - self.margin:
+            self.matchCount += 1
+        elif timestamp - state.expectedSince <= self.accommodationTime:
+            self.accommodatingCount += 1
+        else:
+            self.mismatchCount += 1
+            self.emit(ValidationEvent("mismatch", assetId, timestamp, expected, crownstoneId,
+                                      state.rssis[expected][0] - state.rssis.get(crownstoneId, [float("nan")])[0]))
+
+    def warnAssetIds(self):
+        """
+        Called when none of the updates so far was about an asset with rssi data.
+        """
+        self.assetIdsMatch = False
+        print("nearest crownstone: none of the asset ids in {0} updates matches an asset id derived from the MACs "
+              "of {1} assets with assetIdFromMac, check how the firmware derives them".format(
+               self.updateCount, len(self.assets)))
+
+    def emit(self, event):
+        for callback in self.onEvent:
+            callback(event)
+
+    def printStatusIfDue(self, timestamp):
+        if not self.reportInterval:
+            return
+        if self.lastReport is None:
+            self.lastReport = timestamp
+        elif timestamp - self.lastReport >= self.reportInterval:
+            self.lastReport = timestamp
+            print(self.status())
+
+    def status(self):
+        return "nearest crownstone: {0} assets, {1} updates: {2} match, {3} accommodating, {4} mismatch, " \
+               "{5} unknown asset. switch latency (s) {6}".format(
+                len(self.assets), self.updateCount, self.matchCount, self.accommodatingCount, self.mismatchCount,
+                self.unknownAssetCount, self.switchLatency)
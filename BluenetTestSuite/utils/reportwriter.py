@@ -0,0 +1,145 @@
+"""
+Buffered csv writer for the reports that the plotters log.
+
+Each report is one line: the time it was received (posix seconds), the packet class and its fields in
+declaration order. The first time a packet class occurs in a file, a comment line with its column names is written:
+
+    # AssetMacReport: time,type,assetMacAddress,crownstoneId,rssi,channel
+    1634567890.123456,AssetMacReport,ac:23:3f:71:cd:36,3,-61,37
+
+The file is opened once in append mode, flushed when flushSize bytes are pending or flushInterval seconds have
+passed, and rotated when it grows beyond maxBytes: it's renamed to <filename>.<n> and a new file is started.
+"""
+import datetime
+import os
+import sys
+import threading
+import time
+
+
+def formatValue(value):
+    if isinstance(value, (list, tuple)):
+        return "|".join(str(v) for v in value)
+    return str(value)
+
+
+def reportFields(msg):
+    """
+    Returns the names of the fields of a packet.
+    """
+    return list(vars(msg).keys())
+
+
+def formatReport(timestamp, msg):
+    return ",".join(["{0:.6f}".format(timestamp), type(msg).__name__] +
+                    [formatValue(value) for value in vars(msg).values()]) + "\n"
+
+
+class ReportWriter:
+    """
+    filename: file to write to, stdout if None (which is never rotated).
+    maxBytes: size at which the file is rotated, 0 to never rotate.
+    backupCount: number of rotated files to keep, 0 to keep all of them.
+    """
+    def __init__(self, filename=None, maxBytes=64 * 1024 * 1024, backupCount=0, flushInterval=1.0,
+                 flushSize=64 * 1024):
+        self.filename = filename
+        self.maxBytes = maxBytes
+        self.backupCount = backupCount
+        self.flushInterval = flushInterval
+        self.flushSize = flushSize
+
+        self.file = None
+        self.lock = threading.Lock()
+        self.size = 0
+        self.pending = 0
+        self.lastFlush = time.monotonic()
+        # packet classes that have a header in the current file
+        self.headers = set()
+        # number of the last rotated file
+        self.rotation = 0
+
+        # statistics
+        self.reportCount = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def open(self):
+        if self.filename is None:
+            self.file = sys.stdout
+            self.size = 0
+        else:
+            self.file = open(self.filename, "a", encoding="utf-8", buffering=1024 * 1024)
+            self.size = self.file.tell()
+            self.rotation = max(self.rotation, self.lastRotation())
+        self.headers = set()
+        self.writeLine("# Tracker file created on: {0}\n".format(datetime.datetime.now()))
+
+    def lastRotation(self):
+        """
+        Returns the highest n of the existing <filename>.<n> files, 0 if there are none.
+        The lower numbers may have been pruned already.
+        """
+        directory, basename = os.path.split(os.path.abspath(self.filename))
+        prefix = basename + "."
+        numbers = [int(name[len(prefix):]) for name in os.listdir(directory)
+                   if name.startswith(prefix) and name[len(prefix):].isdigit()]
+        return max(numbers, default=0)
+
+    def writeLine(self, line):
+        self.file.write(line)
+        # in bytes, as maxBytes and flushSize are: names in packets may contain non-ascii characters.
+        size = len(line.encode("utf-8"))
+        self.size += size
+        self.pending += size
+
+    def write(self, reports):
+        """
+        reports: list of [timestamp, msg].
+        """
+        with self.lock:
+            for timestamp, msg in reports:
+                msgtype = type(msg).__name__
+                if msgtype not in self.headers:
+                    self.headers.add(msgtype)
+                    self.writeLine("# {0}: {1}\n".format(msgtype, ",".join(["time", "type"] + reportFields(msg))))
+                self.writeLine(formatReport(timestamp, msg))
+                self.reportCount += 1
+
+            if self.pending >= self.flushSize or time.monotonic() - self.lastFlush >= self.flushInterval:
+                self.flushLocked()
+            if self.filename is not None and self.maxBytes and self.size >= self.maxBytes:
+                self.rotate()
+
+    def flush(self):
+        with self.lock:
+            self.flushLocked()
+
+    def flushLocked(self):
+        self.file.flush()
+        self.pending = 0
+        self.lastFlush = time.monotonic()
+
+    def rotate(self):
+        self.file.close()
+        self.rotation += 1
+        os.replace(self.filename, "{0}.{1}".format(self.filename, self.rotation))
+        if self.backupCount:
+            expired = "{0}.{1}".format(self.filename, self.rotation - self.backupCount)
+            if os.path.exists(expired):
+                os.remove(expired)
+        self.open()
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            self.flushLocked()
+            if self.filename is not None:
+                self.file.close()
+            self.file = None
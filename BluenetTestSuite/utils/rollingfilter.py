@@ -0,0 +1,100 @@
+"""
+Streaming filters for rssi series. A filter is fed one sample at a time with push, which returns the filtered
+value for that sample, so that a stream only filters its new samples instead of recomputing the whole series:
+
+    medianfilter = RollingMedian(5)
+    filtered = [medianfilter.push(rssi) for rssi in rssis]
+
+RollingMedian and RollingMean filter each sample over the n samples before it (the first sample is passed through),
+as rssidatatracker always did. slidingMedian and slidingMean compute the same for a whole series with numpy.
+"""
+import bisect
+from collections import deque
+
+import numpy as np
+
+
+class RollingMedian:
+    """
+    Median of the last n samples before the current one.
+    """
+    def __init__(self, n):
+        self.n = n
+        self.window = deque()
+        self.sortedwindow = []
+
+    def push(self, value):
+        result = self.median() if self.window else value
+
+        self.window.append(value)
+        bisect.insort(self.sortedwindow, value)
+        if len(self.window) > self.n:
+            del self.sortedwindow[bisect.bisect_left(self.sortedwindow, self.window.popleft())]
+        return result
+
+    def median(self):
+        count = len(self.sortedwindow)
+        if count % 2 == 1:
+            return self.sortedwindow[count // 2]
+        return (self.sortedwindow[count // 2 - 1] + self.sortedwindow[count // 2]) / 2
+
+
+class RollingMean:
+    """
+    Mean of the last n samples before the current one.
+    """
+    def __init__(self, n):
+        self.n = n
+        self.window = deque()
+        self.total = 0.0
+
+    def push(self, value):
+        result = self.total / len(self.window) if self.window else value
+
+        self.window.append(value)
+        self.total += value
+        if len(self.window) > self.n:
+            self.total -= self.window.popleft()
+        return result
+
+
+class ExponentialMovingAverage:
+    """
+    alpha: weight of the current sample, between 0 and 1.
+    """
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.average = None
+
+    def push(self, value):
+        if self.average is None:
+            self.average = value
+        else:
+            self.average += self.alpha * (value - self.average)
+        return self.average
+
+
+def slidingWindows(values, n, reduce):
+    """
+    Applies reduce to the windows of the n values before each value, the first value is passed through.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.empty(len(values))
+    if len(values) == 0:
+        return result
+
+    result[0] = values[0]
+    # windows that are shorter than n at the start of the series
+    for k in range(1, min(n, len(values))):
+        result[k] = reduce(values[0:k])
+    if len(values) > n:
+        result[n:] = reduce(np.lib.stride_tricks.sliding_window_view(values[:-1], n), axis=1)
+    return result
+
+
+def slidingMedian(values, n):
+    return slidingWindows(values, n, np.median)
+
+
+def slidingMean(values, n):
+    return slidingWindows(values, n, np.mean)
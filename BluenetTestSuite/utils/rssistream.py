@@ -1,3 +1,17 @@
+"""
+Time windowed rssi streams for the plotters.
+
+The samples are stored in preallocated numpy ring buffers: adding a sample is O(1) (amortized, the buffers
+double when full) and removeOldEntries finds the cut with a binary search. Timestamps must be added in
+non-decreasing order. The duplicated points of a block plot are not stored, they are only created by render,
+which also limits them to the visible time window.
+"""
+import datetime
+
+import numpy as np
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
 
 class RssiDataPoint:
     def __init__(self, stamp, send, recv, chan, rss):
@@ -11,61 +25,198 @@ class RssiDataPoint:
         return ",".join([str(x) for x in [self.timestamp, self.sender, self.receiver, self.channel, self.rssi]])
 
 
+def toSeconds(timestamp):
+    """
+    Datetimes are stored as seconds since 1970-01-01 in the same timezone, other timestamps as is.
+    """
+    if isinstance(timestamp, datetime.datetime):
+        return (timestamp.replace(tzinfo=None) - EPOCH).total_seconds()
+    return float(timestamp)
+
+
+def toTimes(seconds, datetimes):
+    """
+    Converts stored seconds back to datetime64 (which matplotlib plots as dates), or returns them as is.
+    """
+    if datetimes:
+        return (seconds * 1e6).astype("datetime64[us]")
+    return seconds
+
+
+class RingBuffer:
+    """
+    Growable circular buffer of one or more columns of equal length.
+
+    columns: dict (name -> numpy dtype)
+    """
+    def __init__(self, columns, capacity=256):
+        self.capacity = capacity
+        self.head = 0
+        self.size = 0
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in columns.items()}
+
+    def __len__(self):
+        return self.size
+
+    def append(self, **values):
+        if self.size == self.capacity:
+            self.grow()
+        index = (self.head + self.size) % self.capacity
+        for name, value in values.items():
+            self.columns[name][index] = value
+        self.size += 1
+
+    def grow(self):
+        columns = {name: self.get(name) for name in self.columns}
+        self.capacity *= 2
+        self.head = 0
+        for name, column in columns.items():
+            self.columns[name] = np.empty(self.capacity, dtype=column.dtype)
+            self.columns[name][:self.size] = column
+
+    def get(self, name, start=0, stop=None):
+        """
+        Returns a contiguous copy of the entries start up to stop of the column, oldest first.
+        """
+        column = self.columns[name]
+        stop = self.size if stop is None else min(stop, self.size)
+        start = max(start, 0)
+        if start >= stop:
+            return column[:0].copy()
+        first = self.head + start
+        end = self.head + stop
+        if end <= self.capacity:
+            return column[first:end].copy()
+        if first >= self.capacity:
+            return column[first - self.capacity:end - self.capacity].copy()
+        return np.concatenate((column[first:], column[:end - self.capacity]))
+
+    def search(self, name, value, side="left"):
+        """
+        Returns the index at which value would be inserted in the (sorted) column name, as numpy.searchsorted.
+        """
+        column = self.columns[name]
+        end = self.head + self.size
+        if end <= self.capacity:
+            return int(np.searchsorted(column[self.head:end], value, side=side))
+        first = column[self.head:]
+        count = int(np.searchsorted(first, value, side=side))
+        if count == len(first):
+            count += int(np.searchsorted(column[:end - self.capacity], value, side=side))
+        return count
+
+    def dropBefore(self, name, minimum):
+        """
+        Drops the leading entries whose value in the (sorted) column name is smaller than minimum.
+        """
+        count = self.search(name, minimum)
+        self.head = (self.head + count) % self.capacity
+        self.size -= count
+
+    def window(self, name, window):
+        """
+        Returns the range (start, stop) of the entries whose value in the (sorted) column name lies within
+        window (minimum, maximum), plus one on each side. All entries if window is None.
+        """
+        if window is None:
+            return 0, self.size
+        return max(self.search(name, window[0], side="left") - 1, 0), self.search(name, window[1], side="right") + 1
+
+
 class RssiStream:
     def __init__(self, sender, receiver):
         self.receiver = receiver
         self.sender = sender
-        self.times = []
-        self.rssis = []
+        self.samples = RingBuffer({"time": np.float64, "rssi": np.float64})
+        # times are returned as datetimes if they were added as datetimes.
+        self.datetimes = None
 
     def removeOldEntries(self, time_minimum):
-        try:
-            indx = next(idx for idx, t in enumerate(self.times) if t >= time_minimum)
-            self.times = self.times[indx:]
-            self.rssis = self.rssis[indx:]
-        except StopIteration:
-            # nothing to trim, that's ok.
-            pass
+        self.samples.dropBefore("time", toSeconds(time_minimum))
 
     def addNewEntry(self, timestamp, rssivalue):
-        # block plot: duplicate previous data if any.
-        if len(self.times) > 0:
-            self.times.append(timestamp)
-            self.rssis.append(self.rssis[-1])
+        if self.datetimes is None:
+            self.datetimes = isinstance(timestamp, datetime.datetime)
+        self.samples.append(time=toSeconds(timestamp), rssi=rssivalue)
+
+    def render(self, window=None):
+        """
+        Returns the times (in seconds, see toSeconds) and rssis of the plotted points of the samples within
+        window (minimum, maximum) in seconds, plus one sample on each side. All samples if window is None.
+        """
+        start, stop = self.samples.window("time", window)
+        # block plot: each sample after the first starts with the previous rssi value.
+        times = np.repeat(self.samples.get("time", start, stop), 2)[1:]
+        rssis = np.repeat(self.samples.get("rssi", start, stop), 2)[:-1]
+        return times, rssis
 
-        self.times.append(timestamp)
-        self.rssis.append(rssivalue)
+    @property
+    def times(self):
+        return toTimes(self.render()[0], self.datetimes)
+
+    @property
+    def rssis(self):
+        return self.render()[1]
 
     def status(self):
-        return F"RssiStream ({self.sender} -> {self.receiver}) time window {self.times[0]}-{self.times[-1]}, {len(self.rssis)} samples"
+        times = self.times
+        return F"RssiStream ({self.sender} -> {self.receiver}) time window {times[0]}-{times[-1]}, {len(times)} samples"
+
 
 class NearestStream:
     def __init__(self, sender):
         self.sender = sender
-        self.times = []
-        self.rssis = []
-        self.receivers = []
+        self.samples = RingBuffer({"time": np.float64, "rssi": np.float64, "receiver": object, "block": bool})
+        self.datetimes = None
 
     def removeOldEntries(self, time_minimum):
-        try:
-            indx = next(idx for idx, t in enumerate(self.times) if t >= time_minimum)
-            self.times = self.times[indx:]
-            self.rssis = self.rssis[indx:]
-            self.receivers = self.receivers[indx:]
-        except StopIteration:
-            # nothing to trim, that's ok.
-            pass
+        self.samples.dropBefore("time", toSeconds(time_minimum))
 
     def addNewEntry(self, timestamp, rssivalue, receiver, blockPlot = False):
-        # block plot: duplicate previous data if any.
-        if len(self.times) > 0 and blockPlot:
-            self.times.append(timestamp)
-            self.rssis.append(self.rssis[-1])
-            self.receivers.append(self.receivers[-1])
+        if self.datetimes is None:
+            self.datetimes = isinstance(timestamp, datetime.datetime)
+        self.samples.append(time=toSeconds(timestamp), rssi=rssivalue, receiver=receiver, block=blockPlot)
+
+    @staticmethod
+    def expandedIndices(block):
+        """
+        Returns the index of the sample of each plotted point. block: per sample whether it is block plotted,
+        preceded by a point with the time of the sample and the values of the previous sample.
+        """
+        counts = 1 + block
+        indices = np.repeat(np.arange(len(block)), counts)
+        starts = np.cumsum(counts) - counts
+        indices[starts[block]] -= 1
+        return indices
+
+    def render(self, window=None):
+        """
+        Returns the times (in seconds, see toSeconds), rssis and receivers of the plotted points of the samples
+        within window (minimum, maximum) in seconds, plus one sample on each side. All samples if window is None.
+        """
+        start, stop = self.samples.window("time", window)
+        block = self.samples.get("block", start, stop)
+        # the first sample has no previous sample.
+        if len(block) > 0:
+            block[0] = False
+        indices = self.expandedIndices(block)
+        times = np.repeat(self.samples.get("time", start, stop), 1 + block)
+        rssis = self.samples.get("rssi", start, stop)[indices]
+        receivers = self.samples.get("receiver", start, stop)[indices]
+        return times, rssis, receivers
+
+    @property
+    def times(self):
+        return toTimes(self.render()[0], self.datetimes)
+
+    @property
+    def rssis(self):
+        return self.render()[1]
 
-        self.times.append(timestamp)
-        self.rssis.append(rssivalue)
-        self.receivers.append(receiver)
+    @property
+    def receivers(self):
+        return self.render()[2]
 
     def status(self):
-        return F"NearestStream ({self.sender}) time window {self.times[0]}-{self.times[-1]}, {len(self.rssis)} samples"
\ No newline at end of file
+        times = self.times
+        return F"NearestStream ({self.sender}) time window {times[0]}-{times[-1]}, {len(times)} samples"
@@ -0,0 +1,108 @@
+"""
+Headless mode of the plotting scripts: no window and no GUI event loop, the plots are only saved as snapshots.
+
+A Snapshotter thread owns an Agg figure, which needs no display. It calls ingest every ingestInterval seconds to
+move the queued messages into the streams, and snapshot every interval seconds to draw the current time window and
+save it. The file extension selects the format (.png, .svg, .pdf). Snapshots are written to a temporary file which
+then replaces the previous one, so a viewer never reads a half written file. With keep, each snapshot is saved
+under its own name with the time in it instead.
+
+    snapshotter = Snapshotter(plotter.processPlottingQueue, plotter.saveSnapshot, "nearest.png",
+                              rows=2, cols=2, interval=30)
+    snapshotter.start()
+    ...
+    snapshotter.stop()
+"""
+import datetime
+import os
+import threading
+import time
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+class Snapshotter(threading.Thread):
+    """
+    ingest: callable without arguments.
+    snapshot: callable taking (fig, axs_flat, filename), draws the plots in the axes and saves fig to filename.
+    interval: seconds between snapshots.
+    """
+    def __init__(self, ingest, snapshot, filename, rows=1, cols=1, interval=30.0, ingestInterval=1.0, keep=False,
+                 figsize=(16, 9), dpi=100):
+        super(Snapshotter, self).__init__(name="Snapshotter", daemon=True)
+        self.ingest = ingest
+        self.snapshot = snapshot
+        self.filename = filename
+        self.rows = rows
+        self.cols = cols
+        self.interval = interval
+        self.ingestInterval = ingestInterval
+        self.keep = keep
+        self.figsize = figsize
+        self.dpi = dpi
+
+        self.stopped = threading.Event()
+
+        # statistics
+        self.snapshotCount = 0
+        self.errorCount = 0
+        self.lastDuration = None
+
+    def stop(self):
+        """
+        Saves a last snapshot and stops the thread.
+        """
+        self.stopped.set()
+        self.join()
+
+    def snapshotFilename(self):
+        if not self.keep:
+            return self.filename
+        base, extension = os.path.splitext(self.filename)
+        return "{0}-{1}{2}".format(base, datetime.datetime.now().strftime("%Y%m%d-%H%M%S"), extension)
+
+    def ingestQueued(self):
+        """
+        Calls ingest. Like a failing snapshot, a failing ingest is counted and doesn't stop the thread.
+        """
+        try:
+            self.ingest()
+        except Exception as e:
+            self.errorCount += 1
+            print("couldn't ingest queued messages: {0}".format(e))
+
+    def save(self, fig, axs_flat):
+        filename = self.snapshotFilename()
+        base, extension = os.path.splitext(filename)
+        temporary = "{0}.tmp{1}".format(base, extension)
+
+        t1 = time.perf_counter()
+        try:
+            self.snapshot(fig, axs_flat, temporary)
+            os.replace(temporary, filename)
+            self.snapshotCount += 1
+        except Exception as e:
+            self.errorCount += 1
+            print("couldn't save snapshot {0}: {1}".format(filename, e))
+        self.lastDuration = time.perf_counter() - t1
+
+    def run(self):
+        fig = Figure(figsize=self.figsize, dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        axs_flat = list(fig.subplots(self.rows, self.cols, sharex=True, squeeze=False).flat)
+
+        nextSnapshot = time.monotonic() + self.interval
+        while not self.stopped.wait(self.ingestInterval):
+            self.ingestQueued()
+            if time.monotonic() >= nextSnapshot:
+                self.save(fig, axs_flat)
+                nextSnapshot = max(nextSnapshot + self.interval, time.monotonic())
+
+        self.ingestQueued()
+        self.save(fig, axs_flat)
+
+    def status(self):
+        duration = "" if self.lastDuration is None else ", last one took {0:.2f} s".format(self.lastDuration)
+        return "saved {0} snapshots to {1}, {2} errors{3}".format(
+            self.snapshotCount, self.filename, self.errorCount, duration)
@@ -0,0 +1,377 @@
+"""
+Recording and replaying of uart sessions, so that FirmwareState, the trackers and the plotters can be run against
+the traffic of a field session without the hardware.
+
+A CaptureRecorder subscribes to SystemTopics.uartNewMessage and appends every UartMessagePacket to a capture file:
+
+    header:  8B magic "BNTSCAP1", 8B float64 posix time at which the capture was started
+    record:  8B float64 time, 2B uint16 opCode, 4B uint32 payload length, payload
+
+The time of a record is in seconds since the start of the capture, measured with the monotonic clock. A session
+that is appended to an existing capture continues after the last record of that capture. Next to the capture an
+index file (<filename>.idx) gets 8B uint64 offset, 8B float64 time per record. If the index is missing or was
+cut short (e.g. the recorder was killed), the CaptureReplayer rebuilds it from the capture.
+
+The CaptureReplayer memory maps the capture and emits the packets on the UartEventBus at the recorded pace, a
+multiple of it, or as fast as possible (speed=None). Like a CrownstoneUart, it sets up a UartParser that turns
+them into the specific topics (hello, result packets, ...). While a packet is emitted, clock() returns the posix time
+at which it was recorded, so that FirmwareState, the DecodePool and the plotters can stamp it with that instead of
+the time of the replay:
+
+    with CaptureRecorder("session.cap"):
+        ...
+
+    with CaptureReplayer("session.cap", speed=10) as replayer:
+        fw = FirmwareState(clock=replayer.clock)
+        replayer.replay()
+
+From the command line:
+
+    python -m BluenetTestSuite.utils.uartcapture record session.cap --port /dev/ttyACM0
+    python -m BluenetTestSuite.utils.uartcapture info session.cap
+    python -m BluenetTestSuite.utils.uartcapture replay session.cap --speed 0
+"""
+import datetime
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from crownstone_uart.core.UartEventBus import UartEventBus
+from crownstone_uart.core.uart.UartParser import UartParser
+from crownstone_uart.core.uart.uartPackets.UartMessagePacket import UartMessagePacket
+from crownstone_uart.topics.SystemTopics import SystemTopics
+
+MAGIC = b"BNTSCAP1"
+HEADER = struct.Struct("<8sd")
+RECORD = struct.Struct("<dHI")
+INDEX = struct.Struct("<Qd")
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("time", "<f8")])
+
+
+def indexFilename(filename):
+    return filename + ".idx"
+
+
+def scanCapture(data):
+    """
+    Returns the index of a capture (buffer), without a trailing record that was cut short.
+    """
+    offsets = []
+    times = []
+    offset = HEADER.size
+    while offset + RECORD.size <= len(data):
+        recordtime, opCode, length = RECORD.unpack_from(data, offset)
+        if offset + RECORD.size + length > len(data):
+            break
+        offsets.append(offset)
+        times.append(recordtime)
+        offset += RECORD.size + length
+
+    index = np.empty(len(offsets), dtype=INDEX_DTYPE)
+    index["offset"] = offsets
+    index["time"] = times
+    return index
+
+
+class CaptureRecorder:
+    """
+    flushInterval: seconds between flushes of the capture and index files.
+    """
+    def __init__(self, filename, flushInterval=1.0):
+        self.filename = filename
+        self.flushInterval = flushInterval
+
+        self.file = None
+        self.indexfile = None
+        self.subscription = None
+        self.lock = threading.Lock()
+        self.offset = 0
+        self.startMonotonic = None
+        self.lastFlush = 0.0
+
+        # statistics
+        self.recordCount = 0
+        self.byteCount = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def start(self):
+        self.open()
+        self.subscription = UartEventBus.subscribe(SystemTopics.uartNewMessage, self.record)
+
+    def open(self):
+        timeOffset = 0.0
+        if os.path.exists(self.filename) and os.path.getsize(self.filename) > 0:
+            # continue after the last complete record, a partial one is overwritten.
+            with open(self.filename, "rb") as existing, \
+                    mmap.mmap(existing.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:len(MAGIC)] != MAGIC:
+                    raise ValueError("{0} is not a capture file".format(self.filename))
+                index = scanCapture(data)
+                if len(index):
+                    lastTime, opCode, length = RECORD.unpack_from(data, int(index["offset"][-1]))
+                    timeOffset = lastTime
+                    self.offset = int(index["offset"][-1]) + RECORD.size + length
+                else:
+                    self.offset = HEADER.size
+            self.file = open(self.filename, "r+b")
+            self.file.truncate(self.offset)
+            self.file.seek(self.offset)
+            with open(indexFilename(self.filename), "wb") as indexfile:
+                indexfile.write(index.tobytes())
+        else:
+            self.file = open(self.filename, "wb")
+            self.file.write(HEADER.pack(MAGIC, time.time()))
+            self.offset = HEADER.size
+            open(indexFilename(self.filename), "wb").close()
+
+        self.indexfile = open(indexFilename(self.filename), "ab")
+        self.startMonotonic = time.monotonic() - timeOffset
+
+    def record(self, msg: UartMessagePacket):
+        """
+        Called on the uart thread for every message.
+        """
+        now = time.monotonic()
+        payload = bytes(msg.payload)
+        with self.lock:
+            if self.file is None:
+                return
+            recordtime = now - self.startMonotonic
+            self.file.write(RECORD.pack(recordtime, msg.opCode, len(payload)))
+            self.file.write(payload)
+            self.indexfile.write(INDEX.pack(self.offset, recordtime))
+            self.offset += RECORD.size + len(payload)
+            self.recordCount += 1
+            self.byteCount += RECORD.size + len(payload)
+
+            if now - self.lastFlush >= self.flushInterval:
+                self.file.flush()
+                self.indexfile.flush()
+                self.lastFlush = now
+
+    def stop(self):
+        UartEventBus.unsubscribe(self.subscription)
+        self.subscription = None
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.close()
+            self.indexfile.close()
+            self.file = None
+            self.indexfile = None
+
+    def status(self):
+        return "recorded {0} packets ({1} bytes) to {2}".format(self.recordCount, self.byteCount, self.filename)
+
+
+class CaptureReplayer:
+    """
+    speed: multiple of the recorded pace, None or 0 to replay as fast as possible.
+    topic: the topic on which the packets are emitted.
+    parse: set up a UartParser while open. Disable when a CrownstoneUart is running as well, it has its own.
+    """
+    def __init__(self, filename, speed=1.0, topic=SystemTopics.uartNewMessage, parse=True):
+        self.filename = filename
+        self.speed = speed
+        self.topic = topic
+        self.parse = parse
+
+        self.file = None
+        self.data = None
+        self.index = None
+        self.parser = None
+        self.startTime = None
+        # posix time at which the last emitted packet was recorded, see clock.
+        self.currentTime = None
+        self.isRunning = False
+        self.thread = None
+
+        # statistics
+        self.replayedCount = 0
+        self.lateCount = 0
+        self.replayDuration = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def open(self):
+        self.file = open(self.filename, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.startTime = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError("{0} is not a capture file".format(self.filename))
+        self.index = self.loadIndex()
+        self.currentTime = self.startTime
+        if self.parse:
+            self.parser = UartParser()
+
+    def loadIndex(self):
+        """
+        Reads the index file, or rebuilds the index if it doesn't cover the capture.
+        """
+        try:
+            index = np.fromfile(indexFilename(self.filename), dtype=INDEX_DTYPE)
+        except (FileNotFoundError, ValueError):
+            index = np.empty(0, dtype=INDEX_DTYPE)
+        if len(index):
+            lastTime, opCode, length = RECORD.unpack_from(self.data, int(index["offset"][-1]))
+            if int(index["offset"][-1]) + RECORD.size + length == len(self.data):
+                return index
+        return scanCapture(self.data)
+
+    def close(self):
+        self.stop()
+        if self.parser is not None:
+            self.parser.stop()
+            self.parser = None
+        if self.data is not None:
+            self.data.close()
+            self.file.close()
+            self.data = None
+            self.file = None
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def duration(self):
+        return float(self.index["time"][-1]) if len(self.index) else 0.0
+
+    def packet(self, i):
+        """
+        Returns [time, UartMessagePacket] of record i.
+        """
+        offset = int(self.index["offset"][i])
+        recordtime, opCode, length = RECORD.unpack_from(self.data, offset)
+        start = offset + RECORD.size
+        return recordtime, UartMessagePacket(opCode, list(self.data[start:start + length]))
+
+    def clock(self):
+        """
+        Returns the posix time at which the packet that is being replayed was recorded: a drop-in
+        replacement for time.time.
+        """
+        return self.currentTime
+
+    def seek(self, seconds):
+        """
+        Returns the number of the first record at or after seconds since the start of the capture.
+        """
+        return int(np.searchsorted(self.index["time"], seconds, side="left"))
+
+    def replay(self, start=0, end=None):
+        """
+        Emits records start..end (all by default) on the UartEventBus. Blocks until done or stopped.
+        """
+        self.isRunning = True
+        # python lists iterate faster than numpy arrays.
+        offsets = self.index["offset"][start:end].tolist()
+        times = self.index["time"][start:end].tolist()
+        data = self.data
+        startTime = self.startTime
+        paced = bool(self.speed)
+
+        t1 = time.perf_counter()
+        for offset, recordtime in zip(offsets, times):
+            if not self.isRunning:
+                break
+            if paced:
+                delay = (recordtime - times[0]) / self.speed - (time.perf_counter() - t1)
+                if delay > 0.001:
+                    time.sleep(delay)
+                elif delay < -0.1:
+                    self.lateCount += 1
+
+            recordtime, opCode, length = RECORD.unpack_from(data, offset)
+            payloadStart = offset + RECORD.size
+            self.currentTime = startTime + recordtime
+            UartEventBus.emit(self.topic, UartMessagePacket(opCode, list(data[payloadStart:payloadStart + length])))
+            self.replayedCount += 1
+
+        self.replayDuration = time.perf_counter() - t1
+        self.isRunning = False
+        return self.replayedCount
+
+    def start(self, start=0, end=None):
+        """
+        Replays on a separate thread, like the uart thread during a live session.
+        """
+        self.thread = threading.Thread(target=self.replay, args=(start, end), name="CaptureReplayer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.isRunning = False
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def isDone(self):
+        return self.thread is None or not self.thread.is_alive()
+
+    def status(self):
+        rate = "" if not self.replayDuration else ", {0:.0f} packets/s".format(
+            self.replayedCount / self.replayDuration)
+        return "replayed {0} of {1} packets from {2}{3}, {4} more than 0.1 s late".format(
+            self.replayedCount, len(self.index), self.filename, rate, self.lateCount)
+
+    def info(self):
+        opCodes = dict()
+        for offset in self.index["offset"]:
+            opCode = RECORD.unpack_from(self.data, int(offset))[1]
+            opCodes[opCode] = opCodes.get(opCode, 0) + 1
+        lines = ["{0}: {1} packets in {2:.1f} s, started {3}".format(
+            self.filename, len(self.index), self.duration, datetime.datetime.fromtimestamp(self.startTime))]
+        for opCode, count in sorted(opCodes.items()):
+            lines.append("  opCode {0:5}: {1} packets".format(opCode, count))
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Records and replays uart sessions")
+    parser.add_argument("command", choices=["record", "info", "replay"])
+    parser.add_argument("filename", help="the capture file")
+    parser.add_argument("--port", default="/dev/ttyACM0", help="record: uart port of the crownstone")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay: multiple of the recorded pace, 0 for maximum")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        from crownstone_uart import CrownstoneUart
+
+        uart = CrownstoneUart()
+        uart.initialize_usb_sync(port=args.port)
+        with CaptureRecorder(args.filename) as recorder:
+            print("recording to {0}, press ctrl+c to quit".format(args.filename))
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+        uart.stop()
+        print(recorder.status())
+    elif args.command == "info":
+        with CaptureReplayer(args.filename) as replayer:
+            print(replayer.info())
+    else:
+        with CaptureReplayer(args.filename, speed=args.speed) as replayer:
+            replayer.replay()
+            print(replayer.status())